@@ -4,19 +4,17 @@ Proporciona decoradores y utilidades para proteger los endpoints de la API
 contra abusos y ataques de fuerza bruta.
 """
 
-import time
 import logging
 import hashlib
+import math
 from functools import wraps
 from django.http import JsonResponse
-from django.core.cache import cache
 from django.conf import settings
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from rest_framework.response import Response
 from rest_framework import status
-
-# No dependemos de ipware, usamos nuestra propia implementación
-IPWARE_AVAILABLE = False
+from blog.rate_limit_engine import parse_rate
+from blog.rate_limit_policy import get_client_ip, rate_limit_policy
 
 logger = logging.getLogger('django.security')
 
@@ -44,86 +42,11 @@ RATE_LIMITS = {
     },
 }
 
-def get_client_ip(request):
-    """
-    Obtiene la dirección IP real del cliente, considerando proxies.
-    Utiliza ipware para una detección más robusta si está disponible.
-    """
-    if IPWARE_AVAILABLE:
-        client_ip, is_routable = ipware_get_client_ip(request)
-        if client_ip is not None:
-            return client_ip
-    
-    # Implementación estándar como fallback
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        # Tomar la primera IP (la del cliente original)
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '')
-    return ip
-
 def get_cache_key(group, request):
     """
     Genera una clave de caché única para el rate limiting.
-    Utiliza una combinación de IP y User-Agent para usuarios anónimos,
-    y el ID de usuario para usuarios autenticados.
     """
-    if not hasattr(request, 'user') or not request.user.is_authenticated:
-        # Para usuarios anónimos, usar IP + User-Agent (hash)
-        ip = get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')[:200]
-        identifier = hashlib.md5(f"{ip}:{user_agent}".encode()).hexdigest()
-    else:
-        # Para usuarios autenticados, usar ID de usuario
-        identifier = f"user:{request.user.id}"
-    
-    # Crear clave para el caché
-    key = f"ratelimit:{group}:{identifier}"
-    return key
-
-def parse_rate(rate):
-    """
-    Parsea una cadena de tasa en formato "número/unidad" a un número y duración en segundos.
-    
-    Args:
-        rate: Cadena en formato "número/unidad" donde unidad puede ser second, minute, hour, day
-              o sus abreviaturas s, m, h, d.
-    
-    Returns:
-        Tupla (count, duration) donde count es el número de solicitudes y duration es el período en segundos.
-    """
-    if '/' not in rate:
-        raise ValueError(f"Formato de tasa inválido: {rate}")
-    
-    count, period = rate.split('/')
-    count = int(count)
-    
-    # Normalizar el período
-    period = period.strip().lower()
-    
-    # Mapeo de unidades a segundos
-    time_units = {
-        's': 1,
-        'second': 1,
-        'seconds': 1,
-        'm': 60,
-        'minute': 60,
-        'minutes': 60,
-        'h': 3600,
-        'hour': 3600,
-        'hours': 3600,
-        'd': 86400,
-        'day': 86400,
-        'days': 86400,
-    }
-    
-    if period not in time_units:
-        raise ValueError(f"Unidad de tiempo no válida: {period}")
-    
-    duration = time_units[period]
-    
-    return count, duration
+    return rate_limit_policy.cache_key(request, group)
 
 def api_rate_limit(group='default', rate=None):
     """
@@ -158,32 +81,20 @@ def api_rate_limit(group='default', rate=None):
             except ValueError as e:
                 logger.error(f"Error en configuración de rate limit: {e}")
                 # Usar valores predeterminados seguros
-                count, duration = 30, 60  # 30 por minuto
-            
-            # Generar clave de caché
-            cache_key = get_cache_key(group, request)
-            
-            # Obtener contador actual
-            now = time.time()
-            window_start = int(now - duration)
-            
-            # Estructura en caché: {timestamp1: count1, timestamp2: count2, ...}
-            request_history = cache.get(cache_key, {})
-            
-            # Limpiar entradas antiguas
-            request_history = {ts: count for ts, count in request_history.items() if int(ts) > window_start}
+                rate_str = '30/minute'
+                count, duration = parse_rate(rate_str)
             
-            # Contar solicitudes en la ventana actual
-            current_count = sum(request_history.values())
+            # Comprobar y consumir el límite en una sola operación atómica
+            result = rate_limit_policy.check(request, group, rate_str)
             
             # Verificar si se excede el límite
-            if current_count >= count:
+            if not result['allowed']:
                 # Registrar el intento de abuso
                 ip = get_client_ip(request)
                 user_id = getattr(request.user, 'id', None) if hasattr(request, 'user') else None
                 
                 logger.warning(
-                    f"Rate limit excedido para {group}: {current_count}/{count} solicitudes",
+                    f"Rate limit excedido para {group}: {count} solicitudes cada {duration}s",
                     extra={
                         'ip': ip,
                         'user_id': user_id,
@@ -194,26 +105,17 @@ def api_rate_limit(group='default', rate=None):
                 )
                 
                 # Responder según el tipo de solicitud
+                retry_after = math.ceil(result['retry_after'])
                 if request.headers.get('Accept') == 'application/json' or request.path.startswith('/api/'):
                     return JsonResponse({
                         'error': 'Rate limit exceeded',
                         'message': 'Has realizado demasiadas solicitudes. Por favor, intenta de nuevo más tarde.',
-                        'retry_after': duration,
-                    }, status=429)
+                        'retry_after': retry_after,
+                    }, status=429, headers={'Retry-After': str(retry_after)})
                 
                 # Para solicitudes normales, usar la vista de rate limit
                 from blog.ratelimit import ratelimit_view
-                return ratelimit_view(request)
-            
-            # Actualizar contador
-            current_timestamp = str(int(now))
-            if current_timestamp in request_history:
-                request_history[current_timestamp] += 1
-            else:
-                request_history[current_timestamp] = 1
-            
-            # Guardar en caché
-            cache.set(cache_key, request_history, duration * 2)  # Doble duración para mantener historial
+                return ratelimit_view(request, block_time=retry_after)
             
             # Ejecutar vista
             return view_func(request, *args, **kwargs)
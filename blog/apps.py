@@ -17,4 +17,15 @@ class BlogConfig(AppConfig):
         """
         # Import and connect cache signals
         from .cache_signals import connect_cache_signals
-        connect_cache_signals()
\ No newline at end of file
+        connect_cache_signals()
+
+        # Instrumentación de consultas SQL (funciona también sin DEBUG)
+        from .db_instrumentation import install_query_instrumentation
+        install_query_instrumentation()
+
+        # Profiler por muestreo (opcional): un hilo de control por worker
+        from django.conf import settings
+        if getattr(settings, 'PROFILER_ENABLED', False):
+            from django.core.signals import request_started
+            from .profiler import ensure_controller
+            request_started.connect(ensure_controller, dispatch_uid='blog.profiler')
\ No newline at end of file
@@ -0,0 +1,426 @@
+"""
+Benchmark reproducible de los endpoints más usados.
+
+- ``generate_dataset`` crea un conjunto de datos determinista (usuarios,
+  posts, tags, comentarios y likes) con ``bulk_create``: mismas cifras y
+  misma semilla, mismos datos.
+- ``SCENARIOS`` define las solicitudes de cada escenario (portada, detalle
+  de post, página de tag, búsqueda, like, autocompletado de tags y
+  ``/api/posts/``). Cada iteración rota de post, tag o término para no
+  medir siempre la misma página.
+- ``run_benchmark`` las lanza con el cliente de pruebas de Django, dentro
+  del proceso (sin red), y mide latencia (p50/p95/p99), consultas por
+  solicitud (con ``blog.db_instrumentation``) y solicitudes por segundo.
+
+Las solicitudes se lanzan una tras otra: el rendimiento es el de un único
+cliente, comparable entre commits pero no la capacidad del servidor. Los
+clientes anónimos rotan de IP para que el rate limiting no convierta la
+medición en respuestas 429. El comando ``benchmark_endpoints`` lo ejecuta
+sobre una base de datos de pruebas desechable y guarda el resultado en JSON
+para compararlo con ``compare_results``.
+"""
+
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+
+from accounts.models import Profile
+from blog.db_instrumentation import collect_queries
+from posts.models import Comment, Post, TagMetadata
+
+USER_PREFIX = 'bench_user_'
+PASSWORD = 'bench-password'
+
+WORDS = (
+    'python', 'django', 'postgres', 'redis', 'docker', 'celery', 'cache',
+    'rendimiento', 'seguridad', 'api', 'testing', 'linux', 'javascript',
+    'frontend', 'backend', 'despliegue', 'kubernetes', 'nginx', 'gunicorn',
+    'consultas', 'indices', 'plantillas', 'formularios', 'migraciones',
+    'asyncio', 'tipado', 'logging', 'metricas', 'perfilado', 'memoria',
+)
+
+DEFAULT_SIZES = {'users': 50, 'posts': 300, 'tags': 40, 'comments': 1500, 'likes': 3000}
+
+# Diferencias relativas a partir de las que compare_results marca regresión
+DEFAULT_THRESHOLD = 0.10
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _tag_name(index):
+    word = WORDS[index % len(WORDS)]
+    return word if index < len(WORDS) else f"{word}-{index // len(WORDS) + 1}"
+
+
+def generate_dataset(users=50, posts=300, tags=40, comments=1500, likes=3000, favorites=0, seed=42):
+    """
+    Crea el conjunto de datos del benchmark en la base de datos actual.
+
+    Usa ``bulk_create``, así que no dispara señales: los perfiles, los
+    metadatos de tags y los contadores en caché se rellenan aquí.
+
+    Returns:
+        dict: Objetos creados por tipo y segundos empleados
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    users, posts = max(1, users), max(1, posts)
+    tags = max(1, tags)
+
+    with transaction.atomic():
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@example.com", password=password)
+            for i in range(users)
+        ])
+        user_ids = list(
+            User.objects.filter(username__startswith=USER_PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id, can_post=True) for user_id in user_ids], ignore_conflicts=True
+        )
+
+        Tag.objects.bulk_create([
+            Tag(name=_tag_name(i), slug=slugify(_tag_name(i))) for i in range(tags)
+        ], ignore_conflicts=True)
+        tag_ids = list(
+            Tag.objects.filter(name__in=[_tag_name(i) for i in range(tags)]).values_list('id', flat=True)
+        )
+
+        new_posts = []
+        for i in range(posts):
+            title = f"{_sentence(rng, 4).capitalize()} {i}"
+            content = ''.join(f"<p>{_sentence(rng, rng.randint(40, 120))}.</p>" for _ in range(rng.randint(3, 8)))
+            post = Post(
+                title=title,
+                slug=f"{slugify(title)}-{i}",
+                content=content,
+                author_id=rng.choice(user_ids),
+                status='draft' if rng.random() < 0.1 else 'published',
+                views=rng.randint(0, 5000),
+                is_sticky=rng.random() < 0.02,
+            )
+            post.reading_time = post.calculate_reading_time()
+            new_posts.append(post)
+        Post.objects.bulk_create(new_posts)
+        post_ids = list(
+            Post.objects.filter(author_id__in=user_ids).order_by('id').values_list('id', flat=True)
+        )
+
+        content_type = ContentType.objects.get_for_model(Post)
+        tag_usage = dict.fromkeys(tag_ids, 0)
+        tagged = []
+        for post_id in post_ids:
+            for tag_id in rng.sample(tag_ids, min(len(tag_ids), rng.randint(1, 5))):
+                tagged.append(TaggedItem(tag_id=tag_id, content_type=content_type, object_id=post_id))
+                tag_usage[tag_id] += 1
+        TaggedItem.objects.bulk_create(tagged, ignore_conflicts=True)
+        TagMetadata.objects.bulk_create([
+            TagMetadata(tag_id=tag_id, usage_count=count, last_used=timezone.now())
+            for tag_id, count in tag_usage.items()
+        ], ignore_conflicts=True)
+
+        comment_counts = dict.fromkeys(post_ids, 0)
+        new_comments = []
+        for _ in range(comments):
+            post_id = rng.choice(post_ids)
+            comment_counts[post_id] += 1
+            new_comments.append(Comment(
+                post_id=post_id, author_id=rng.choice(user_ids), content=_sentence(rng, rng.randint(5, 30)),
+            ))
+        Comment.objects.bulk_create(new_comments)
+
+        pairs = set()
+        for _ in range(min(likes, len(post_ids) * len(user_ids))):
+            pairs.add((rng.choice(post_ids), rng.choice(user_ids)))
+        Post.likes.through.objects.bulk_create(
+            [Post.likes.through(post_id=post_id, user_id=user_id) for post_id, user_id in pairs],
+            ignore_conflicts=True,
+        )
+
+        favorite_pairs = set()
+        for _ in range(min(favorites, len(post_ids) * len(user_ids))):
+            favorite_pairs.add((rng.choice(post_ids), rng.choice(user_ids)))
+        Post.favorites.through.objects.bulk_create(
+            [Post.favorites.through(post_id=post_id, user_id=user_id) for post_id, user_id in favorite_pairs],
+            ignore_conflicts=True,
+        )
+
+        like_counts = dict.fromkeys(post_ids, 0)
+        for post_id, _ in pairs:
+            like_counts[post_id] += 1
+        Post.objects.bulk_update([
+            Post(id=post_id, cached_likes_count=like_counts[post_id], cached_comments_count=comment_counts[post_id])
+            for post_id in post_ids
+        ], ['cached_likes_count', 'cached_comments_count'], batch_size=500)
+
+    return {
+        'users': len(user_ids),
+        'posts': len(post_ids),
+        'tags': len(tag_ids),
+        'tagged_items': len(tagged),
+        'comments': len(new_comments),
+        'likes': len(pairs),
+        'favorites': len(favorite_pairs),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def dataset_counts():
+    """Objetos del benchmark que ya hay en la base de datos."""
+    user_ids = User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True)
+    posts = Post.objects.filter(author_id__in=user_ids)
+    return {
+        'users': len(user_ids),
+        'posts': posts.count(),
+        'comments': Comment.objects.filter(post__in=posts).count(),
+        'likes': Post.likes.through.objects.filter(post__in=posts).count(),
+    }
+
+
+@dataclass
+class BenchmarkData:
+    """Datos que los escenarios necesitan para construir sus solicitudes."""
+
+    posts: list
+    tags: list
+    users: list
+    search_terms: list = field(default_factory=lambda: list(WORDS[:10]))
+    tag_queries: list = field(default_factory=lambda: [word[:3] for word in WORDS[:15]])
+
+    @classmethod
+    def load(cls, limit=100):
+        users = list(
+            User.objects.filter(username__startswith=USER_PREFIX).order_by('id')[:limit]
+        )
+        posts = list(
+            Post.objects.filter(author__in=users, status='published')
+            .order_by('-views').values_list('author__username', 'slug')[:limit]
+        )
+        tags = list(
+            Tag.objects.filter(name__in=[_tag_name(i) for i in range(limit)]).values_list('slug', flat=True)
+        )
+        if not users or not posts or not tags:
+            raise ValueError('No hay datos del benchmark: genera el conjunto de datos primero')
+        return cls(posts=posts, tags=tags, users=users)
+
+
+def _post_path(data, i, suffix=''):
+    username, slug = data.posts[i % len(data.posts)]
+    return f"/post/{username}/{slug}/{suffix}"
+
+
+# Cada escenario devuelve (método, ruta, índice de usuario o None, cabeceras)
+SCENARIOS = {
+    'homepage': lambda data, i: ('GET', '/' if i % 4 else '/?page=2', None, {}),
+    'post_detail': lambda data, i: ('GET', _post_path(data, i), None, {}),
+    'tag_page': lambda data, i: ('GET', f"/tag/{data.tags[i % len(data.tags)]}/", None, {}),
+    'search': lambda data, i: ('GET', f"/search/?q={data.search_terms[i % len(data.search_terms)]}", None, {}),
+    'like_toggle': lambda data, i: (
+        'POST', _post_path(data, i // 2, 'like/'), i % len(data.users), {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'},
+    ),
+    'tag_autocomplete': lambda data, i: (
+        'GET', f"/api/tags/suggest/?q={data.tag_queries[i % len(data.tag_queries)]}", None, {},
+    ),
+    'api_posts': lambda data, i: ('GET', '/api/posts/' if i % 3 else '/api/posts/?page=2', None, {}),
+}
+
+
+def percentile(values, pct):
+    """Percentil con interpolación lineal entre los dos valores más cercanos."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, queries, statuses, elapsed):
+    """
+    Resumen de un escenario.
+
+    Args:
+        latencies: Milisegundos por solicitud
+        queries: Consultas SQL por solicitud
+        statuses: Códigos de estado por solicitud
+        elapsed: Segundos totales de las solicitudes medidas
+    """
+    status_codes = {}
+    for status in statuses:
+        status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'status_codes': status_codes,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3) if latencies else 0.0,
+        'max_ms': round(max(latencies), 3) if latencies else 0.0,
+        'queries_mean': round(statistics.mean(queries), 2) if queries else 0.0,
+        'queries_max': max(queries) if queries else 0,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+class BenchmarkRunner:
+    """
+    Lanza los escenarios con el cliente de pruebas y recoge las medidas.
+
+    Cada usuario autenticado tiene su propio cliente con la sesión iniciada
+    fuera del tiempo medido.
+    """
+
+    def __init__(self, data, iterations=50, warmup=5, cold_cache=False):
+        self.data = data
+        self.iterations = max(1, iterations)
+        self.warmup = max(0, warmup)
+        self.cold_cache = cold_cache
+        self.anonymous = Client(raise_request_exception=False)
+        self._clients = {}
+        self._requests = 0
+
+    def client_for(self, user_index):
+        if user_index is None:
+            return self.anonymous
+        if user_index not in self._clients:
+            client = Client(raise_request_exception=False)
+            client.force_login(self.data.users[user_index])
+            self._clients[user_index] = client
+        return self._clients[user_index]
+
+    def request(self, scenario, i):
+        method, path, user_index, headers = SCENARIOS[scenario](self.data, i)
+        client = self.client_for(user_index)
+        # Una IP por solicitud: el rate limiting por IP no interviene
+        self._requests += 1
+        remote_addr = f"10.{self._requests // 62500 % 256}.{self._requests // 250 % 250}.{self._requests % 250 + 1}"
+        if self.cold_cache:
+            cache.clear()
+
+        with collect_queries('benchmark', sample_rate=1.0) as stats:
+            start = time.perf_counter()
+            response = client.generic(method, path, REMOTE_ADDR=remote_addr, **headers)
+            duration = time.perf_counter() - start
+        return duration * 1000, stats.count, response.status_code
+
+    def run_scenario(self, scenario):
+        for i in range(self.warmup):
+            self.request(scenario, i)
+
+        latencies, queries, statuses = [], [], []
+        for i in range(self.iterations):
+            latency, query_count, status = self.request(scenario, self.warmup + i)
+            latencies.append(latency)
+            queries.append(query_count)
+            statuses.append(status)
+        return summarize(latencies, queries, statuses, sum(latencies) / 1000)
+
+
+def git_revision():
+    """Commit actual y si hay cambios sin confirmar, o None fuera de git."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True,
+            timeout=5, cwd=settings.BASE_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return {'commit': commit, 'dirty': bool(dirty)}
+
+
+def run_benchmark(scenarios=None, iterations=50, warmup=5, cold_cache=False, progress=None):
+    """
+    Ejecuta los escenarios sobre los datos del benchmark ya generados.
+
+    Args:
+        scenarios: Nombres de ``SCENARIOS`` (por defecto, todos)
+        iterations: Solicitudes medidas por escenario
+        warmup: Solicitudes previas sin medir por escenario
+        cold_cache: Vaciar la caché antes de cada solicitud
+        progress: Callable opcional ``(escenario, resumen)``
+
+    Returns:
+        dict: meta (entorno y parámetros) y scenarios (resumen por escenario)
+    """
+    names = list(scenarios or SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    # Antes de ejecutar: like_toggle cambia los likes
+    dataset = dataset_counts()
+    runner = BenchmarkRunner(BenchmarkData.load(), iterations, warmup, cold_cache)
+    results = {}
+    for name in names:
+        results[name] = runner.run_scenario(name)
+        if progress:
+            progress(name, results[name])
+
+    return {
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'git': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'iterations': runner.iterations,
+            'warmup': runner.warmup,
+            'cold_cache': cold_cache,
+            'dataset': dataset,
+        },
+        'scenarios': results,
+    }
+
+
+def compare_results(baseline, candidate, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara dos resultados de ``run_benchmark`` escenario por escenario.
+
+    Es regresión que p95 suba más de ``threshold`` (fracción), que aumenten
+    las consultas medias o que aparezcan errores nuevos.
+
+    Returns:
+        list: Un dict por escenario común con los valores, la variación
+        relativa de p50/p95/p99 y throughput, y ``regression``
+    """
+    rows = []
+    for name, new in candidate['scenarios'].items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            continue
+        row = {'scenario': name, 'baseline': old, 'candidate': new, 'change': {}}
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps'):
+            row['change'][metric] = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+        row['queries_delta'] = round(new['queries_mean'] - old['queries_mean'], 2)
+        row['regression'] = (
+            row['change']['p95_ms'] > threshold
+            or row['queries_delta'] > 0
+            or new['errors'] > old['errors']
+        )
+        rows.append(row)
+    return rows
@@ -11,6 +11,8 @@ from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
+from blog.tracing import span
+
 logger = logging.getLogger('django.cache')
 
 # Configuración de tiempos de caché
@@ -75,7 +77,8 @@ def cache_page_data(cache_key, data, timeout=None):
         else:
             serialized_data = data
         
-        cache.set(cache_key, serialized_data, timeout)
+        with span('cache.set'):
+            cache.set(cache_key, serialized_data, timeout)
         logger.debug(f"Datos almacenados en caché: {cache_key}")
         
     except Exception as e:
@@ -92,7 +95,10 @@ def get_cached_data(cache_key):
         Datos del caché o None si no existe
     """
     try:
-        data = cache.get(cache_key)
+        with span('cache.get') as cache_span:
+            data = cache.get(cache_key)
+            if cache_span is not None:
+                cache_span.attrs['hit'] = data is not None
         if data is not None:
             logger.debug(f"Datos obtenidos del caché: {cache_key}")
         return data
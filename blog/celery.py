@@ -25,7 +25,13 @@ app.autodiscover_tasks()
 # Configuración de colas
 app.conf.task_routes = {
     'posts.tasks.generate_ai_content': {'queue': 'ai_processing'},
+    'posts.tasks.backfill_cover_images': {'queue': 'ai_processing'},
     'posts.tasks.optimize_images': {'queue': 'media_processing'},
+    'posts.tasks.generate_image_variants': {'queue': 'media_processing'},
+    'posts.tasks.process_uploaded_image': {'queue': 'media_processing'},
+    'posts.tasks.sync_media_catalog': {'queue': 'media_processing'},
+    'posts.tasks.dedupe_media': {'queue': 'media_processing'},
+    'posts.tasks.collect_orphan_media': {'queue': 'media_processing'},
     'accounts.tasks.send_notifications': {'queue': 'notifications'},
     'blog.tasks.maintenance_tasks': {'queue': 'maintenance'},
 }
@@ -60,6 +66,18 @@ app.conf.beat_schedule = {
         'task': 'posts.tasks.update_post_stats',
         'schedule': 60 * 15,  # Cada 15 minutos
     },
+    'sync-media-catalog': {
+        'task': 'posts.tasks.sync_media_catalog',
+        'schedule': 60 * 60,  # Cada hora
+    },
+    'dedupe-media': {
+        'task': 'posts.tasks.dedupe_media',
+        'schedule': 60 * 60 * 24,  # Cada día
+    },
+    'collect-orphan-media': {
+        'task': 'posts.tasks.collect_orphan_media',
+        'schedule': 60 * 60 * 24 * 7,  # Cada semana
+    },
     'optimize-database': {
         'task': 'blog.tasks.optimize_database',
         'schedule': 60 * 60 * 24 * 7,  # Cada semana
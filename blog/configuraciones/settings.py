@@ -84,25 +84,63 @@ TURNSTILE_SITE_KEY = os.environ.get("TURNSTILE_SITE_KEY")
 TURNSTILE_SECRET_KEY = os.environ.get("TURNSTILE_SECRET_KEY")
 
 MIDDLEWARE = [
+    # Trazas por solicitud (se desactiva sola sin muestreo); va la primera
+    "blog.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "blog.metrics.PrometheusMiddleware",
+    # Diagnóstico de memoria (solo con MEMORY_PROFILING_ENABLED)
+    "blog.memory_profiling.MemoryProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django_ratelimit.middleware.RatelimitMiddleware",
     "axes.middleware.AxesMiddleware",
     # Middleware de caché después de AuthenticationMiddleware
     "blog.middleware.cache_middleware.SmartCacheMiddleware",
     "blog.middleware.cache_middleware.APIResponseCacheMiddleware",
+    # Span de la vista; va el último
+    "blog.tracing.ViewTracingMiddleware",
 ]
 
 # Configuración de monitoreo de base de datos
 SLOW_QUERY_THRESHOLD_MS = 100  # Umbral para consultas lentas en ms
 QUERY_COUNT_THRESHOLD = 20     # Umbral para detectar problemas N+1
 MONITOR_DB_QUERIES = not DEBUG  # Monitorear en producción
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', '10'))  # Repeticiones de una misma consulta
+# Fracción de solicitudes con huellas de SQL, detección N+1 e histograma de latencia
+DB_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('DB_INSTRUMENTATION_SAMPLE_RATE', '1.0' if DEBUG else '0.1'))
+
+# Endpoint /metrics de Prometheus: con METRICS_AUTH_TOKEN exige
+# "Authorization: Bearer <token>"; sin él, solo desde METRICS_ALLOWED_IPS
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Trazas por solicitud (blog.tracing): fracción de solicitudes trazadas por
+# defecto y por prefijo de ruta (gana el más largo), p. ej. {"/": 0.01, "/api/": 0.1}.
+# Las trazadas llevan Server-Timing y se escriben en logs/traces.jsonl
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', '0'))
+TRACING_ROUTES = {}
+TRACING_SERVER_TIMING = True
+
+# Profiler por muestreo de los workers (blog.profiler): se activa por sesiones
+# desde /admin/profiler/ o "manage.py profile_workers"
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False').lower() in ('true', '1', 't')
+PROFILER_HZ = int(os.environ.get('PROFILER_HZ', '100'))
+PROFILER_MAX_OVERHEAD = 0.02  # Fracción máxima de CPU dedicada a muestrear
+PROFILER_POLL_SECONDS = 5
+
+# Diagnóstico de memoria (blog.memory_profiling): instantáneas de tracemalloc
+# cada MEMORY_SNAPSHOT_EVERY solicitudes por worker y RSS por vista.
+# Ralentiza las asignaciones: activar solo para buscar fugas
+MEMORY_PROFILING_ENABLED = os.environ.get('MEMORY_PROFILING_ENABLED', 'False').lower() in ('true', '1', 't')
+MEMORY_SNAPSHOT_EVERY = int(os.environ.get('MEMORY_SNAPSHOT_EVERY', '200'))
+MEMORY_PROFILING_FRAMES = int(os.environ.get('MEMORY_PROFILING_FRAMES', '1'))  # Marcos por asignación
+
+# Presupuestos de consultas por vista (check_query_budgets), versionados con el código
+QUERY_BUDGET_FILE = BASE_DIR / "query_budgets.json"
 
 # Configuración de PgBouncer
 USE_PGBOUNCER = os.environ.get('USE_PGBOUNCER', 'False').lower() in ('true', '1', 't')
@@ -120,7 +158,8 @@ ROOT_URLCONF = "blog.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates con spans de renderizado para blog.tracing
+        "BACKEND": "blog.tracing.TracedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -332,6 +371,31 @@ CACHES = configure_cache()
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# El storage por defecto mantiene al día el catálogo de imágenes (posts.MediaAsset)
+STORAGES = {
+    "default": {"BACKEND": "posts.storage.CatalogFileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Miniaturas bajo demanda (/media/thumbs/<ancho>x<alto>/<ruta>)
+THUMBNAIL_CACHE_ROOT = MEDIA_ROOT / "cache" / "thumbs"
+THUMBNAIL_SIZES = [(150, 150), (300, 300), (400, 300), (600, 400)]
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+
+# Píxeles decodificados a la vez entre todos los workers de media (posts.image_pipeline)
+IMAGE_PIXEL_BUDGET = int(os.environ.get("IMAGE_PIXEL_BUDGET", "64000000"))
+# Prefijo interno de nginx para servir las miniaturas con X-Accel-Redirect (vacío = Django)
+THUMBNAIL_ACCEL_REDIRECT = os.environ.get("THUMBNAIL_ACCEL_REDIRECT", "")
+
+# Envío de media (posts.media_serving): "django", "accel" (nginx X-Accel-Redirect)
+# o "sendfile" (X-Sendfile). Con "accel", MEDIA_ACCEL_PREFIX es la location
+# internal de nginx que apunta a MEDIA_ROOT.
+MEDIA_SERVE_MODE = os.environ.get("MEDIA_SERVE_MODE", "django")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# URLs de media con el hash del contenido (/media/h/<hash>/...), cacheables como immutable
+MEDIA_HASHED_URLS = os.environ.get("MEDIA_HASHED_URLS", "False").lower() in ('true', '1', 't')
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -349,13 +413,13 @@ AUTHENTICATION_BACKENDS = (
 DATA_UPLOAD_MAX_MEMORY_SIZE = 8388608  # 8 MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 8388608  # 8 MB
 
-# Configuración de Rate Limiting
-RATELIMIT_ENABLE = True
-RATELIMIT_USE_CACHE = "default"
-
 # Configuración de protección DDoS
 DDOS_THRESHOLD = os.environ.get('DDOS_THRESHOLD', '100/m')
 DDOS_BLOCK_DURATION = int(os.environ.get('DDOS_BLOCK_DURATION', '3600'))  # 1 hora
+# Fracción del umbral que cada worker admite por IP sin consultar Redis
+DDOS_PREFILTER_FRACTION = float(os.environ.get('DDOS_PREFILTER_FRACTION', '0.5'))
+# Segundos entre descargas de la lista de IPs bloqueadas (filtro de Bloom)
+DDOS_BLOCKLIST_REFRESH = int(os.environ.get('DDOS_BLOCKLIST_REFRESH', '5'))
 
 # IPs en whitelist para rate limiting
 RATE_LIMIT_WHITELIST_IPS = [
@@ -400,6 +464,10 @@ LOGGING = {
             "format": "{levelname} {message}",
             "style": "{",
         },
+        "raw": {
+            "format": "{message}",
+            "style": "{",
+        },
         "json": {
             "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
             "format": "%(asctime)s %(name)s %(levelname)s %(message)s %(pathname)s %(lineno)s",
@@ -443,6 +511,14 @@ LOGGING = {
             "backupCount": 5,
             "formatter": "json",
         },
+        "traces": {
+            "level": "INFO",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": os.path.join(BASE_DIR, "logs", "traces.jsonl"),
+            "maxBytes": 1024*1024*10,  # 10 MB
+            "backupCount": 3,
+            "formatter": "raw",
+        },
     },
     "root": {
         "handlers": ["console"],
@@ -469,6 +545,11 @@ LOGGING = {
             "level": "DEBUG" if DEBUG else "WARNING",
             "propagate": False,
         },
+        "blog.tracing": {
+            "handlers": ["traces"],
+            "level": "INFO",
+            "propagate": False,
+        },
         "posts": {
             "handlers": ["console", "file"],
             "level": "INFO",
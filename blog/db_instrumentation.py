@@ -0,0 +1,228 @@
+"""
+Instrumentación de consultas SQL con ``connection.execute_wrapper``.
+
+``connection.queries`` solo se llena con DEBUG=True, así que en producción
+los monitores de consultas veían cero. Aquí un wrapper instalado en cada
+conexión mide las consultas con DEBUG o sin él y las anota en los
+recolectores (``QueryStats``) activos en el contexto actual: una
+solicitud, un bloque de ``QueryCountMonitor``... Los recolectores viven en
+una ``ContextVar``, así que funcionan igual con WSGI, ASGI y hilos.
+
+El coste está acotado:
+
+- Sin recolector activo, el wrapper solo llama a ``execute``.
+- Con recolector: número de consultas, tiempo total y consultas lentas
+  (dos lecturas del reloj y una suma por consulta).
+- Solo si el recolector está muestreado (``DB_INSTRUMENTATION_SAMPLE_RATE``):
+  huella de la SQL normalizada, que detecta los N+1 (la misma huella
+  repetida más de ``N_PLUS_ONE_THRESHOLD`` veces), desglose por tipo y el
+  histograma ``DB_QUERY_LATENCY`` de ``blog.metrics``.
+"""
+
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('blog.db_monitoring')
+
+# Consultas lentas guardadas por recolector
+MAX_SLOW_QUERIES = 50
+
+_active_collectors = ContextVar('db_query_collectors', default=())
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+QUERY_TYPES = frozenset(('select', 'insert', 'update', 'delete'))
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Normaliza una consulta para agruparla con las de la misma forma.
+
+    Los literales y los parámetros pasan a ``?`` y las listas de valores
+    (``IN (%s, %s, %s)``, ``VALUES (...)``) a ``(?+)``, así que
+    ``WHERE id = 1`` y ``WHERE id = 2`` dan la misma huella.
+    """
+    normalized = _STRING.sub('?', sql)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _VALUE_LIST.sub('(?+)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+def query_type(sql):
+    """select, insert, update, delete u other."""
+    keyword = sql.lstrip()[:6].lower()
+    return keyword if keyword in QUERY_TYPES else 'other'
+
+
+def should_sample(sample_rate=None):
+    """Decide si un recolector nuevo entra en la muestra."""
+    if sample_rate is None:
+        sample_rate = getattr(settings, 'DB_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+    return sample_rate >= 1 or random.random() < sample_rate
+
+
+class QueryStats:
+    """
+    Recolector de consultas de una solicitud o de un bloque de código.
+
+    Uso:
+    ```
+    with QueryStats('Nombre de operación') as stats:
+        # Código que ejecuta consultas
+    stats.count, stats.duration_ms, stats.repeated()
+    ```
+
+    ``start``/``stop`` permiten abrirlo y cerrarlo en llamadas distintas
+    (``process_request``/``process_response``). Los recolectores se pueden
+    anidar: cada consulta cuenta en todos los activos.
+    """
+
+    def __init__(self, label=None, sampled=True, slow_threshold_ms=None):
+        self.label = label
+        self.sampled = sampled
+        if slow_threshold_ms is None:
+            slow_threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.by_type = Counter()
+        self.slow_queries = []
+        self.elapsed = 0.0
+        self._started_at = None
+        self._previous = None
+
+    def start(self):
+        self._previous = _active_collectors.get()
+        _active_collectors.set(self._previous + (self,))
+        self._started_at = time.perf_counter()
+        return self
+
+    def stop(self):
+        if self._started_at is None:
+            return self
+        self.elapsed = time.perf_counter() - self._started_at
+        _active_collectors.set(self._previous)
+        self._started_at = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def record(self, sql, duration, sql_fingerprint=None, sql_type=None):
+        self.count += 1
+        self.duration += duration
+        if duration >= self.slow_threshold and len(self.slow_queries) < MAX_SLOW_QUERIES:
+            self.slow_queries.append({
+                'index': self.count - 1,
+                'time_ms': duration * 1000,
+                'sql': sql[:500],
+            })
+        if sql_fingerprint is not None:
+            self.fingerprints[sql_fingerprint] += 1
+            self.by_type[sql_type] += 1
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @property
+    def elapsed_ms(self):
+        return self.elapsed * 1000
+
+    def repeated(self, threshold=None):
+        """
+        Huellas repetidas más de ``threshold`` veces (posibles N+1), de más
+        a menos frecuente. Vacío si el recolector no está muestreado.
+        """
+        if threshold is None:
+            threshold = getattr(settings, 'N_PLUS_ONE_THRESHOLD', 10)
+        return {
+            sql_fingerprint: count
+            for sql_fingerprint, count in self.fingerprints.most_common()
+            if count > threshold
+        }
+
+    def as_dict(self):
+        return {
+            'label': self.label,
+            'sampled': self.sampled,
+            'query_count': self.count,
+            'db_time_ms': self.duration_ms,
+            'elapsed_ms': self.elapsed_ms,
+            'queries_by_type': dict(self.by_type),
+            'repeated_queries': self.repeated(),
+            'slow_queries': self.slow_queries,
+        }
+
+
+def collect_queries(label=None, sample_rate=None):
+    """``QueryStats`` sin iniciar, muestreado según ``sample_rate``."""
+    return QueryStats(label, sampled=should_sample(sample_rate))
+
+
+def instrument_query(execute, sql, params, many, context):
+    """Wrapper de ``execute_wrapper`` instalado en todas las conexiones."""
+    collectors = _active_collectors.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            _record(collectors, sql, duration)
+        except Exception as e:
+            # La instrumentación nunca debe romper una consulta
+            logger.error(f"Error en la instrumentación de consultas: {e}")
+
+
+def _record(collectors, sql, duration):
+    sql_fingerprint = sql_type = None
+    if any(stats.sampled for stats in collectors):
+        sql_fingerprint = fingerprint(sql)
+        sql_type = query_type(sql)
+    for stats in collectors:
+        if stats.sampled:
+            stats.record(sql, duration, sql_fingerprint, sql_type)
+        else:
+            stats.record(sql, duration)
+    if sql_type is not None:
+        from blog.metrics import track_db_query
+        track_db_query(sql_type, duration)
+
+
+def _install_wrapper(connection, **kwargs):
+    # Al principio de la lista: ``execute_wrapper()`` saca el último al salir
+    if instrument_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, instrument_query)
+
+
+def install_query_instrumentation():
+    """
+    Instala el wrapper en cada conexión al crearse (y en las ya abiertas).
+    Se llama desde ``BlogConfig.ready``.
+    """
+    connection_created.connect(_install_wrapper, dispatch_uid='blog.db_instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(connection)
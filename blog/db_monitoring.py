@@ -1,8 +1,8 @@
 import logging
-import time
-from django.db import connection
 from django.conf import settings
 
+from blog.db_instrumentation import QueryStats, collect_queries
+
 logger = logging.getLogger('django.db.backends')
 
 class QueryMonitoringMiddleware:
@@ -16,85 +16,62 @@ class QueryMonitoringMiddleware:
         self.query_count_threshold = getattr(settings, 'QUERY_COUNT_THRESHOLD', 20)
     
     def __call__(self, request):
-        # Inicializar contadores
-        start_queries = len(connection.queries)
-        start_time = time.time()
-        
-        # Procesar la solicitud
-        response = self.get_response(request)
-        
         # Solo monitorear en DEBUG o si se ha configurado explícitamente
-        if settings.DEBUG or getattr(settings, 'MONITOR_DB_QUERIES', False):
-            # Calcular estadísticas
-            end_time = time.time()
-            end_queries = len(connection.queries)
-            
-            duration = (end_time - start_time) * 1000  # ms
-            query_count = end_queries - start_queries
-            
-            # Registrar información básica
-            request_path = request.path
-            request_method = request.method
-            user_id = getattr(request.user, 'id', None)
-            
-            # Detectar posibles problemas N+1
-            if query_count > self.query_count_threshold:
-                logger.warning(
-                    f"Posible problema N+1 detectado: {query_count} consultas para {request_method} {request_path}",
-                    extra={
-                        'request_path': request_path,
-                        'request_method': request_method,
-                        'query_count': query_count,
-                        'duration_ms': duration,
-                        'user_id': user_id,
-                    }
-                )
-                
-                # Registrar las consultas para diagnóstico
-                query_details = []
-                for i, query in enumerate(connection.queries[start_queries:end_queries]):
-                    query_time = float(query.get('time', 0)) * 1000  # ms
-                    query_sql = query.get('sql', '')
-                    
-                    # Registrar consultas lentas individualmente
-                    if query_time > self.slow_query_threshold:
-                        logger.warning(
-                            f"Consulta lenta ({query_time:.2f}ms): {query_sql[:200]}...",
-                            extra={
-                                'query_time_ms': query_time,
-                                'query_sql': query_sql,
-                                'request_path': request_path,
-                            }
-                        )
-                    
-                    query_details.append({
-                        'index': i,
-                        'time_ms': query_time,
-                        'sql': query_sql[:500],  # Limitar longitud
-                    })
-                
-                # Registrar detalles completos en nivel DEBUG
-                logger.debug(
-                    f"Detalles de consultas para {request_method} {request_path}",
-                    extra={
-                        'query_details': query_details,
-                        'request_path': request_path,
-                    }
-                )
-            
-            # Registrar tiempo total si es lento
-            if duration > self.slow_query_threshold * 2:  # Umbral más alto para el tiempo total
-                logger.warning(
-                    f"Solicitud lenta: {duration:.2f}ms con {query_count} consultas para {request_method} {request_path}",
-                    extra={
-                        'request_path': request_path,
-                        'request_method': request_method,
-                        'duration_ms': duration,
-                        'query_count': query_count,
-                        'user_id': user_id,
-                    }
-                )
-        
+        if not (settings.DEBUG or getattr(settings, 'MONITOR_DB_QUERIES', False)):
+            return self.get_response(request)
+
+        # Procesar la solicitud midiendo sus consultas
+        with collect_queries(f"{request.method} {request.path}") as stats:
+            response = self.get_response(request)
+
+        # Calcular estadísticas
+        duration = stats.elapsed_ms
+        query_count = stats.count
+
+        # Registrar información básica
+        request_path = request.path
+        request_method = request.method
+        user_id = getattr(request.user, 'id', None)
+
+        # Detectar posibles problemas N+1
+        repeated = stats.repeated()
+        if repeated or query_count > self.query_count_threshold:
+            logger.warning(
+                f"Posible problema N+1 detectado: {query_count} consultas para {request_method} {request_path}",
+                extra={
+                    'request_path': request_path,
+                    'request_method': request_method,
+                    'query_count': query_count,
+                    'duration_ms': duration,
+                    'repeated_queries': repeated,
+                    'user_id': user_id,
+                }
+            )
+
+        # Registrar consultas lentas individualmente
+        for query in stats.slow_queries:
+            logger.warning(
+                f"Consulta lenta ({query['time_ms']:.2f}ms): {query['sql'][:200]}...",
+                extra={
+                    'query_time_ms': query['time_ms'],
+                    'query_sql': query['sql'],
+                    'request_path': request_path,
+                }
+            )
+
+        # Registrar tiempo total si es lento
+        if duration > self.slow_query_threshold * 2:  # Umbral más alto para el tiempo total
+            logger.warning(
+                f"Solicitud lenta: {duration:.2f}ms con {query_count} consultas para {request_method} {request_path}",
+                extra={
+                    'request_path': request_path,
+                    'request_method': request_method,
+                    'duration_ms': duration,
+                    'query_count': query_count,
+                    'user_id': user_id,
+                }
+            )
+
         return response
 
 
@@ -111,42 +88,45 @@ class QueryCountMonitor:
     
     def __init__(self, operation_name):
         self.operation_name = operation_name
-        self.start_queries = 0
-        self.start_time = 0
+        # Bloques explícitos: siempre con huellas, sin muestreo
+        self.stats = QueryStats(operation_name)
     
     def __enter__(self):
-        self.start_queries = len(connection.queries)
-        self.start_time = time.time()
+        self.stats.start()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        end_time = time.time()
-        end_queries = len(connection.queries)
-        
-        duration = (end_time - self.start_time) * 1000  # ms
-        query_count = end_queries - self.start_queries
+        stats = self.stats.stop()
         
         logger.info(
-            f"[QueryMonitor] {self.operation_name}: {query_count} consultas en {duration:.2f}ms",
+            f"[QueryMonitor] {self.operation_name}: {stats.count} consultas "
+            f"({stats.duration_ms:.2f}ms en BD) en {stats.elapsed_ms:.2f}ms",
             extra={
                 'operation': self.operation_name,
-                'query_count': query_count,
-                'duration_ms': duration,
+                'query_count': stats.count,
+                'db_time_ms': stats.duration_ms,
+                'duration_ms': stats.elapsed_ms,
             }
         )
         
-        # Registrar consultas individuales en nivel DEBUG
-        for i, query in enumerate(connection.queries[self.start_queries:end_queries]):
-            query_time = float(query.get('time', 0)) * 1000  # ms
-            query_sql = query.get('sql', '')
-            
+        repeated = stats.repeated()
+        if repeated:
+            logger.warning(
+                f"[QueryMonitor] {self.operation_name}: posible problema N+1",
+                extra={
+                    'operation': self.operation_name,
+                    'repeated_queries': repeated,
+                }
+            )
+        
+        # Registrar consultas agrupadas por huella en nivel DEBUG
+        for sql_fingerprint, count in stats.fingerprints.most_common():
             logger.debug(
-                f"[QueryMonitor] {self.operation_name} - Consulta {i+1}: {query_time:.2f}ms",
+                f"[QueryMonitor] {self.operation_name} - {count}x {sql_fingerprint[:200]}",
                 extra={
                     'operation': self.operation_name,
-                    'query_index': i,
-                    'query_time_ms': query_time,
-                    'query_sql': query_sql,
+                    'query_count': count,
+                    'query_sql': sql_fingerprint,
                 }
             )
 
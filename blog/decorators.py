@@ -6,7 +6,8 @@ from functools import wraps
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from django_ratelimit.decorators import ratelimit
+from blog.ratelimit import ratelimit_view
+from blog.rate_limit_policy import rate_limit_policy, retry_after_seconds
 
 
 def ajax_login_required(view_func):
@@ -61,27 +62,34 @@ def ajax_required(view_func):
     return wrapper
 
 
-def sensitive_post_limit(rate='5/minute', group=None):
+def _post_rate_limit(rate, group):
     """
-    Decorador para limitar acciones sensibles como cambios de perfil.
+    Limita los POST de una vista por usuario (o IP si es anónimo).
+    Sin ``group``, cada vista tiene su propio límite.
     """
     def decorator(view_func):
+        limit_group = group or f"{view_func.__module__}.{view_func.__qualname__}"
+
         @wraps(view_func)
-        @ratelimit(key='user', rate=rate, method='POST', block=True, group=group)
         def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                result = rate_limit_policy.check(request, limit_group, rate)
+                if not result['allowed']:
+                    return ratelimit_view(request, block_time=retry_after_seconds(result))
             return view_func(request, *args, **kwargs)
         return wrapper
     return decorator
 
 
+def sensitive_post_limit(rate='5/minute', group=None):
+    """
+    Decorador para limitar acciones sensibles como cambios de perfil.
+    """
+    return _post_rate_limit(rate, group)
+
+
 def user_action_limit(rate='10/minute', group=None):
     """
     Decorador para limitar acciones generales del usuario.
     """
-    def decorator(view_func):
-        @wraps(view_func)
-        @ratelimit(key='user', rate=rate, method='POST', block=True, group=group)
-        def wrapper(request, *args, **kwargs):
-            return view_func(request, *args, **kwargs)
-        return wrapper
-    return decorator
\ No newline at end of file
+    return _post_rate_limit(rate, group)
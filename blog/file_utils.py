@@ -3,14 +3,148 @@ Utilidades para manejo seguro de archivos.
 """
 
 import os
-import magic
 from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
 from django.conf import settings
 from PIL import Image
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bytes iniciales necesarios para reconocer el formato de una imagen
+IMAGE_HEADER_SIZE = 16
+
+# Dimensiones a partir de las cuales se rechaza una imagen sin decodificarla
+MAX_UPLOAD_DIMENSIONS = (8000, 8000)
+
+
+def sniff_image_type(header):
+    """
+    Reconoce el tipo de imagen por sus bytes mágicos.
+    
+    Args:
+        header: Primeros bytes del archivo (al menos IMAGE_HEADER_SIZE)
+        
+    Returns:
+        str: Tipo MIME o None si no es una imagen conocida
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header[4:8] == b'ftyp' and header[8:12] in (b'avif', b'avis'):
+        return 'image/avif'
+    return None
+
+
+def inspect_image(uploaded_file, max_dimensions=MAX_UPLOAD_DIMENSIONS):
+    """
+    Comprueba que un archivo sea una imagen decodificable sin cargarla entera.
+    
+    Las dimensiones se leen de la cabecera y, si son aceptables, se buscan
+    archivos truncados o corruptos: los JPEG se decodifican en modo
+    ``draft`` (a 1/8 de la resolución); el resto de formatos no tiene modo
+    reducido, así que se comprueban con ``verify()``, que recorre el
+    archivo sin decodificar los píxeles.
+    
+    Returns:
+        tuple: (is_valid, error_message, (ancho, alto))
+    """
+    try:
+        uploaded_file.seek(0)
+        with Image.open(uploaded_file) as img:
+            width, height = img.size
+            if width > max_dimensions[0] or height > max_dimensions[1]:
+                return False, f"Imagen demasiado grande. Máximo: {max_dimensions[0]}x{max_dimensions[1]}", (width, height)
+            if img.format == 'JPEG':
+                img.draft('RGB', (max(1, width // 8), max(1, height // 8)))
+                img.load()
+            else:
+                img.verify()
+        return True, "Archivo válido", (width, height)
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        return False, f"Archivo de imagen corrupto: {str(e)}", (None, None)
+    finally:
+        uploaded_file.seek(0)
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """
+    Valida las imágenes mientras se reciben, antes de que se guarden.
+    
+    Se coloca el primero en ``request.upload_handlers``: reconoce el formato
+    por los bytes mágicos del primer bloque y corta la subida en cuanto el
+    archivo supera ``max_size``. Los archivos rechazados se descartan sin
+    llegar a los handlers de memoria o de archivo temporal; el motivo queda
+    en ``error``.
+    """
+    
+    def __init__(self, request=None, field_name='upload', max_size=5 * 1024 * 1024, allowed_types=None):
+        super().__init__(request)
+        self.upload_field = field_name
+        self.max_size = max_size
+        self.allowed_types = allowed_types
+        self.error = None
+        self.detected_type = None
+        self._active = False
+        self._head = b''
+    
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._active = field_name == self.upload_field
+        self._head = b''
+    
+    def _reject(self, message):
+        self.error = message
+        logger.warning(f"Subida rechazada ({self.file_name}): {message}")
+        raise SkipFile(message)
+    
+    def receive_data_chunk(self, raw_data, start):
+        if not self._active:
+            return raw_data
+        
+        if start + len(raw_data) > self.max_size:
+            self._reject(f"El archivo es demasiado grande. Máximo permitido: {self.max_size // (1024 * 1024)}MB")
+        
+        if self.detected_type is None:
+            # Retener los primeros bytes hasta poder reconocer el formato
+            self._head += raw_data
+            if len(self._head) < IMAGE_HEADER_SIZE:
+                return None
+            self.detected_type = sniff_image_type(self._head)
+            if self.detected_type is None or (self.allowed_types and self.detected_type not in self.allowed_types):
+                self._reject("El contenido del archivo no es una imagen permitida")
+            raw_data, self._head = self._head, b''
+        
+        return raw_data
+    
+    def file_complete(self, file_size):
+        if self._active and self.detected_type is None and self.error is None:
+            self.error = "El contenido del archivo no es una imagen permitida"
+        return None
+
+
+def install_image_upload_handler(request, **kwargs):
+    """
+    Antepone ``StreamingImageUploadHandler`` a los handlers de la petición.
+    
+    Debe llamarse antes de acceder a ``request.POST`` o ``request.FILES``.
+    
+    Returns:
+        StreamingImageUploadHandler o None si el cuerpo ya se había procesado
+    """
+    handler = StreamingImageUploadHandler(request, **kwargs)
+    try:
+        request.upload_handlers.insert(0, handler)
+    except AttributeError:
+        logger.debug("El cuerpo de la petición ya se había procesado; se valida después de recibirlo")
+        return None
+    return handler
+
 
 class SecureFileValidator:
     """
@@ -43,29 +177,20 @@ class SecureFileValidator:
             if uploaded_file.size > cls.MAX_FILE_SIZE:
                 return False, f"El archivo es demasiado grande. Máximo permitido: {cls.MAX_FILE_SIZE // (1024*1024)}MB"
             
-            # Verificar tipo MIME
+            # Verificar tipo por los bytes mágicos
             uploaded_file.seek(0)
-            file_content = uploaded_file.read(1024)
+            header = uploaded_file.read(IMAGE_HEADER_SIZE)
             uploaded_file.seek(0)
             
-            mime_type = magic.from_buffer(file_content, mime=True)
+            mime_type = sniff_image_type(header)
             
             if mime_type not in cls.ALLOWED_IMAGE_TYPES:
                 return False, f"Tipo de archivo no permitido: {mime_type}"
             
-            # Verificar que sea una imagen válida
-            try:
-                with Image.open(uploaded_file) as img:
-                    # Verificar dimensiones
-                    if img.size[0] > cls.MAX_IMAGE_DIMENSIONS[0] or img.size[1] > cls.MAX_IMAGE_DIMENSIONS[1]:
-                        return False, f"Imagen demasiado grande. Máximo: {cls.MAX_IMAGE_DIMENSIONS[0]}x{cls.MAX_IMAGE_DIMENSIONS[1]}"
-                    
-                    # Verificar formato
-                    if img.format.lower() not in ['jpeg', 'png', 'gif', 'webp']:
-                        return False, "Formato de imagen no válido"
-                        
-            except Exception as e:
-                return False, f"Archivo de imagen corrupto: {str(e)}"
+            # Verificar dimensiones e integridad sin decodificar a tamaño completo
+            is_valid, error_message, _ = inspect_image(uploaded_file, cls.MAX_IMAGE_DIMENSIONS)
+            if not is_valid:
+                return False, error_message
             
             uploaded_file.seek(0)
             return True, "Archivo válido"
@@ -105,18 +230,14 @@ def secure_save_uploaded_file(uploaded_file, upload_path, validate_func=None, op
         # Crear ruta completa
         full_path = os.path.join(upload_path, safe_filename)
         
-        # Optimizar imagen si se solicita
-        if optimize and uploaded_file.content_type.startswith('image/'):
-            try:
-                optimized_file = optimize_image(uploaded_file)
-                if optimized_file:
-                    uploaded_file = optimized_file
-            except Exception as e:
-                logger.warning(f"No se pudo optimizar imagen: {e}")
-        
         # Guardar archivo
         saved_path = default_storage.save(full_path, uploaded_file)
         
+        # La optimización se hace en la cola de media, fuera de la petición
+        if optimize and uploaded_file.content_type.startswith('image/'):
+            from posts.uploads import schedule_upload_processing
+            schedule_upload_processing(saved_path)
+        
         logger.info(f"Archivo guardado exitosamente: {saved_path}")
         return True, saved_path
         
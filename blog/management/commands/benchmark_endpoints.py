@@ -0,0 +1,202 @@
+"""
+Comando de gestión para el benchmark de los endpoints más usados.
+
+``run`` crea una base de datos de pruebas desechable (SQLite o el
+PostgreSQL local de ``DATABASES``, sin red), genera el conjunto de datos,
+lanza los escenarios de ``blog.benchmarking`` y guarda el resultado en
+JSON. ``compare`` enfrenta dos resultados, p. ej. de dos commits.
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from blog.benchmarking import (
+    DEFAULT_SIZES, DEFAULT_THRESHOLD, SCENARIOS, compare_results, dataset_counts, generate_dataset,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia, consultas y throughput de los endpoints principales con datos generados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--action',
+            type=str,
+            choices=['run', 'compare'],
+            default='run',
+            help='Acción a realizar'
+        )
+        parser.add_argument(
+            '--scenarios',
+            nargs='+',
+            choices=list(SCENARIOS),
+            help='Escenarios a ejecutar (por defecto, todos)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Solicitudes medidas por escenario'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Solicitudes sin medir antes de cada escenario'
+        )
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Vaciar la caché antes de cada solicitud'
+        )
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(
+                f'--{name}',
+                type=int,
+                default=default,
+                help=f'Cantidad de {name} a generar'
+            )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semilla del generador de datos'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Conservar la base de datos de pruebas (y sus datos) entre ejecuciones'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Archivo JSON de resultados (por defecto benchmarks/<fecha>-<commit>.json)'
+        )
+        parser.add_argument(
+            'files',
+            nargs='*',
+            help='Con --action compare: resultado base y resultado nuevo'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Subida relativa de p95 considerada regresión (0.10 = 10%%)'
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Terminar con error si compare encuentra regresiones'
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'compare':
+            self.compare(options)
+        else:
+            self.run(options)
+
+    def run(self, options):
+        self.stdout.write(self.style.SUCCESS('Benchmark de endpoints'))
+        self.stdout.write('=' * 50)
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            dataset = dataset_counts()
+            if dataset['posts']:
+                self.stdout.write(f"Reutilizando datos existentes: {dataset}")
+            else:
+                sizes = {name: options[name] for name in DEFAULT_SIZES}
+                dataset = generate_dataset(seed=options['seed'], **sizes)
+                self.stdout.write(f"Datos generados en {dataset['seconds']}s: {dataset}")
+
+            self.stdout.write(
+                f"Iteraciones: {options['iterations']}, calentamiento: {options['warmup']}, "
+                f"caché: {'fría' if options['cold_cache'] else 'caliente'}\n"
+            )
+            results = run_benchmark(
+                scenarios=options['scenarios'],
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                cold_cache=options['cold_cache'],
+                progress=self.show_scenario,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        results['meta']['seed'] = options['seed']
+        output = options['output'] or self.default_output(results)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f"\nResultados guardados en {output}"))
+
+    @staticmethod
+    def default_output(results):
+        git = results['meta']['git']
+        revision = (git['commit'] + ('-dirty' if git['dirty'] else '')) if git else 'nogit'
+        return os.path.join('benchmarks', f"{timezone.now():%Y%m%d-%H%M%S}-{revision}.json")
+
+    def show_scenario(self, name, summary):
+        style = self.style.ERROR if summary['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"{name:<17} p50 {summary['p50_ms']:8.2f}ms  p95 {summary['p95_ms']:8.2f}ms  "
+            f"p99 {summary['p99_ms']:8.2f}ms  {summary['queries_mean']:6.1f} consultas  "
+            f"{summary['throughput_rps']:7.1f} req/s  errores {summary['errors']}"
+        ))
+        if summary['errors']:
+            self.stdout.write(self.style.ERROR(f"  Códigos de estado: {summary['status_codes']}"))
+
+    def compare(self, options):
+        if len(options['files']) != 2:
+            raise CommandError('compare necesita dos archivos: resultado base y resultado nuevo')
+        try:
+            baseline, candidate = (self.load(path) for path in options['files'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"No se pudo leer el resultado: {e}")
+
+        self.stdout.write(self.style.SUCCESS('Comparación de benchmarks'))
+        self.stdout.write('=' * 50)
+        for label, result in (('Base', baseline), ('Nuevo', candidate)):
+            git = result['meta'].get('git') or {}
+            self.stdout.write(
+                f"{label}: {git.get('commit', 'sin commit')}{' (con cambios)' if git.get('dirty') else ''}, "
+                f"{result['meta']['database']}, {result['meta']['timestamp']}"
+            )
+        if baseline['meta'].get('dataset') != candidate['meta'].get('dataset'):
+            self.stdout.write(self.style.NOTICE('Los conjuntos de datos no coinciden: la comparación es orientativa'))
+        if baseline['meta'].get('cold_cache') != candidate['meta'].get('cold_cache'):
+            self.stdout.write(self.style.NOTICE('Uno de los resultados se midió con la caché fría y el otro no'))
+
+        rows = compare_results(baseline, candidate, options['threshold'])
+        self.stdout.write('')
+        for row in rows:
+            old, new, change = row['baseline'], row['candidate'], row['change']
+            style = self.style.ERROR if row['regression'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f"{row['scenario']:<17} p50 {old['p50_ms']:.2f}→{new['p50_ms']:.2f}ms ({change['p50_ms']:+.0%})  "
+                f"p95 {old['p95_ms']:.2f}→{new['p95_ms']:.2f}ms ({change['p95_ms']:+.0%})  "
+                f"consultas {old['queries_mean']:.1f}→{new['queries_mean']:.1f}  "
+                f"req/s {change['throughput_rps']:+.0%}"
+            ))
+
+        regressions = [row['scenario'] for row in rows if row['regression']]
+        if regressions:
+            message = f"Regresiones en: {', '.join(regressions)}"
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.ERROR(f"\n{message}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nSin regresiones'))
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,139 @@
+"""
+Comando de gestión para medir el motor de rate limiting.
+
+Compara la ventana deslizante anterior (lista de timestamps en caché,
+leída y reescrita en cada solicitud) con ``blog.rate_limit_engine``:
+latencia por comprobación y solicitudes admitidas de más cuando varios
+hilos comparten la misma clave.
+"""
+
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from blog.rate_limit_engine import LocalRateLimitBackend, RateLimitEngine, create_backend
+
+PERIOD = 3600
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia y la exactitud del motor de rate limiting'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Comprobaciones por caso'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Límite de solicitudes por hora de la clave medida'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Hilos en la prueba de concurrencia'
+        )
+
+    def handle(self, *args, **options):
+        iterations = max(1, options['iterations'])
+        limit = max(1, options['limit'])
+        threads = max(1, options['threads'])
+        cache = caches['default']
+
+        engines = [('Motor GCRA', RateLimitEngine(create_backend(cache)))]
+        if engines[0][1].backend.name != 'local':
+            engines.append(('Motor GCRA (local)', RateLimitEngine(LocalRateLimitBackend(cache))))
+
+        self.stdout.write(self.style.SUCCESS('Benchmark de rate limiting'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f'Caché: {cache.__class__.__name__}, iteraciones: {iterations}, '
+            f'límite: {limit}/h, hilos: {threads}'
+        )
+
+        self.stdout.write('\nLatencia por comprobación:')
+        self._report('Anterior (lista en caché)', self._latencies(
+            lambda key: self._legacy_check(cache, key, limit), iterations,
+        ))
+        for label, engine in engines:
+            self._report(f'{label} [{engine.backend.name}]', self._latencies(
+                lambda key, engine=engine: engine.check(key, limit, PERIOD), iterations,
+            ))
+
+        self.stdout.write(f'\nAdmitidas con {threads} hilos sobre una clave (límite {limit}):')
+        attempts = max(limit * 2, threads)
+        self._report_admitted('Anterior (lista en caché)', limit, self._admitted(
+            lambda key: self._legacy_check(cache, key, limit), attempts, threads,
+        ))
+        for label, engine in engines:
+            self._report_admitted(f'{label} [{engine.backend.name}]', limit, self._admitted(
+                lambda key, engine=engine: engine.check(key, limit, PERIOD)['allowed'], attempts, threads,
+            ))
+
+    @staticmethod
+    def _legacy_check(cache, key, limit):
+        """Reproduce ``AdvancedRateLimitMiddleware._check_rate_limit`` anterior."""
+        now = time.time()
+        request_times = [t for t in cache.get(key, []) if t > now - PERIOD]
+        if len(request_times) >= limit:
+            return False
+        request_times.append(now)
+        cache.set(key, request_times, PERIOD + 60)
+        return True
+
+    @staticmethod
+    def _key():
+        return f"benchmark_rate_limit:{uuid.uuid4().hex}"
+
+    def _latencies(self, check, iterations):
+        """Tiempos en ms; la clave se llena hasta el límite, como en producción."""
+        key = self._key()
+        times = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            check(key)
+            times.append((time.perf_counter() - start) * 1000)
+        caches['default'].delete(key)
+        return times
+
+    def _admitted(self, check, attempts, threads):
+        key = self._key()
+        admitted = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(count):
+            barrier.wait()
+            allowed = sum(1 for _ in range(count) if check(key))
+            with lock:
+                admitted.append(allowed)
+
+        per_thread = -(-attempts // threads)
+        workers = [threading.Thread(target=worker, args=(per_thread,)) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        caches['default'].delete(key)
+        return sum(admitted)
+
+    def _report(self, label, times):
+        ordered = sorted(times)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f'  {label}: media {statistics.mean(times):.3f}ms, '
+            f'mediana {statistics.median(times):.3f}ms, p95 {p95:.3f}ms'
+        )
+
+    def _report_admitted(self, label, limit, admitted):
+        style = self.style.SUCCESS if admitted == limit else self.style.ERROR
+        self.stdout.write(style(f'  {label}: {admitted} admitidas ({admitted - limit:+d})'))
@@ -0,0 +1,96 @@
+"""
+Comando de gestión para los presupuestos de consultas por vista.
+
+``check`` falla (código de salida distinto de cero) si alguna vista hace más
+consultas con más datos (salvo las de ``KNOWN_GROWTH``) o supera el
+presupuesto de alguno de los tamaños; ``update`` reescribe el
+archivo de presupuestos con las medidas actuales (ver ``blog.query_budgets``).
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from blog.query_budgets import (
+    SIZES, VIEWS, budget_path, evaluate, format_failure, load_budgets, measure_sizes, save_budgets,
+    updated_budgets,
+)
+
+
+class Command(BaseCommand):
+    help = 'Comprueba que las consultas de cada vista no crecen con los datos ni superan su presupuesto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--action',
+            type=str,
+            choices=['check', 'update'],
+            default='check',
+            help='Acción a realizar'
+        )
+        parser.add_argument(
+            '--views',
+            nargs='+',
+            choices=list(VIEWS),
+            help='Vistas a medir (por defecto, todas)'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=int,
+            default=0,
+            help='Consultas de más permitidas con el tamaño grande y sobre cada presupuesto'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Presupuestos de consultas por vista'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(', '.join(
+            f"{size}: {counts['posts']} posts, {counts['comments']} comentarios" for size, counts in SIZES.items()
+        ))
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            measurements = measure_sizes(options['views'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        budgets = load_budgets()
+        if options['action'] == 'update':
+            budgets = updated_budgets(measurements, budgets)
+            save_budgets(budgets)
+            for name in measurements['large']:
+                self.stdout.write(
+                    f"  {name:<15} {budgets[name]['small']['max_queries']:>4} → "
+                    f"{budgets[name]['large']['max_queries']:<4} consultas"
+                )
+            self.stdout.write(self.style.SUCCESS(f"\nPresupuestos guardados en {budget_path()}"))
+            return
+
+        results = evaluate(measurements, budgets, options['tolerance'])
+        for result in results:
+            counts = f"{result['small']['count']:>4} → {result['large']['count']:<4}"
+            budget = ' → '.join(
+                str(result['budget'][size]['max_queries']) if size in result['budget'] else '-' for size in SIZES
+            )
+            if result['failures']:
+                self.stdout.write(self.style.ERROR(f"  {result['view']:<15} {counts} presupuesto {budget}"))
+            elif result['growth']:
+                self.stdout.write(self.style.NOTICE(
+                    f"  {result['view']:<15} {counts} presupuesto {budget} (N+1 conocido: {result['known_growth']})"
+                ))
+            elif result['known_growth']:
+                self.stdout.write(self.style.NOTICE(
+                    f"  {result['view']:<15} {counts} presupuesto {budget} (ya no crece: quitar de KNOWN_GROWTH)"
+                ))
+            else:
+                self.stdout.write(f"  {result['view']:<15} {counts} presupuesto {budget}")
+
+        failures = [result for result in results if result['failures']]
+        if failures:
+            self.stdout.write('')
+            for result in failures:
+                self.stdout.write(self.style.ERROR(format_failure(result)))
+            raise CommandError(f"{len(failures)} vistas incumplen su presupuesto de consultas")
+        self.stdout.write(self.style.SUCCESS('\nTodas las vistas dentro de presupuesto'))
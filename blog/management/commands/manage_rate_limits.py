@@ -3,10 +3,10 @@ Comando de gestión para monitorear y administrar rate limits.
 """
 import json
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
 from django.contrib.auth.models import User
 from blog.rate_limit_config import rate_limit_config, get_rate_limit_for_user
-from blog.ratelimit import get_client_ip
+from blog.rate_limit_local import get_ddos_blocklist
+from blog.rate_limit_policy import rate_limit_policy
 
 
 class Command(BaseCommand):
@@ -76,7 +76,7 @@ class Command(BaseCommand):
         
         # Mostrar estadísticas de caché
         self.stdout.write('\nEstadísticas de caché:')
-        cache_keys = self._get_rate_limit_cache_keys()
+        cache_keys = rate_limit_policy.active_keys()
         self.stdout.write(f"  Claves activas: {len(cache_keys)}")
         
         # Mostrar límites activos por IP/usuario
@@ -86,25 +86,25 @@ class Command(BaseCommand):
     def clear_limits(self, options):
         """Limpia los rate limits."""
         if options.get('ip'):
-            self._clear_ip_limits(options['ip'])
+            cleared = rate_limit_policy.clear(ip=options['ip'])
             self.stdout.write(
-                self.style.SUCCESS(f"Rate limits limpiados para IP: {options['ip']}")
+                self.style.SUCCESS(f"Rate limits limpiados para IP: {options['ip']} ({cleared} claves)")
             )
         elif options.get('user_id'):
-            self._clear_user_limits(options['user_id'])
+            cleared = rate_limit_policy.clear(user_id=options['user_id'])
             self.stdout.write(
-                self.style.SUCCESS(f"Rate limits limpiados para usuario: {options['user_id']}")
+                self.style.SUCCESS(f"Rate limits limpiados para usuario: {options['user_id']} ({cleared} claves)")
             )
         elif options.get('group'):
-            self._clear_group_limits(options['group'])
+            cleared = rate_limit_policy.clear(group=options['group'])
             self.stdout.write(
-                self.style.SUCCESS(f"Rate limits limpiados para grupo: {options['group']}")
+                self.style.SUCCESS(f"Rate limits limpiados para grupo: {options['group']} ({cleared} claves)")
             )
         else:
             # Limpiar todos los rate limits
-            self._clear_all_limits()
+            cleared = rate_limit_policy.clear()
             self.stdout.write(
-                self.style.SUCCESS("Todos los rate limits han sido limpiados")
+                self.style.SUCCESS(f"Todos los rate limits han sido limpiados ({cleared} claves)")
             )
     
     def manage_whitelist(self, options):
@@ -138,9 +138,8 @@ class Command(BaseCommand):
         
         duration = options.get('duration', 3600)
         
-        # Agregar a blacklist temporal
-        blacklist_key = f"blacklisted:{ip}"
-        cache.set(blacklist_key, True, duration)
+        # Agregar a la lista de bloqueo compartida de la protección DDoS
+        get_ddos_blocklist().block(ip, duration)
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -153,42 +152,19 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('Estadísticas de Rate Limiting'))
         self.stdout.write('=' * 50)
         
-        # Obtener todas las claves de rate limiting
-        cache_keys = self._get_rate_limit_cache_keys()
+        # Estado de todos los buckets en una sola lectura, agrupado por regla
+        stats = {}
+        for item in rate_limit_policy.bucket_stats():
+            stats.setdefault(item['group'], []).append(item)
         
-        # Agrupar por tipo
-        stats = {
-            'global': [],
-            'api': [],
-            'search': [],
-            'auth': [],
-            'upload': [],
-            'suspicious': [],
-            'other': []
-        }
+        if not stats:
+            self.stdout.write('\nNo hay buckets activos')
         
-        for key in cache_keys:
-            data = cache.get(key)
-            if data:
-                # Determinar categoría
-                category = 'other'
-                for cat in stats.keys():
-                    if cat in key:
-                        category = cat
-                        break
-                
-                stats[category].append({
-                    'key': key,
-                    'count': len(data) if isinstance(data, list) else data,
-                    'data': data
-                })
-        
-        # Mostrar estadísticas
-        for category, items in stats.items():
-            if items:
-                self.stdout.write(f'\n{category.upper()}:')
-                for item in items[:10]:  # Mostrar solo los primeros 10
-                    self.stdout.write(f"  {item['key']}: {item['count']} solicitudes")
+        # Mostrar estadísticas (los más cargados primero)
+        for group, items in sorted(stats.items()):
+            self.stdout.write(f'\n{group.upper()} ({len(items)} activos):')
+            for item in items[:10]:  # Mostrar solo los primeros 10
+                self.stdout.write(f"  {item['identifier']}: {self._describe(item)}")
         
         # Exportar si se especifica
         if options.get('export'):
@@ -200,15 +176,9 @@ class Command(BaseCommand):
             ip = options['ip']
             self.stdout.write(f'\nLímites para IP {ip}:')
             
-            # Buscar claves relacionadas con esta IP
-            cache_keys = self._get_rate_limit_cache_keys()
-            ip_keys = [key for key in cache_keys if ip in key]
-            
-            for key in ip_keys:
-                data = cache.get(key)
-                if data:
-                    count = len(data) if isinstance(data, list) else data
-                    self.stdout.write(f"  {key}: {count}")
+            for item in rate_limit_policy.bucket_stats():
+                if item['identifier'] == f"ip:{ip}":
+                    self.stdout.write(f"  {item['group']}: {self._describe(item)}")
         
         if options.get('user_id'):
             user_id = options['user_id']
@@ -221,69 +191,21 @@ class Command(BaseCommand):
                     limit = get_rate_limit_for_user(user, category)
                     self.stdout.write(f"  {category}: {limit}")
                 
-                # Buscar claves relacionadas con este usuario
-                cache_keys = self._get_rate_limit_cache_keys()
-                user_keys = [key for key in cache_keys if f"user:{user_id}" in key]
-                
-                for key in user_keys:
-                    data = cache.get(key)
-                    if data:
-                        count = len(data) if isinstance(data, list) else data
-                        self.stdout.write(f"  {key}: {count}")
+                # Buckets activos de este usuario
+                for item in rate_limit_policy.bucket_stats():
+                    if item['identifier'] == f"user:{user_id}":
+                        self.stdout.write(f"  {item['group']}: {self._describe(item)}")
                         
             except User.DoesNotExist:
                 self.stdout.write(
                     self.style.ERROR(f"Usuario con ID {user_id} no encontrado")
                 )
     
-    def _get_rate_limit_cache_keys(self):
-        """Obtiene todas las claves de rate limiting del caché."""
-        # Nota: Esta implementación depende del backend de caché
-        # Para Redis, se puede usar KEYS pattern
-        # Para otros backends, puede requerir un enfoque diferente
-        
-        try:
-            # Intentar con Redis
-            from django.core.cache.backends.redis import RedisCache
-            if isinstance(cache, RedisCache):
-                return cache._cache.get_client().keys('ratelimit:*')
-        except ImportError:
-            pass
-        
-        # Fallback: retornar lista vacía
-        # En producción, se debería implementar un sistema de tracking
-        return []
-    
-    def _clear_ip_limits(self, ip):
-        """Limpia los rate limits para una IP específica."""
-        cache_keys = self._get_rate_limit_cache_keys()
-        ip_keys = [key for key in cache_keys if ip in key.decode() if isinstance(key, bytes) else ip in key]
-        
-        for key in ip_keys:
-            cache.delete(key)
-    
-    def _clear_user_limits(self, user_id):
-        """Limpia los rate limits para un usuario específico."""
-        cache_keys = self._get_rate_limit_cache_keys()
-        user_keys = [key for key in cache_keys if f"user:{user_id}" in (key.decode() if isinstance(key, bytes) else key)]
-        
-        for key in user_keys:
-            cache.delete(key)
-    
-    def _clear_group_limits(self, group):
-        """Limpia los rate limits para un grupo específico."""
-        cache_keys = self._get_rate_limit_cache_keys()
-        group_keys = [key for key in cache_keys if group in (key.decode() if isinstance(key, bytes) else key)]
-        
-        for key in group_keys:
-            cache.delete(key)
-    
-    def _clear_all_limits(self):
-        """Limpia todos los rate limits."""
-        cache_keys = self._get_rate_limit_cache_keys()
-        
-        for key in cache_keys:
-            cache.delete(key)
+    @staticmethod
+    def _describe(item):
+        """Uso y cola de un bucket."""
+        usage = f"{item['usage']:.0%} del límite, " if item['usage'] is not None else ''
+        return f"{usage}se vacía en {item['backlog']:.0f}s"
     
     def _export_stats(self, stats, filename):
         """Exporta estadísticas a un archivo JSON."""
@@ -295,7 +217,8 @@ class Command(BaseCommand):
                 for item in items:
                     export_data[category].append({
                         'key': item['key'],
-                        'count': item['count']
+                        'usage': item['usage'],
+                        'backlog_seconds': item['backlog'],
                     })
             
             with open(filename, 'w') as f:
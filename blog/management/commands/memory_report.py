@@ -0,0 +1,94 @@
+"""
+Comando de gestión para ver el diagnóstico de memoria de los workers.
+
+Los informes los publica ``MemoryProfilingMiddleware`` con
+``MEMORY_PROFILING_ENABLED`` (ver ``blog.memory_profiling``).
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from blog.memory_profiling import clear_reports, worker_reports
+
+
+def _mb(value):
+    return f"{value / 1024 / 1024:.1f}MB" if value is not None else 'n/d'
+
+
+class Command(BaseCommand):
+    help = 'Muestra los puntos de asignación que más crecen y la RSS por vista de cada worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--action',
+            type=str,
+            choices=['show', 'clear'],
+            default='show',
+            help='Acción a realizar'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Sitios y vistas a mostrar por worker'
+        )
+        parser.add_argument(
+            '--export',
+            type=str,
+            help='Archivo JSON donde exportar los informes completos'
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'clear':
+            clear_reports()
+            self.stdout.write(self.style.SUCCESS('Informes de memoria borrados'))
+            return
+
+        reports = worker_reports()
+        self.stdout.write(self.style.SUCCESS('Diagnóstico de memoria de los workers'))
+        self.stdout.write('=' * 50)
+        if not reports:
+            self.stdout.write(self.style.NOTICE(
+                'Sin informes: activa MEMORY_PROFILING_ENABLED y espera a '
+                'MEMORY_SNAPSHOT_EVERY solicitudes por worker'
+            ))
+            return
+
+        for report in reports:
+            self.show_report(report, options['top'])
+
+        if options['export']:
+            with open(options['export'], 'w') as f:
+                json.dump(reports, f, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"\nInformes exportados a {options['export']}"))
+
+    def show_report(self, report, top):
+        self.stdout.write(
+            f"\nWorker {report['worker']}: {report['requests']} solicitudes, "
+            f"{report['snapshots']} instantáneas, RSS {_mb(report['rss'])} "
+            f"(+{_mb(report['rss_growth'])} desde el arranque), "
+            f"trazada {_mb(report['traced_current'])}"
+        )
+
+        if report['suspects']:
+            self.stdout.write(self.style.ERROR('  Posibles fugas (crecen en cada intervalo):'))
+            for entry in report['suspects'][:top]:
+                self.stdout.write(self.style.ERROR(
+                    f"    {entry['site']}: +{entry['size_diff'] / 1024:.1f}KB, "
+                    f"{entry['streak']} intervalos"
+                ))
+
+        self.stdout.write('  Sitios que más crecieron en el último intervalo:')
+        for entry in report['top_growth'][:top]:
+            self.stdout.write(
+                f"    +{entry['size_diff'] / 1024:8.1f}KB  {entry['count_diff']:+6d} bloques  {entry['site']}"
+            )
+
+        views = sorted(report['views'].items(), key=lambda item: item[1]['rss_delta'], reverse=True)
+        self.stdout.write('  Vistas por crecimiento acumulado de RSS:')
+        for endpoint, view in views[:top]:
+            average = view['rss_delta'] / view['requests'] / 1024
+            self.stdout.write(
+                f"    {_mb(view['rss_delta']):>9}  media {average:7.1f}KB  "
+                f"máx {_mb(view['rss_delta_max'])}  ({view['requests']} solicitudes)  {endpoint}"
+            )
@@ -0,0 +1,125 @@
+"""
+Comando de gestión para el profiler por muestreo de los workers.
+
+Requiere ``PROFILER_ENABLED`` en los workers (ver ``blog.profiler``).
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.profiler import (
+    format_collapsed, merged_stacks, session_status, start_session, stop_session,
+)
+
+
+class Command(BaseCommand):
+    help = 'Activa el profiler por muestreo en los workers y exporta sus pilas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--action',
+            type=str,
+            choices=['start', 'stop', 'status', 'dump'],
+            default='status',
+            help='Acción a realizar'
+        )
+        parser.add_argument(
+            '--duration',
+            type=int,
+            default=60,
+            help='Segundos de muestreo al iniciar'
+        )
+        parser.add_argument(
+            '--hz',
+            type=int,
+            help='Muestras por segundo (por defecto PROFILER_HZ)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Archivo de pilas colapsadas (por defecto, la salida estándar)'
+        )
+        parser.add_argument(
+            '--per-worker',
+            action='store_true',
+            help='Separar las pilas por worker'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Pilas más frecuentes a mostrar en status'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+
+        if action == 'start':
+            self.start(options)
+        elif action == 'stop':
+            stop_session()
+            self.stdout.write(self.style.SUCCESS('Sesión de profiling detenida'))
+        elif action == 'status':
+            self.show_status(options)
+        elif action == 'dump':
+            self.dump(options)
+
+    def start(self, options):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            self.stdout.write(self.style.NOTICE(
+                'PROFILER_ENABLED está desactivado: los workers no atenderán la sesión'
+            ))
+        hz = options['hz']
+        if hz is not None and not 1 <= hz <= 1000:
+            raise CommandError('--hz debe estar entre 1 y 1000')
+        duration = max(1, options['duration'])
+        control = start_session(duration, hz)
+        self.stdout.write(self.style.SUCCESS(
+            f"Profiling iniciado: {control['hz']} Hz durante {duration}s (sesión {control['session']})"
+        ))
+        self.stdout.write('Los workers lo recogen en sus próximos segundos; usa --action dump al terminar.')
+
+    def show_status(self, options):
+        status = session_status()
+
+        self.stdout.write(self.style.SUCCESS('Estado del profiler'))
+        self.stdout.write('=' * 50)
+        session = status['session']
+        if session:
+            remaining = session['until'] - time.time()
+            self.stdout.write(f"Sesión activa {session['session']}: {session['hz']} Hz, quedan {remaining:.0f}s")
+        else:
+            self.stdout.write('Sin sesión activa')
+
+        self.stdout.write(f"\nWorkers con resultados: {len(status['workers'])}")
+        for worker in status['workers']:
+            overhead = worker['overhead'] * 100
+            style = self.style.ERROR if overhead > 2 else self.style.SUCCESS
+            self.stdout.write(style(
+                f"  {worker['worker']}: {worker['samples']} muestras, "
+                f"{worker['stack_count']} pilas, coste {overhead:.2f}% de CPU"
+            ))
+
+        stacks = merged_stacks()
+        if stacks:
+            total = sum(stacks.values())
+            self.stdout.write(f"\nPilas más frecuentes ({total} muestras de hilo):")
+            for stack, count in stacks.most_common(options['top']):
+                leaf = stack.rsplit(';', 1)[-1]
+                self.stdout.write(f"  {count / total * 100:5.1f}%  {leaf}")
+
+    def dump(self, options):
+        stacks = merged_stacks(per_worker=options['per_worker'])
+        if not stacks:
+            raise CommandError('No hay resultados de profiling publicados')
+
+        content = format_collapsed(stacks)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(content + '\n')
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(stacks)} pilas exportadas a {options['output']} (flamegraph.pl o speedscope)"
+            ))
+        else:
+            self.stdout.write(content)
@@ -0,0 +1,269 @@
+"""
+Modo de diagnóstico de memoria para los workers.
+
+``max_requests`` recicla los workers para contener el crecimiento de
+memoria, a costa de perder las cachés calientes. Este modo sirve para
+encontrar qué crece de verdad:
+
+- ``tracemalloc`` se activa en cada worker con su primera solicitud y cada
+  ``MEMORY_SNAPSHOT_EVERY`` solicitudes se toma una instantánea y se compara
+  con la anterior. Los puntos de asignación que más crecen se registran, y
+  los que crecen en ``LEAK_STREAK`` intervalos seguidos se marcan como
+  posibles fugas.
+- Se mide la RSS antes y después de cada solicitud y se acumula el delta por
+  plantilla de ruta: qué vistas dejan el proceso más grande.
+
+Cada worker publica su informe en su propia clave de la caché compartida
+(``blog.worker_registry``); el comando ``memory_report`` los junta. Es solo
+para diagnóstico (``tracemalloc`` ralentiza las asignaciones):
+``MEMORY_PROFILING_ENABLED`` lo activa y, sin él, el middleware se
+desactiva. Con él activo ``gunicorn_config.py`` no recicla los workers: con
+``max_requests`` un worker no viviría las ``LEAK_STREAK`` instantáneas
+necesarias para marcar una fuga.
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+
+from blog.metrics import endpoint_label
+from blog.profiler import worker_id
+from blog.worker_registry import WorkerRegistry
+
+logger = logging.getLogger('blog.memory')
+
+WORKERS_KEY = 'memory:workers'
+REPORT_KEY = 'memory:report:'
+RESULTS_TTL = 24 * 3600
+
+# Intervalos seguidos creciendo (y crecimiento mínimo en el último) para
+# considerar un sitio posible fuga
+LEAK_STREAK = 3
+LEAK_MIN_BYTES = 10 * 1024
+# Sitios por informe y sitios con racha seguidos
+TOP_SITES = 15
+TRACKED_SITES = 100
+
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+registry = WorkerRegistry(WORKERS_KEY, REPORT_KEY, RESULTS_TTL)
+
+try:
+    PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def current_rss():
+    """RSS actual del proceso en bytes, o None si no se puede leer."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class LeakDetector:
+    """
+    Instantáneas periódicas de ``tracemalloc`` y deltas de RSS por vista
+    de un proceso.
+    """
+
+    def __init__(self, snapshot_every=200, frames=1):
+        self.snapshot_every = max(1, snapshot_every)
+        self.frames = max(1, frames)
+        self.key_type = 'traceback' if self.frames > 1 else 'lineno'
+        self.pid = os.getpid()
+        self.requests = 0
+        self.snapshots = 0
+        self.started_at = time.time()
+        self.start_rss = current_rss()
+        self.views = {}
+        self.top_growth = []
+        self.streaks = {}
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._previous = self._snapshot()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def record_request(self, endpoint, rss_delta):
+        """Acumula el delta de RSS de una solicitud; devuelve True si toca instantánea."""
+        with self._lock:
+            self.requests += 1
+            if rss_delta is not None:
+                view = self.views.setdefault(endpoint, {'requests': 0, 'rss_delta': 0, 'rss_delta_max': 0})
+                view['requests'] += 1
+                view['rss_delta'] += rss_delta
+                view['rss_delta_max'] = max(view['rss_delta_max'], rss_delta)
+            return self.requests % self.snapshot_every == 0
+
+    def compare(self):
+        """
+        Toma una instantánea, la compara con la anterior y actualiza las
+        rachas de crecimiento.
+
+        Returns:
+            list: Sitios que más crecieron (dicts con site, size_diff,
+            count_diff, size, streak y, con varios marcos, traceback)
+        """
+        snapshot = self._snapshot()
+        stats = snapshot.compare_to(self._previous, self.key_type)
+        self._previous = snapshot
+        self.snapshots += 1
+
+        growing = [stat for stat in stats if stat.size_diff > 0]
+        growing_sites = {str(stat.traceback[-1]) for stat in growing[:TRACKED_SITES]}
+        self.streaks = {
+            site: self.streaks.get(site, 0) + 1 for site in growing_sites
+        }
+
+        top = []
+        for stat in growing[:TOP_SITES]:
+            site = str(stat.traceback[-1])
+            entry = {
+                'site': site,
+                'size_diff': stat.size_diff,
+                'count_diff': stat.count_diff,
+                'size': stat.size,
+                'streak': self.streaks.get(site, 0),
+            }
+            if self.frames > 1:
+                entry['traceback'] = stat.traceback.format()
+            top.append(entry)
+        self.top_growth = top
+        return top
+
+    def suspects(self):
+        return sorted(
+            (
+                entry for entry in self.top_growth
+                if entry['streak'] >= LEAK_STREAK and entry['size_diff'] >= LEAK_MIN_BYTES
+            ),
+            key=lambda entry: entry['size_diff'], reverse=True,
+        )
+
+    def report(self):
+        rss = current_rss()
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        return {
+            'worker': worker_id(),
+            'requests': self.requests,
+            'snapshots': self.snapshots,
+            'started_at': self.started_at,
+            'updated_at': time.time(),
+            'rss': rss,
+            'rss_growth': rss - self.start_rss if rss is not None and self.start_rss is not None else None,
+            'traced_current': traced_current,
+            'traced_peak': traced_peak,
+            'top_growth': self.top_growth,
+            'suspects': self.suspects(),
+            'views': self.views,
+        }
+
+    def publish(self):
+        """Publica el informe de este worker en la caché compartida."""
+        report = self.report()
+        worker = report['worker']
+        cache.set(f"{REPORT_KEY}{worker}", report, RESULTS_TTL)
+        registry.register(worker)
+        return report
+
+
+def worker_reports():
+    """Informes publicados por los workers, más recientes primero."""
+    reports = registry.results()
+    return sorted(reports.values(), key=lambda report: report['updated_at'], reverse=True)
+
+
+def clear_reports():
+    registry.clear()
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_leak_detector():
+    """Detector de este proceso; con ``preload_app`` se crea tras el fork."""
+    global _detector
+    if _detector is None or _detector.pid != os.getpid():
+        with _detector_lock:
+            if _detector is None or _detector.pid != os.getpid():
+                detector = LeakDetector(
+                    snapshot_every=getattr(settings, 'MEMORY_SNAPSHOT_EVERY', 200),
+                    frames=getattr(settings, 'MEMORY_PROFILING_FRAMES', 1),
+                )
+                detector.start()
+                _detector = detector
+    return _detector
+
+
+class MemoryProfilingMiddleware(MiddlewareMixin):
+    """
+    Delta de RSS por vista e instantáneas de ``tracemalloc`` cada
+    ``MEMORY_SNAPSHOT_EVERY`` solicitudes. La solicitud que toca la
+    instantánea tarda más (la comparación corre en ella).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMORY_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        get_leak_detector()
+        request._memory_rss_start = current_rss()
+        return None
+
+    def process_response(self, request, response):
+        start_rss = getattr(request, '_memory_rss_start', None)
+        if start_rss is None:
+            return response
+
+        detector = get_leak_detector()
+        end_rss = current_rss()
+        rss_delta = end_rss - start_rss if end_rss is not None else None
+        if not detector.record_request(endpoint_label(request), rss_delta):
+            return response
+
+        try:
+            top = detector.compare()
+            report = detector.publish()
+            logger.info(
+                f"Memoria de {report['worker']} tras {report['requests']} solicitudes: "
+                f"RSS {report['rss'] or 0:,} bytes, trazada {report['traced_current']:,} bytes",
+                extra={'top_growth': top[:5]}
+            )
+            for entry in report['suspects']:
+                logger.warning(
+                    f"Posible fuga de memoria en {entry['site']}: +{entry['size_diff']:,} bytes "
+                    f"en el último intervalo, {entry['streak']} intervalos seguidos creciendo",
+                    extra={'leak_site': entry}
+                )
+        except Exception as e:
+            # No fallar si hay problemas con el diagnóstico
+            logger.error(f"Error en el perfilado de memoria: {e}")
+        return response
@@ -1,11 +1,27 @@
 """
 Configuración de métricas con Prometheus para monitoreo.
+
+Con gunicorn cada worker tiene su propio registro, así que un scrape solo
+vería el del worker que responde. ``gunicorn_config.py`` define
+``PROMETHEUS_MULTIPROC_DIR`` antes de cargar la aplicación: prometheus_client
+escribe entonces los valores de cada proceso en archivos mmap de ese
+directorio y ``metrics_view`` los agrega todos. Sin la variable (runserver,
+Celery, comandos) se usa el registro normal del proceso.
 """
 
+import hmac
+import os
 import time
 import logging
-from prometheus_client import Counter, Histogram, Gauge, Summary
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, Summary,
+    generate_latest,
+)
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.urls import Resolver404, resolve
 from django.utils.deprecation import MiddlewareMixin
+from django.views.decorators.cache import never_cache
 
 logger = logging.getLogger('django.metrics')
 
@@ -43,17 +59,19 @@ DB_QUERY_LATENCY = Histogram(
     buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
 )
 
-# Gauges
+# Gauges ("livesum": suma de los workers vivos en modo multiproceso)
 ACTIVE_USERS = Gauge(
     'django_active_users',
     'Usuarios activos actualmente',
-    ['authenticated']
+    ['authenticated'],
+    multiprocess_mode='livesum'
 )
 
 ACTIVE_REQUESTS = Gauge(
     'django_active_requests',
     'Solicitudes activas actualmente',
-    ['method']
+    ['method'],
+    multiprocess_mode='livesum'
 )
 
 # Summaries
@@ -64,6 +82,22 @@ RESPONSE_SIZE = Summary(
 )
 
 
+def endpoint_label(request):
+    """
+    Etiqueta del endpoint: la plantilla de la ruta (``posts/<slug:slug>/``),
+    no ``request.path``, para no crear una serie por URL. Las rutas que no
+    resuelven (404, escaneos) comparten una sola etiqueta.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Respondida antes de resolver la vista (caché, rate limiting...)
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return '<unmatched>'
+    return match.route or match.view_name or '<unmatched>'
+
+
 class PrometheusMiddleware(MiddlewareMixin):
     """
     Middleware para recolectar métricas de Prometheus.
@@ -79,31 +113,34 @@ class PrometheusMiddleware(MiddlewareMixin):
         method = request.method
         ACTIVE_REQUESTS.labels(method=method).inc()
         
-        # Registrar usuarios activos
-        is_authenticated = request.user.is_authenticated
-        ACTIVE_USERS.labels(authenticated=str(is_authenticated)).inc()
+        # Registrar usuarios activos; la etiqueta se guarda para decrementar
+        # la misma aunque la vista inicie o cierre sesión
+        user = getattr(request, 'user', None)
+        request._metrics_authenticated = str(bool(user and user.is_authenticated))
+        ACTIVE_USERS.labels(authenticated=request._metrics_authenticated).inc()
     
     def process_response(self, request, response):
         """
         Procesa la respuesta saliente.
         """
+        # Solo si process_request se ejecutó (un middleware anterior puede
+        # haber respondido antes)
+        if not hasattr(request, '_metrics_authenticated'):
+            return response
+        
         # Decrementar contador de solicitudes activas
         method = request.method
         ACTIVE_REQUESTS.labels(method=method).dec()
         
         # Decrementar contador de usuarios activos
-        is_authenticated = getattr(request, 'user', None) and request.user.is_authenticated
-        ACTIVE_USERS.labels(authenticated=str(is_authenticated)).dec()
+        ACTIVE_USERS.labels(authenticated=request._metrics_authenticated).dec()
         
         # Calcular duración
         if hasattr(request, 'start_time'):
             duration = time.time() - request.start_time
             
             # Determinar endpoint para las métricas
-            if hasattr(request, 'resolver_match') and request.resolver_match:
-                endpoint = request.resolver_match.view_name
-            else:
-                endpoint = request.path
+            endpoint = endpoint_label(request)
             
             # Registrar latencia
             REQUEST_LATENCY.labels(
@@ -132,10 +169,7 @@ class PrometheusMiddleware(MiddlewareMixin):
         Procesa excepciones.
         """
         # Determinar endpoint para las métricas
-        if hasattr(request, 'resolver_match') and request.resolver_match:
-            endpoint = request.resolver_match.view_name
-        else:
-            endpoint = request.path
+        endpoint = endpoint_label(request)
         
         # Registrar error
         ERROR_COUNTER.labels(
@@ -183,4 +217,39 @@ def track_error(error_type, endpoint=None):
     ERROR_COUNTER.labels(
         error_type=error_type,
         endpoint=endpoint or 'unknown'
-    ).inc()
\ No newline at end of file
+    ).inc()
+
+
+# Exposición de métricas
+
+def metrics_registry():
+    """
+    Registro a exponer: en modo multiproceso, uno nuevo que agrega los
+    archivos de todos los workers; si no, el del proceso.
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def _metrics_allowed(request):
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', None)
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        return hmac.compare_digest(header, f"Bearer {token}")
+    # Sin token: solo desde las IPs permitidas (el propio host por defecto)
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    return request.META.get('REMOTE_ADDR') in allowed_ips
+
+
+@never_cache
+def metrics_view(request):
+    """
+    Vista ``/metrics`` para Prometheus, con las métricas de todos los workers.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
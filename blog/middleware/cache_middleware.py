@@ -36,6 +36,7 @@ class SmartCacheMiddleware(MiddlewareMixin):
             '/logout/',
             '/dashboard/',
             '/accounts/',
+            '/metrics',
         ]
         
         super().__init__(get_response)
@@ -1,12 +1,13 @@
 """
 Query monitoring middleware for detecting slow queries and N+1 problems.
 """
-import time
 import logging
 from django.conf import settings
 from django.db import connection
 from django.utils.deprecation import MiddlewareMixin
 
+from blog.db_instrumentation import QueryStats, should_sample
+
 logger = logging.getLogger('query_monitor')
 
 
@@ -23,22 +24,27 @@ class QueryMonitoringMiddleware(MiddlewareMixin):
         super().__init__(get_response)
     
     def process_request(self, request):
-        """Reset query tracking at the start of each request."""
-        self.start_time = time.time()
-        self.start_queries = len(connection.queries)
+        """Start collecting this request's queries."""
+        if not settings.DEBUG and not getattr(settings, 'ENABLE_QUERY_MONITORING', False):
+            return None
+        # Measured by blog.db_instrumentation, so it works without DEBUG too
+        request._query_monitor_stats = QueryStats(
+            f"{request.method} {request.path}",
+            sampled=should_sample(),
+            slow_threshold_ms=self.slow_query_threshold * 1000,
+        ).start()
         return None
     
     def process_response(self, request, response):
         """Log query statistics after request processing."""
-        if not settings.DEBUG and not getattr(settings, 'ENABLE_QUERY_MONITORING', False):
+        stats = getattr(request, '_query_monitor_stats', None)
+        if stats is None:
             return response
-            
-        end_time = time.time()
-        total_time = end_time - self.start_time
+        stats.stop()
         
-        # Calculate query metrics
-        total_queries = len(connection.queries) - self.start_queries
-        query_time = sum(float(query['time']) for query in connection.queries[self.start_queries:])
+        total_time = stats.elapsed
+        total_queries = stats.count
+        query_time = stats.duration
         
         # Log basic metrics
         logger.info(
@@ -49,10 +55,7 @@ class QueryMonitoringMiddleware(MiddlewareMixin):
         )
         
         # Check for slow queries
-        slow_queries = [
-            query for query in connection.queries[self.start_queries:]
-            if float(query['time']) > self.slow_query_threshold
-        ]
+        slow_queries = stats.slow_queries
         
         if slow_queries:
             logger.warning(
@@ -60,45 +63,19 @@ class QueryMonitoringMiddleware(MiddlewareMixin):
             )
             for query in slow_queries:
                 logger.warning(
-                    f"Query time: {query['time']}s | SQL: {query['sql'][:200]}..."
+                    f"Query time: {query['time_ms'] / 1000:.3f}s | SQL: {query['sql'][:200]}..."
                 )
         
-        # Check for potential N+1 problems
-        if total_queries > self.n_plus_one_threshold:
+        # Check for potential N+1 problems: the same normalized query repeated
+        similar_queries = stats.repeated(self.n_plus_one_threshold)
+        if similar_queries or total_queries > self.n_plus_one_threshold:
             logger.warning(
                 f"Potential N+1 query problem detected: {total_queries} queries in single request"
             )
-            
-            # Analyze query patterns
-            similar_queries = self._analyze_query_patterns(connection.queries[self.start_queries:])
             if similar_queries:
                 logger.warning(f"Similar query patterns found: {similar_queries}")
         
         return response
-    
-    def _analyze_query_patterns(self, queries):
-        """Analyze queries to detect similar patterns that might indicate N+1 problems."""
-        query_patterns = {}
-        
-        for query in queries:
-            # Normalize SQL by removing specific values
-            normalized_sql = self._normalize_sql(query['sql'])
-            if normalized_sql in query_patterns:
-                query_patterns[normalized_sql] += 1
-            else:
-                query_patterns[normalized_sql] = 1
-        
-        # Return patterns that appear more than 3 times
-        return {pattern: count for pattern, count in query_patterns.items() if count > 3}
-    
-    def _normalize_sql(self, sql):
-        """Normalize SQL query by removing specific values."""
-        import re
-        # Remove specific IDs and values
-        normalized = re.sub(r'\b\d+\b', 'N', sql)
-        normalized = re.sub(r"'[^']*'", "'VALUE'", normalized)
-        normalized = re.sub(r'"[^"]*"', '"VALUE"', normalized)
-        return normalized[:100]  # Truncate for grouping
 
 
 class QueryCountMiddleware(MiddlewareMixin):
@@ -0,0 +1,296 @@
+"""
+Profiler por muestreo para los workers en producción.
+
+Un hilo de cada worker lee ``sys._current_frames()`` a ``PROFILER_HZ``
+muestras por segundo y cuenta las pilas de todos los demás hilos. Cada pocos
+segundos publica el recuento en su propia clave de la caché compartida
+(``blog.worker_registry``) en formato de pilas colapsadas
+(``modulo:funcion;modulo:funcion N``, el que leen flamegraph.pl y
+speedscope). El comando ``profile_workers`` y la vista de administración
+``/admin/profiler/`` lo activan para todos los workers y unen sus pilas.
+
+Es opcional (``PROFILER_ENABLED``). Con él activo, cada worker tiene un hilo
+de control que solo consulta una clave de caché cada ``PROFILER_POLL_SECONDS``;
+el muestreo solo corre mientras dura una sesión iniciada desde el comando o
+la vista. El coste está acotado: si una muestra tarda más de
+``PROFILER_MAX_OVERHEAD`` del intervalo, el intervalo se alarga.
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from blog.worker_registry import WorkerRegistry
+
+logger = logging.getLogger('blog.profiler')
+
+CONTROL_KEY = 'profiler:control'
+WORKERS_KEY = 'profiler:workers'
+STACKS_KEY = 'profiler:stacks:'
+
+# Profundidad máxima de pila y pilas distintas publicadas por worker
+MAX_DEPTH = 64
+MAX_STACKS = 5000
+# Segundos que se conservan los resultados tras la última publicación
+RESULTS_TTL = 3600
+
+registry = WorkerRegistry(WORKERS_KEY, STACKS_KEY, RESULTS_TTL)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def frame_label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Muestrea las pilas de los hilos del proceso desde un hilo propio.
+
+    Las pilas se guardan como tuplas de objetos ``code`` (raíz primero):
+    formatearlas solo al publicar mantiene barata cada muestra.
+    """
+
+    def __init__(self, hz=100, max_overhead=0.02, flush_interval=5, clock=time.perf_counter):
+        self.interval = 1.0 / max(1, hz)
+        self.max_overhead = max_overhead
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_time = 0.0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._ignored_threads = set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def ignore_thread(self, ident):
+        self._ignored_threads.add(ident)
+
+    def start(self, until=None):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, args=(until,), name='sampling-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def sample(self):
+        """Toma una muestra de todos los hilos salvo los ignorados."""
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own or ident in self._ignored_threads:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def _run(self, until):
+        last_flush = time.time()
+        while not self._stop.is_set():
+            start = self._clock()
+            self.sample()
+            cost = self._clock() - start
+            self.sampling_time += cost
+
+            now = time.time()
+            if now - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = now
+            if until is not None and now >= until:
+                break
+            # Intervalo mínimo para no pasar de max_overhead de CPU
+            self._stop.wait(max(self.interval, cost / self.max_overhead))
+        self.flush()
+
+    @property
+    def overhead(self):
+        """Fracción del tiempo de muro dedicada a muestrear."""
+        if not self.started_at:
+            return 0.0
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        return self.sampling_time / elapsed
+
+    def collapsed(self, limit=MAX_STACKS):
+        """``{pila colapsada: muestras}`` con las ``limit`` pilas más frecuentes."""
+        return {
+            ';'.join(frame_label(code) for code in stack): count
+            for stack, count in self.stacks.most_common(limit)
+        }
+
+    def flush(self):
+        """Publica el recuento de este worker en la caché compartida."""
+        try:
+            worker = worker_id()
+            cache.set(f"{STACKS_KEY}{worker}", {
+                'worker': worker,
+                'samples': self.samples,
+                'started_at': self.started_at,
+                'updated_at': time.time(),
+                'overhead': self.overhead,
+                'stacks': self.collapsed(),
+            }, RESULTS_TTL)
+            registry.register(worker)
+        except Exception as e:
+            logger.error(f"Error al publicar el perfil del worker: {e}")
+
+
+class ProfilerController:
+    """
+    Hilo de control de un worker: sigue la clave ``profiler:control`` y
+    arranca o para el muestreo según la sesión activa.
+    """
+
+    def __init__(self, poll_seconds=5):
+        self.poll_seconds = poll_seconds
+        self.profiler = None
+        self.session = None
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='profiler-controller', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error en el control del profiler: {e}")
+            time.sleep(self.poll_seconds)
+
+    def poll(self):
+        control = cache.get(CONTROL_KEY)
+        now = time.time()
+        active = control is not None and control['until'] > now
+
+        if active and control['session'] != self.session:
+            if self.profiler is not None:
+                self.profiler.stop()
+            # Sesión nueva: se parte de cero
+            cache.delete(f"{STACKS_KEY}{worker_id()}")
+            self.session = control['session']
+            self.profiler = SamplingProfiler(
+                hz=control.get('hz', getattr(settings, 'PROFILER_HZ', 100)),
+                max_overhead=getattr(settings, 'PROFILER_MAX_OVERHEAD', 0.02),
+            )
+            self.profiler.ignore_thread(self._thread.ident)
+            self.profiler.start(until=control['until'])
+            logger.info(f"Profiler iniciado en {worker_id()} (sesión {self.session})")
+        elif not active and self.profiler is not None and self.profiler.running:
+            self.profiler.stop()
+            logger.info(f"Profiler detenido en {worker_id()}")
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def ensure_controller(**kwargs):
+    """
+    Arranca el hilo de control en este proceso si aún no existe.
+
+    Receptor de ``request_started``: con ``preload_app`` los hilos del
+    master no sobreviven al fork, así que cada worker lo arranca con su
+    primera solicitud.
+    """
+    global _controller
+    if _controller is not None and _controller.pid == os.getpid():
+        return
+    with _controller_lock:
+        if _controller is None or _controller.pid != os.getpid():
+            _controller = ProfilerController(getattr(settings, 'PROFILER_POLL_SECONDS', 5))
+            _controller.start()
+
+
+def start_session(duration=60, hz=None):
+    """
+    Activa el muestreo en todos los workers durante ``duration`` segundos.
+
+    Returns:
+        dict: La sesión (session, hz, until)
+    """
+    control = {
+        'session': uuid.uuid4().hex[:12],
+        'hz': hz or getattr(settings, 'PROFILER_HZ', 100),
+        'until': time.time() + duration,
+    }
+    cache.set(CONTROL_KEY, control, duration + 60)
+    return control
+
+
+def stop_session():
+    cache.delete(CONTROL_KEY)
+
+
+def session_status():
+    """
+    Sesión activa (o None) y estado publicado por cada worker.
+
+    Returns:
+        dict: session y workers (lista de dicts sin las pilas)
+    """
+    control = cache.get(CONTROL_KEY)
+    if control is not None and control['until'] <= time.time():
+        control = None
+    workers = []
+    for result in worker_results():
+        workers.append({key: value for key, value in result.items() if key != 'stacks'})
+        workers[-1]['stack_count'] = len(result['stacks'])
+    return {'session': control, 'workers': workers}
+
+
+def worker_results():
+    """Resultados publicados por los workers, más recientes primero."""
+    results = registry.results()
+    return sorted(results.values(), key=lambda result: result['updated_at'], reverse=True)
+
+
+def merged_stacks(per_worker=False):
+    """
+    Pilas colapsadas de todos los workers sumadas.
+
+    Args:
+        per_worker: Añade el worker como marco raíz de cada pila
+
+    Returns:
+        Counter: ``{pila colapsada: muestras}``
+    """
+    merged = Counter()
+    for result in worker_results():
+        prefix = f"{result['worker']};" if per_worker else ''
+        for stack, count in result['stacks'].items():
+            merged[prefix + stack] += count
+    return merged
+
+
+def format_collapsed(stacks):
+    """Texto en formato de pilas colapsadas, una pila por línea."""
+    return '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
@@ -0,0 +1,282 @@
+"""
+Presupuestos de consultas SQL por vista.
+
+Los N+1 vuelven sin hacer ruido: una plantilla que accede a una relación
+sin ``prefetch_related`` sigue funcionando, solo que con una consulta más
+por fila. Aquí cada vista registrada en ``VIEWS`` se renderiza con dos
+tamaños de datos (``SIZES``, generados con ``blog.benchmarking``) y se
+comprueba que:
+
+- el número de consultas no crece con los datos (más allá de
+  ``tolerance``), y
+- ningún tamaño supera su presupuesto, guardado en ``QUERY_BUDGET_FILE``
+  (``query_budgets.json``, versionado con el código).
+
+Los N+1 ya conocidos están en ``KNOWN_GROWTH``, con el motivo: su
+crecimiento se informa pero no falla, y el presupuesto de cada tamaño
+impide que empeoren. Al corregir uno hay que quitarlo de la lista.
+
+Si algo falla, el informe lista las huellas de SQL
+(``blog.db_instrumentation.fingerprint``) que aparecieron o se repitieron
+más. Necesita una base de datos de pruebas vacía: el comando
+``check_query_budgets`` la crea, y desde un ``TestCase`` basta con llamar a
+``assert_query_budgets``.
+"""
+
+import json
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client
+from taggit.models import Tag
+
+from blog.benchmarking import USER_PREFIX, dataset_counts, generate_dataset
+from blog.db_instrumentation import collect_queries
+from posts.models import Post
+
+# Los posts, comentarios, likes y favoritos por usuario crecen entre tamaños;
+# los usuarios no, para que crezcan también las relaciones de cada uno
+SIZES = {
+    'small': {'users': 8, 'posts': 30, 'tags': 10, 'comments': 60, 'likes': 60, 'favorites': 30},
+    'large': {'users': 8, 'posts': 120, 'tags': 30, 'comments': 720, 'likes': 480, 'favorites': 240},
+}
+SEED = 7
+
+# Vistas que todavía crecen con los datos y por qué. Cada entrada es una
+# deuda: el resto de vistas falla en cuanto una consulta se repite por fila
+KNOWN_GROWTH = {
+    # Autor y likes de cada comentario, una consulta por comentario
+    'api_posts': 'autor y likes por comentario',
+    # Autor de cada elemento de la actividad reciente
+    'dashboard': 'autor por elemento de actividad',
+    # Tarjetas de post: likes, comentarios, etiquetas y perfil del autor por post
+    'favorite_list': 'likes, comentarios, etiquetas y perfil por post',
+    'profile': 'likes, comentarios y etiquetas por post',
+    # Perfil del autor de cada comentario
+    'post_detail': 'perfil por autor de comentario',
+    # Una consulta por etiqueta al serializar
+    'tag_popular': 'una consulta por etiqueta',
+}
+
+# Longitud máxima de cada huella en los informes
+FINGERPRINT_WIDTH = 160
+
+_SELECT_COLUMNS = re.compile(r"^SELECT (DISTINCT )?.+? FROM ")
+
+
+def _targets():
+    """Objetos con más relaciones: los que más consultas provocarían con N+1."""
+    user = (
+        Post.objects.filter(status='published', author__username__startswith=USER_PREFIX)
+        .values('author').annotate(total=Count('id')).order_by('-total', 'author')[0]
+    )
+    post = (
+        Post.objects.filter(status='published').annotate(total=Count('comments'))
+        .select_related('author').order_by('-total', 'id')[0]
+    )
+    tag = Tag.objects.annotate(total=Count('taggit_taggeditem_items')).order_by('-total', 'id')[0]
+    return {
+        'user': User.objects.get(pk=user['author']),
+        'post_path': post.get_absolute_url(),
+        'tag': tag,
+    }
+
+
+# Cada vista devuelve (ruta, usuario con sesión iniciada o None)
+VIEWS = {
+    'post_list': lambda t: ('/', None),
+    'post_detail': lambda t: (t['post_path'], None),
+    'tag_page': lambda t: (f"/tag/{t['tag'].slug}/", None),
+    'dashboard': lambda t: ('/dashboard/', t['user']),
+    'profile': lambda t: (f"/accounts/@{t['user'].username}/", t['user']),
+    'favorite_list': lambda t: ('/favoritos/', t['user']),
+    'api_posts': lambda t: ('/api/posts/', None),
+    'tag_suggest': lambda t: (f"/api/tags/suggest/?q={t['tag'].name[:2]}", None),
+    'tag_related': lambda t: (f"/api/tags/related/?tags={t['tag'].name}", None),
+    'tag_popular': lambda t: ('/api/tags/popular/', None),
+    'tag_trending': lambda t: ('/api/tags/trending/', None),
+    'tag_stats': lambda t: ('/api/tags/stats/', None),
+}
+
+
+def budget_path():
+    return getattr(settings, 'QUERY_BUDGET_FILE', settings.BASE_DIR / 'query_budgets.json')
+
+
+def load_budgets(path=None):
+    try:
+        with open(path or budget_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_budgets(budgets, path=None):
+    with open(path or budget_path(), 'w') as f:
+        json.dump(budgets, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def measure_view(name, targets):
+    """
+    Consultas de una solicitud a la vista, con la caché vacía.
+
+    Una primera solicitud sin medir llena las cachés del proceso (tipos de
+    contenido, plantillas compiladas), como en un worker ya arrancado.
+
+    Returns:
+        dict: status, count y fingerprints (``{huella: veces}``)
+    """
+    path, user = VIEWS[name](targets)
+    client = Client(raise_request_exception=False)
+    if user is not None:
+        client.force_login(user)
+
+    cache.clear()
+    client.get(path)
+    cache.clear()
+    with collect_queries(f"query_budget:{name}", sample_rate=1.0) as stats:
+        response = client.get(path)
+    return {
+        'path': path,
+        'status': response.status_code,
+        'count': stats.count,
+        'fingerprints': dict(stats.fingerprints),
+    }
+
+
+def measure_sizes(names=None):
+    """
+    Mide las vistas con cada tamaño de ``SIZES``. Cada tamaño se genera en
+    una transacción que se deshace al terminar.
+
+    Returns:
+        dict: ``{tamaño: {vista: medida}}``
+    """
+    names = list(names or VIEWS)
+    if dataset_counts()['users']:
+        raise ValueError('La base de datos ya tiene datos del benchmark: usa una base de datos de pruebas vacía')
+
+    measurements = {}
+    for size, counts in SIZES.items():
+        with transaction.atomic():
+            generate_dataset(seed=SEED, **counts)
+            targets = _targets()
+            measurements[size] = {name: measure_view(name, targets) for name in names}
+            transaction.set_rollback(True)
+    return measurements
+
+
+def _growth(before, after):
+    """Huellas que aparecen o se repiten más en ``after`` que en ``before``."""
+    before, after = Counter(before), Counter(after)
+    return {
+        sql_fingerprint: (before[sql_fingerprint], count)
+        for sql_fingerprint, count in after.most_common()
+        if count > before[sql_fingerprint]
+    }
+
+
+def evaluate(measurements, budgets, tolerance=0):
+    """
+    Compara las medidas entre tamaños y con el presupuesto de cada tamaño.
+
+    Returns:
+        list: Un dict por vista con small, large, budget, failures (mensajes),
+        growth (huellas que crecen de small a large), known_growth (motivo
+        si está en ``KNOWN_GROWTH``) y over_budget (``{tamaño: huellas por
+        encima de las del presupuesto}``)
+    """
+    small, large = measurements['small'], measurements['large']
+    results = []
+    for name in large:
+        budget = budgets.get(name) or {}
+        result = {
+            'view': name,
+            'small': small[name],
+            'large': large[name],
+            'budget': budget,
+            'failures': [],
+            'growth': {},
+            'known_growth': KNOWN_GROWTH.get(name),
+            'over_budget': {},
+        }
+        if large[name]['count'] > small[name]['count'] + tolerance:
+            result['growth'] = _growth(small[name]['fingerprints'], large[name]['fingerprints'])
+            if not result['known_growth']:
+                result['failures'].append(
+                    f"las consultas crecen con los datos: {small[name]['count']} → {large[name]['count']}"
+                )
+
+        for size in SIZES:
+            measurement = measurements[size][name]
+            if not 200 <= measurement['status'] < 300:
+                result['failures'].append(f"{measurement['path']} respondió {measurement['status']} ({size})")
+
+            size_budget = budget.get(size)
+            if size_budget is None:
+                result['failures'].append(
+                    f"sin presupuesto para {size} en {budget_path()} ({measurement['count']} consultas)"
+                )
+            elif measurement['count'] > size_budget['max_queries'] + tolerance:
+                result['over_budget'][size] = _growth(size_budget.get('fingerprints', {}), measurement['fingerprints'])
+                result['failures'].append(
+                    f"{measurement['count']} consultas con {size}, presupuesto {size_budget['max_queries']}"
+                )
+        results.append(result)
+    return results
+
+
+def updated_budgets(measurements, budgets):
+    """Presupuestos con las medidas actuales de cada tamaño."""
+    budgets = dict(budgets)
+    for name in measurements['large']:
+        budgets[name] = {
+            size: {
+                'max_queries': measurements[size][name]['count'],
+                'fingerprints': measurements[size][name]['fingerprints'],
+            }
+            for size in SIZES
+        }
+    return budgets
+
+
+def _short(sql_fingerprint):
+    """Huella sin la lista de columnas del SELECT, que suele ocupar la línea."""
+    return _SELECT_COLUMNS.sub(r'SELECT \1… FROM ', sql_fingerprint)[:FINGERPRINT_WIDTH]
+
+
+def format_fingerprints(growth):
+    """Líneas ``antes → después  huella`` de un diff de huellas."""
+    return [
+        f"  {before:>3} → {after:<3} {_short(sql_fingerprint)}"
+        for sql_fingerprint, (before, after) in growth.items()
+    ]
+
+
+def format_failure(result):
+    lines = [f"{result['view']}: " + '; '.join(result['failures'])]
+    if result['growth']:
+        lines.append(' Huellas que crecen de small a large:')
+        lines.extend(format_fingerprints(result['growth']))
+    for size, over_budget in result['over_budget'].items():
+        lines.append(f' Huellas por encima del presupuesto ({size}):')
+        lines.extend(format_fingerprints(over_budget))
+    return '\n'.join(lines)
+
+
+def assert_query_budgets(names=None, tolerance=0):
+    """
+    Para tests: mide las vistas y lanza ``AssertionError`` con el diff de
+    huellas si alguna crece con los datos o se pasa de presupuesto.
+    """
+    results = evaluate(measure_sizes(names), load_budgets(), tolerance)
+    failures = [format_failure(result) for result in results if result['failures']]
+    if failures:
+        raise AssertionError('Presupuestos de consultas incumplidos:\n' + '\n'.join(failures))
+    return results
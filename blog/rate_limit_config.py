@@ -3,22 +3,29 @@ Configuración avanzada para rate limiting.
 """
 from django.conf import settings
 
+
+def _legacy_rates(setting, anonymous, authenticated, staff):
+    """
+    Tasas por tipo de usuario de una categoría que antes fijaba un único
+    ajuste del middleware (``GLOBAL_RATE_LIMIT``, ``API_RATE_LIMIT``).
+
+    Si el ajuste está definido se aplica a todos los usuarios, como antes;
+    si no, ``anonymous`` es el valor por defecto que tenía.
+    """
+    rate = getattr(settings, setting, None)
+    if rate:
+        return {'anonymous': rate, 'authenticated': rate, 'staff': rate}
+    return {'anonymous': anonymous, 'authenticated': authenticated, 'staff': staff}
+
+
 # Configuración de rate limits por defecto
 DEFAULT_RATE_LIMITS = {
     # Rate limits globales
-    'global': {
-        'anonymous': '500/h',
-        'authenticated': '2000/h',
-        'staff': '5000/h',
-    },
-    
+    'global': _legacy_rates('GLOBAL_RATE_LIMIT', '1000/h', '2000/h', '5000/h'),
+
     # Rate limits para API
-    'api': {
-        'anonymous': '100/h',
-        'authenticated': '1000/h',
-        'staff': '2000/h',
-    },
-    
+    'api': _legacy_rates('API_RATE_LIMIT', '200/h', '1000/h', '2000/h'),
+
     # Rate limits para búsquedas
     'search': {
         'anonymous': '20/m',
@@ -56,7 +63,8 @@ DEFAULT_RATE_LIMITS = {
     
     # Rate limits especiales
     'special': {
-        'suspicious': '5/m',
+        # Ajuste que leía antes el middleware, con su valor por defecto
+        'suspicious': getattr(settings, 'SUSPICIOUS_RATE_LIMIT', '10/m'),
         'bot_legitimate': '60/m',
         'bot_suspicious': '10/m',
         'ddos_threshold': '100/m',
@@ -97,14 +105,15 @@ SUSPICIOUS_USER_AGENTS = getattr(settings, 'SUSPICIOUS_USER_AGENTS', [
     'selenium',
 ])
 
-# Rutas que requieren rate limiting especial
-API_PATHS = getattr(settings, 'RATE_LIMIT_API_PATHS', [
+# Rutas que requieren rate limiting especial (API_PATHS, AUTH_PATHS y
+# UPLOAD_PATHS son los nombres que leía antes el middleware)
+API_PATHS = getattr(settings, 'RATE_LIMIT_API_PATHS', None) or getattr(settings, 'API_PATHS', [
     '/api/',
     '/ajax/',
     '/json/',
 ])
 
-AUTH_PATHS = getattr(settings, 'RATE_LIMIT_AUTH_PATHS', [
+AUTH_PATHS = getattr(settings, 'RATE_LIMIT_AUTH_PATHS', None) or getattr(settings, 'AUTH_PATHS', [
     '/login/',
     '/register/',
     '/password/',
@@ -112,7 +121,7 @@ AUTH_PATHS = getattr(settings, 'RATE_LIMIT_AUTH_PATHS', [
     '/accounts/register/',
 ])
 
-UPLOAD_PATHS = getattr(settings, 'RATE_LIMIT_UPLOAD_PATHS', [
+UPLOAD_PATHS = getattr(settings, 'RATE_LIMIT_UPLOAD_PATHS', None) or getattr(settings, 'UPLOAD_PATHS', [
     '/upload/',
     '/media/',
     '/ckeditor/',
@@ -123,6 +132,33 @@ ADMIN_PATHS = getattr(settings, 'RATE_LIMIT_ADMIN_PATHS', [
     '/staff/',
 ])
 
+# Reglas de la política de rate limiting (blog.rate_limit_policy).
+# Cada regla es un bucket con la tasa de (category, action) en
+# DEFAULT_RATE_LIMITS y se aplica a las rutas que empiezan por sus
+# prefijos; una solicitud cuenta en todas las reglas que le apliquen.
+# - scope: 'user' (usuario o IP si es anónimo) o 'ip'
+# - methods: métodos a los que se aplica (None: todos)
+# - Sin paths, la regla solo se aplica cuando se pide expresamente
+PATH_RULES = [
+    {'group': 'global', 'paths': ['/'], 'category': 'global'},
+    {'group': 'api', 'paths': API_PATHS, 'category': 'api'},
+    {'group': 'auth', 'paths': AUTH_PATHS, 'category': 'auth', 'action': 'login', 'scope': 'ip'},
+    {'group': 'upload', 'paths': UPLOAD_PATHS, 'category': 'upload', 'action': 'images',
+     'methods': ['POST', 'PUT', 'PATCH']},
+    {'group': 'admin', 'paths': ADMIN_PATHS, 'category': 'admin', 'action': 'actions',
+     'methods': ['POST', 'PUT', 'PATCH', 'DELETE']},
+    {'group': 'suspicious', 'paths': [], 'category': 'special', 'action': 'suspicious', 'scope': 'ip'},
+]
+
+USER_TYPES = ('anonymous', 'authenticated', 'staff')
+
+
+def get_user_type(user):
+    """Tipo de usuario para los límites: anonymous, authenticated o staff."""
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    return 'staff' if user.is_staff else 'authenticated'
+
 
 def get_rate_limit_for_user(user, category, action=None):
     """
@@ -133,20 +169,25 @@ def get_rate_limit_for_user(user, category, action=None):
         category: Categoría de rate limit (ej: 'api', 'search')
         action: Acción específica (opcional)
     
+    Returns:
+        str: Rate limit en formato "número/período"
+    """
+    return resolve_rate(category, get_user_type(user), action)
+
+
+def resolve_rate(category, user_type, action=None):
+    """
+    Rate limit de una categoría para un tipo de usuario.
+    
+    Busca primero en ``CUSTOM_RATE_LIMITS`` (settings) y después en
+    ``DEFAULT_RATE_LIMITS``.
+    
     Returns:
         str: Rate limit en formato "número/período"
     """
     # Obtener configuración personalizada desde settings
     custom_limits = getattr(settings, 'CUSTOM_RATE_LIMITS', {})
     
-    # Determinar el tipo de usuario
-    if not user.is_authenticated:
-        user_type = 'anonymous'
-    elif user.is_staff:
-        user_type = 'staff'
-    else:
-        user_type = 'authenticated'
-    
     # Buscar en configuración personalizada primero
     if category in custom_limits:
         if action and action in custom_limits[category]:
@@ -0,0 +1,332 @@
+"""
+Motor atómico de rate limiting (GCRA).
+
+Cada clave guarda un único entero: el instante teórico de llegada (TAT) de
+la siguiente solicitud, en microsegundos. Con un límite de N solicitudes por
+período P, cada solicitud adelanta el TAT en P/N; se rechaza si el nuevo TAT
+queda más de P por delante del reloj. Equivale a una ventana deslizante sin
+guardar el historial: memoria O(1) por clave, sea cual sea el límite.
+
+Backends:
+
+- Redis (``django_redis`` o el backend Redis de Django): la comprobación y
+  la escritura de todas las claves de una solicitud van en un script Lua,
+  en un solo viaje y de forma atómica entre todos los workers. El reloj es
+  el del propio Redis.
+- Caché local (``LocMemCache`` y el resto): lectura y escritura bajo un lock
+  del proceso. Es exacto con ``LocMemCache`` (una caché por proceso) y sirve
+  para desarrollo y tests.
+
+Las claves son las de la caché de Django (respetan ``KEY_PREFIX``) y su
+valor es un entero legible con ``cache.get``.
+"""
+
+import logging
+import math
+import threading
+import time
+from functools import lru_cache
+
+from django.core.cache import cache, caches
+
+logger = logging.getLogger('django.security')
+
+# Unidades de tiempo admitidas en las tasas ("100/m", "30/minute"...)
+TIME_UNITS = {
+    's': 1, 'sec': 1, 'second': 1, 'seconds': 1,
+    'm': 60, 'min': 60, 'minute': 60, 'minutes': 60,
+    'h': 3600, 'hour': 3600, 'hours': 3600,
+    'd': 86400, 'day': 86400, 'days': 86400,
+}
+
+MICROSECONDS = 1_000_000
+
+# KEYS: claves; ARGV: límite, período (µs) y coste de cada clave, en orden.
+# Todo o nada: si alguna clave rechaza, no se consume ninguna. El TAT se
+# redondea hacia abajo: como mucho 1 µs de holgura por solicitud.
+# Devuelve cuatro valores por clave: admitida, restantes, espera y reinicio.
+GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local results = {}
+local updates = {}
+local denied = false
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[i * 3 - 2])
+    local period = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    local interval = period / limit
+    local tat = tonumber(redis.call('GET', KEYS[i])) or now
+    if tat < now then
+        tat = now
+    end
+    local new_tat = math.floor(tat + interval * cost)
+    local allow_at = new_tat - period
+    if now < allow_at then
+        denied = true
+        table.insert(results, 0)
+        table.insert(results, 0)
+        table.insert(results, allow_at - now)
+        table.insert(results, tat - now)
+    else
+        if cost > 0 then
+            updates[i] = new_tat
+        end
+        table.insert(results, 1)
+        table.insert(results, math.floor((now - allow_at) / interval))
+        table.insert(results, 0)
+        table.insert(results, new_tat - now)
+    end
+end
+if not denied then
+    for i, new_tat in pairs(updates) do
+        local ttl = math.max(1, math.ceil((new_tat - now) / 1000))
+        redis.call('SET', KEYS[i], string.format('%d', new_tat), 'PX', ttl)
+    end
+end
+return results
+"""
+
+
+@lru_cache(maxsize=256)
+def parse_rate(rate):
+    """
+    Parsea una tasa "número/unidad" (s, m, h, d o su nombre completo).
+
+    El resultado se cachea: las tasas salen de la configuración y se repiten.
+
+    Returns:
+        tuple: (número de solicitudes, período en segundos)
+
+    Raises:
+        ValueError: Si el formato o la unidad no son válidos
+    """
+    if not isinstance(rate, str) or '/' not in rate:
+        raise ValueError(f"Formato de tasa inválido: {rate}")
+
+    count, period = rate.split('/', 1)
+    period = period.strip().lower()
+    if period not in TIME_UNITS:
+        raise ValueError(f"Unidad de tiempo no válida: {period}")
+    return int(count), TIME_UNITS[period]
+
+
+def _result(allowed, limit, remaining, retry_after_us, reset_after_us):
+    return {
+        'allowed': bool(allowed),
+        'limit': limit,
+        'remaining': max(0, int(remaining)),
+        'retry_after': max(0, retry_after_us) / MICROSECONDS,
+        'reset_after': max(0, reset_after_us) / MICROSECONDS,
+    }
+
+
+class LocalRateLimitBackend:
+    """
+    GCRA sobre la caché de Django, serializado con un lock del proceso.
+    """
+
+    name = 'local'
+
+    def __init__(self, cache_backend=None, clock=time.time):
+        self.cache = cache_backend or cache
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def check_many(self, checks):
+        with self._lock:
+            now = int(self._clock() * MICROSECONDS)
+            stored = self.cache.get_many([key for key, _, _, _ in checks])
+            results = []
+            updates = {}
+            for key, limit, period, cost in checks:
+                period_us = period * MICROSECONDS
+                interval = period_us / limit
+                tat = stored.get(key)
+                tat = max(tat if isinstance(tat, int) else now, now)
+                new_tat = math.floor(tat + interval * cost)
+                allow_at = new_tat - period_us
+                if now < allow_at:
+                    results.append(_result(False, limit, 0, allow_at - now, tat - now))
+                    continue
+                if cost > 0:
+                    updates[key] = new_tat
+                results.append(_result(True, limit, (now - allow_at) // interval, 0, new_tat - now))
+
+            if all(result['allowed'] for result in results):
+                for key, new_tat in updates.items():
+                    self.cache.set(key, new_tat, max(1, math.ceil((new_tat - now) / MICROSECONDS)))
+        return results
+
+    def keys(self, prefix):
+        # Solo LocMemCache expone sus claves
+        store = getattr(self.cache, '_cache', None)
+        if not isinstance(store, dict):
+            return []
+        made_prefix = self.cache.make_key('')
+        return [
+            key[len(made_prefix):] for key in list(store)
+            if key.startswith(made_prefix + prefix)
+        ]
+
+
+class RedisRateLimitBackend:
+    """
+    GCRA en un script Lua: una sola llamada a Redis por solicitud, con
+    todas las claves que le apliquen.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, cache_backend=None):
+        self.cache = cache_backend or cache
+        self.client = client
+        self._script = client.register_script(GCRA_SCRIPT)
+
+    def check_many(self, checks):
+        args = []
+        for _, limit, period, cost in checks:
+            args.extend((limit, period * MICROSECONDS, cost))
+        values = self._script(keys=[self.cache.make_key(key) for key, _, _, _ in checks], args=args)
+        return [
+            _result(values[i], limit, values[i + 1], values[i + 2], values[i + 3])
+            for i, (_, limit, _, _) in zip(range(0, len(values), 4), checks)
+        ]
+
+    def keys(self, prefix):
+        made_prefix = self.cache.make_key('')
+        return [
+            key.decode()[len(made_prefix):]
+            for key in self.client.scan_iter(match=f"{made_prefix}{prefix}*", count=500)
+        ]
+
+
+def redis_client_for(cache_backend):
+    """
+    Cliente redis-py de una caché de Django basada en Redis, o None.
+    """
+    try:
+        from django_redis.cache import RedisCache as DjangoRedisCache
+    except ImportError:
+        DjangoRedisCache = None
+
+    if DjangoRedisCache is not None and isinstance(cache_backend, DjangoRedisCache):
+        return cache_backend.client.get_client(write=True)
+
+    from django.core.cache.backends.redis import RedisCache
+    if isinstance(cache_backend, RedisCache):
+        return cache_backend._cache.get_client(write=True)
+    return None
+
+
+class RateLimitEngine:
+    """
+    Punto de entrada único para comprobar límites de tasa.
+
+    Si Redis falla, la solicitud se deja pasar (fail-open) y se registra el
+    error: un problema de la caché no debe tumbar el sitio.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def check(self, key, limit, period, cost=1):
+        """
+        Consume ``cost`` solicitudes de ``key`` si caben en el límite.
+
+        Args:
+            key: Clave de caché del límite
+            limit: Solicitudes permitidas por período
+            period: Período en segundos
+            cost: Solicitudes a consumir (0 solo consulta)
+
+        Returns:
+            dict: allowed, limit, remaining, retry_after y reset_after
+            (estos dos en segundos)
+        """
+        return self.check_many([(key, limit, period, cost)])[0]
+
+    def check_many(self, checks):
+        """
+        Comprueba varias claves a la vez, en una sola llamada al backend.
+
+        La solicitud se admite solo si cabe en todas; si alguna la rechaza
+        no se consume ninguna.
+
+        Args:
+            checks: Lista de ``(clave, límite, período, coste)``
+
+        Returns:
+            list: Un resultado de ``check`` por clave, en el mismo orden
+        """
+        if not checks:
+            return []
+        if any(limit <= 0 for _, limit, _, _ in checks):
+            return [
+                _result(limit > 0, limit, 0, 0 if limit > 0 else period * MICROSECONDS, 0)
+                for _, limit, period, _ in checks
+            ]
+        try:
+            return self.backend.check_many(checks)
+        except Exception as e:
+            logger.error(f"Error en el motor de rate limiting ({self.backend.name}): {e}")
+            return [_result(True, limit, limit, 0, 0) for _, limit, _, _ in checks]
+
+    def check_rate(self, key, rate, cost=1):
+        """Como ``check`` con la tasa en formato "número/unidad"."""
+        limit, period = parse_rate(rate)
+        return self.check(key, limit, period, cost)
+
+    def backlog(self, keys):
+        """
+        Segundos de cola acumulada por clave (TAT menos ahora), en una
+        sola lectura. Dividido por el período da la fracción del límite
+        en uso. Las claves sin estado no aparecen.
+        """
+        now = int(time.time() * MICROSECONDS)
+        return {
+            key: max(0, tat - now) / MICROSECONDS
+            for key, tat in self.backend.cache.get_many(list(keys)).items()
+            if isinstance(tat, int)
+        }
+
+    def keys(self, prefix):
+        """Claves activas que empiezan por ``prefix`` (si el backend lo permite)."""
+        return self.backend.keys(prefix)
+
+    def reset(self, key):
+        self.backend.cache.delete(key)
+
+    def reset_many(self, keys):
+        self.backend.cache.delete_many(list(keys))
+
+
+def create_backend(cache_backend=None):
+    """Backend de Redis si la caché es Redis; si no, el local."""
+    # La instancia real: ``isinstance`` no atraviesa el proxy ``cache``
+    cache_backend = cache_backend or caches['default']
+    client = redis_client_for(cache_backend)
+    if client is not None:
+        return RedisRateLimitBackend(client, cache_backend)
+    return LocalRateLimitBackend(cache_backend)
+
+
+_engine = None
+
+
+def get_rate_limiter():
+    global _engine
+    if _engine is None:
+        _engine = RateLimitEngine(create_backend())
+    return _engine
+
+
+def check_rate_limit(key, rate, cost=1):
+    """
+    Comprueba y consume el límite ``rate`` de ``key`` con el motor global.
+
+    Returns:
+        dict: Resultado de ``RateLimitEngine.check``
+    """
+    return get_rate_limiter().check_rate(key, rate, cost)
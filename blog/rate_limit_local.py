@@ -0,0 +1,256 @@
+"""
+Filtros locales para la protección DDoS y de bots.
+
+Evitan la llamada a Redis en el caso común, el de un cliente normal:
+
+- ``LocalPrefilter``: token bucket por IP dentro de cada worker, con una
+  fracción del umbral compartido. Mientras el cliente está por debajo, la
+  solicitud se admite sin red. Al vaciarse el bucket, o como mucho cada
+  ``sync_interval`` segundos, se pasa al contador compartido, cargándole
+  de una vez las solicitudes admitidas en local desde la última
+  sincronización, así que el contador refleja el tráfico real del cliente
+  en ese worker. El intervalo acota la carga: sin él, un cliente por
+  debajo del límite que vacía el bucket muy despacio acumularía minutos
+  de solicitudes y el contador compartido las vería como una ráfaga.
+- ``SharedBlocklist``: las IPs bloqueadas se publican en un filtro de
+  Bloom compacto (un bitmap de Redis) que cada worker descarga cada pocos
+  segundos. Solo un positivo del filtro (una IP bloqueada o, muy rara vez,
+  un falso positivo) se confirma contra la clave de bloqueo.
+
+Los umbrales son aproximados: con N workers, un cliente puede pasar hasta
+N veces la fracción local antes de que el contador compartido lo vea.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from blog.rate_limit_engine import redis_client_for
+
+logger = logging.getLogger('django.security')
+
+# IPs recordadas por worker en cada prefiltro
+PREFILTER_MAX_ENTRIES = 10000
+
+# Filtro de Bloom: 2^16 bits (8 KB) y 4 funciones hash; con 1000 IPs
+# bloqueadas la tasa de falsos positivos ronda 1e-5
+BLOOM_BITS = 1 << 16
+BLOOM_HASHES = 4
+
+
+class LocalPrefilter:
+    """
+    Token bucket por clave (IP) en memoria del proceso.
+
+    La capacidad es ``fraction`` del límite compartido y se rellena al
+    mismo ritmo proporcional. ``consume`` devuelve 0 si la solicitud cabe
+    en local, o el número de solicitudes que hay que cargar al contador
+    compartido (la actual más las admitidas en local sin sincronizar).
+    Las admitidas se cargan también, aunque quepan, cuando han pasado
+    ``sync_interval`` segundos (por defecto ``fraction`` del período)
+    desde la última sincronización.
+    """
+
+    def __init__(self, limit, period, fraction=0.5, max_entries=PREFILTER_MAX_ENTRIES,
+                 clock=time.monotonic, sync_interval=None):
+        self.capacity = max(1, int(limit * fraction))
+        self.refill_rate = self.capacity / period
+        self.sync_interval = period * fraction if sync_interval is None else sync_interval
+        self.max_entries = max_entries
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key):
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, última actualización, admitidas sin sincronizar, última sincronización]
+                bucket = [float(self.capacity), now, 0, now]
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_entries:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                bucket[2] += 1
+                if now - bucket[3] < self.sync_interval:
+                    return 0
+                pending = bucket[2]
+            else:
+                pending = bucket[2] + 1
+
+            bucket[2] = 0
+            bucket[3] = now
+            return pending
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+def bloom_positions(value, bits=BLOOM_BITS, hashes=BLOOM_HASHES):
+    digest = hashlib.blake2b(value.encode(), digest_size=hashes * 4).digest()
+    return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % bits for i in range(hashes)]
+
+
+def bloom_contains(bitmap, positions):
+    """Comprueba bits con el orden de ``SETBIT`` de Redis (bit 0 = MSB)."""
+    for position in positions:
+        index = position >> 3
+        if index >= len(bitmap) or not (bitmap[index] >> (7 - (position & 7))) & 1:
+            return False
+    return True
+
+
+def bloom_add(bitmap, positions):
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (7 - (position & 7))
+
+
+class SharedBlocklist:
+    """
+    Lista de IPs bloqueadas compartida entre workers.
+
+    La clave ``<name>:ip:<ip>`` (con caducidad) es la fuente de verdad; el
+    filtro de Bloom solo evita consultarla para las IPs no bloqueadas. El
+    filtro rota por generaciones de ``generation_seconds`` para que los bits
+    de bloqueos caducados desaparezcan: cada bloqueo marca todas las
+    generaciones que abarca.
+    """
+
+    def __init__(self, name='ddos_blocked', generation_seconds=3600, refresh_seconds=5,
+                 cache_backend=None, clock=time.time):
+        self.name = name
+        self.generation_seconds = max(1, int(generation_seconds))
+        self.refresh_seconds = refresh_seconds
+        self._cache_backend = cache_backend
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bitmap = bytearray()
+        self._generation = None
+        self._fetched_at = 0.0
+        self._confirmed = OrderedDict()
+
+    @property
+    def cache(self):
+        return self._cache_backend or caches['default']
+
+    def block_key(self, ip):
+        return f"{self.name}:ip:{ip}"
+
+    def bloom_key(self, generation):
+        return f"{self.name}:bloom:{generation}"
+
+    def block(self, ip, duration):
+        """Bloquea ``ip`` durante ``duration`` segundos."""
+        now = self._clock()
+        self.cache.set(self.block_key(ip), True, duration)
+
+        positions = bloom_positions(ip)
+        first = int(now // self.generation_seconds)
+        last = int((now + duration) // self.generation_seconds)
+        generations = range(first, last + 1)
+        client = redis_client_for(self.cache)
+        if client is not None:
+            pipe = client.pipeline(transaction=False)
+            for generation in generations:
+                key = self.cache.make_key(self.bloom_key(generation))
+                for position in positions:
+                    pipe.setbit(key, position, 1)
+                pipe.expireat(key, (generation + 2) * self.generation_seconds)
+            pipe.execute()
+        else:
+            with self._lock:
+                for generation in generations:
+                    key = self.bloom_key(generation)
+                    bitmap = bytearray(self.cache.get(key) or bytes(BLOOM_BITS // 8))
+                    bloom_add(bitmap, positions)
+                    self.cache.set(key, bytes(bitmap), max(1, int((generation + 2) * self.generation_seconds - now)))
+
+        with self._lock:
+            # Visible en este worker sin esperar a la próxima descarga
+            if self._generation == first:
+                if len(self._bitmap) < BLOOM_BITS // 8:
+                    self._bitmap.extend(bytes(BLOOM_BITS // 8 - len(self._bitmap)))
+                bloom_add(self._bitmap, positions)
+            self._remember(ip, now + min(duration, self.refresh_seconds))
+
+    def unblock(self, ip):
+        """Levanta el bloqueo; el filtro se limpia al rotar la generación."""
+        self.cache.delete(self.block_key(ip))
+        with self._lock:
+            self._confirmed.pop(ip, None)
+
+    def is_blocked(self, ip):
+        """
+        Si ``ip`` está bloqueada. Sin bloqueo (el caso común) no hay red,
+        salvo la descarga periódica del filtro.
+        """
+        now = self._clock()
+        self._refresh(now)
+        with self._lock:
+            expires = self._confirmed.get(ip)
+            if expires is not None:
+                if expires > now:
+                    return True
+                del self._confirmed[ip]
+            if not bloom_contains(self._bitmap, bloom_positions(ip)):
+                return False
+
+        if not self.cache.get(self.block_key(ip)):
+            return False
+        with self._lock:
+            self._remember(ip, now + self.refresh_seconds)
+        return True
+
+    def _remember(self, ip, expires):
+        self._confirmed[ip] = expires
+        self._confirmed.move_to_end(ip)
+        while len(self._confirmed) > PREFILTER_MAX_ENTRIES:
+            self._confirmed.popitem(last=False)
+
+    def _refresh(self, now):
+        generation = int(now // self.generation_seconds)
+        if generation == self._generation and now - self._fetched_at < self.refresh_seconds:
+            return
+        try:
+            client = redis_client_for(self.cache)
+            if client is not None:
+                bitmap = client.get(self.cache.make_key(self.bloom_key(generation))) or b''
+            else:
+                bitmap = self.cache.get(self.bloom_key(generation)) or b''
+        except Exception as e:
+            # Sin filtro nuevo se conserva el anterior
+            logger.error(f"Error al descargar la lista de bloqueo {self.name}: {e}")
+            bitmap = None
+        with self._lock:
+            if bitmap is not None:
+                self._bitmap = bytearray(bitmap)
+                self._generation = generation
+            self._fetched_at = now
+
+
+
+_ddos_blocklist = None
+
+
+def get_ddos_blocklist():
+    """Lista de bloqueo de la protección DDoS (una por proceso)."""
+    global _ddos_blocklist
+    if _ddos_blocklist is None:
+        _ddos_blocklist = SharedBlocklist(
+            generation_seconds=getattr(settings, 'DDOS_BLOCK_DURATION', 3600),
+            refresh_seconds=getattr(settings, 'DDOS_BLOCKLIST_REFRESH', 5),
+        )
+    return _ddos_blocklist
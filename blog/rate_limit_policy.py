@@ -0,0 +1,269 @@
+"""
+Política única de rate limiting.
+
+Todas las capas (middlewares y decoradores de ``blog.ratelimit``,
+``blog.simple_ratelimit``, ``blog.api_ratelimit`` y ``blog.decorators``)
+pasan por aquí, así que comparten:
+
+- La identidad del cliente (IP, tipo de usuario), calculada una vez por
+  solicitud y guardada en ella.
+- El formato de las claves: ``ratelimit:<grupo>:user:<id>`` o
+  ``ratelimit:<grupo>:ip:<ip>``.
+- Las tasas ya parseadas: ``PATH_RULES`` de ``blog.rate_limit_config`` se
+  compila una sola vez en un trie por segmentos de ruta, con la tasa de
+  cada regla resuelta para cada tipo de usuario.
+
+Una solicitud se evalúa contra todos los buckets que le aplican en una
+sola llamada al motor (un script Lua en Redis, ver
+``blog.rate_limit_engine``): o cabe en todos, o no consume ninguno.
+"""
+
+import logging
+import math
+
+from blog.rate_limit_config import PATH_RULES, USER_TYPES, get_user_type, resolve_rate
+from blog.rate_limit_engine import get_rate_limiter, parse_rate
+
+logger = logging.getLogger('django.security')
+
+KEY_PREFIX = 'ratelimit:'
+
+
+def get_client_ip(request):
+    """
+    Obtiene la dirección IP real del cliente, considerando proxies.
+    """
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        # Tomar la primera IP (la del cliente original)
+        ip = x_forwarded_for.split(',')[0].strip()
+    else:
+        ip = request.META.get('REMOTE_ADDR', '')
+    return ip
+
+
+def client_identity(request):
+    """
+    Identidad del cliente para rate limiting, calculada una vez por solicitud.
+
+    Returns:
+        dict: ip, user_type y user_id (None si es anónimo)
+    """
+    identity = getattr(request, '_rate_limit_identity', None)
+    if identity is None:
+        user = getattr(request, 'user', None)
+        user_type = get_user_type(user)
+        identity = {
+            'ip': get_client_ip(request),
+            'user_type': user_type,
+            'user_id': user.id if user_type != 'anonymous' else None,
+        }
+        request._rate_limit_identity = identity
+    return identity
+
+
+def identifier_for(identity, scope='user'):
+    if scope == 'user' and identity['user_id'] is not None:
+        return f"user:{identity['user_id']}"
+    return f"ip:{identity['ip']}"
+
+
+class Rule:
+    """
+    Bucket compilado: tasas ya parseadas por tipo de usuario.
+    """
+
+    __slots__ = ('group', 'scope', 'methods', 'rates')
+
+    def __init__(self, group, rates, scope='user', methods=None):
+        self.group = group
+        self.scope = scope
+        self.methods = frozenset(methods) if methods else None
+        self.rates = rates
+
+    def applies_to(self, method):
+        return self.methods is None or method in self.methods
+
+    def rate_for(self, user_type):
+        """``(límite, período)`` para un tipo de usuario."""
+        return self.rates[user_type]
+
+    @property
+    def period(self):
+        return self.rates['anonymous'][1]
+
+
+class PathTrie:
+    """
+    Trie de prefijos de ruta por segmentos.
+
+    ``/api/`` se guarda como ``('api',)`` y casa con ``/api/posts/1/``;
+    buscar recorre los segmentos de la ruta una vez y acumula las reglas
+    de cada nodo visitado, de la raíz (``/``) al prefijo más largo.
+    """
+
+    def __init__(self):
+        self.root = {'children': {}, 'rules': []}
+
+    @staticmethod
+    def segments(path):
+        return [segment for segment in path.split('/') if segment]
+
+    def insert(self, prefix, rule):
+        node = self.root
+        for segment in self.segments(prefix):
+            node = node['children'].setdefault(segment, {'children': {}, 'rules': []})
+        if rule not in node['rules']:
+            node['rules'].append(rule)
+
+    def match(self, path):
+        node = self.root
+        rules = list(node['rules'])
+        for segment in self.segments(path):
+            node = node['children'].get(segment)
+            if node is None:
+                break
+            rules.extend(node['rules'])
+        return rules
+
+
+class RateLimitPolicy:
+    """
+    Reglas compiladas y evaluación de solicitudes contra el motor.
+    """
+
+    def __init__(self, path_rules=None):
+        self.path_rules = path_rules if path_rules is not None else PATH_RULES
+        self._trie = None
+        self._rules = None
+
+    def compile(self):
+        """Compila ``path_rules`` en el trie; se llama una vez, de forma perezosa."""
+        trie = PathTrie()
+        rules = {}
+        for spec in self.path_rules:
+            rates = {
+                user_type: parse_rate(resolve_rate(spec['category'], user_type, spec.get('action')))
+                for user_type in USER_TYPES
+            }
+            rule = Rule(spec['group'], rates, spec.get('scope', 'user'), spec.get('methods'))
+            rules[rule.group] = rule
+            for prefix in spec['paths']:
+                trie.insert(prefix, rule)
+        self._trie, self._rules = trie, rules
+        logger.debug(f"Reglas de rate limiting compiladas: {sorted(rules)}")
+
+    @property
+    def rules(self):
+        if self._rules is None:
+            self.compile()
+        return self._rules
+
+    def rules_for(self, path, method='GET'):
+        """Reglas que aplican a ``path`` y ``method``."""
+        if self._trie is None:
+            self.compile()
+        return [rule for rule in self._trie.match(path) if rule.applies_to(method)]
+
+    def cache_key(self, request, group, scope='user'):
+        return f"{KEY_PREFIX}{group}:{identifier_for(client_identity(request), scope)}"
+
+    def evaluate(self, request, extra_groups=(), cost=1):
+        """
+        Evalúa la solicitud contra todas las reglas de su ruta, más las de
+        ``extra_groups`` (reglas sin ruta, como ``suspicious``).
+
+        Returns:
+            dict: allowed, group (la primera regla que rechaza), retry_after
+            (segundos) y buckets (``[(grupo, resultado), ...]``)
+        """
+        identity = client_identity(request)
+        rules = self.rules_for(request.path, request.method)
+        rules.extend(self.rules[group] for group in extra_groups if group in self.rules)
+
+        checks = []
+        for rule in rules:
+            limit, period = rule.rate_for(identity['user_type'])
+            key = f"{KEY_PREFIX}{rule.group}:{identifier_for(identity, rule.scope)}"
+            checks.append((key, limit, period, cost))
+
+        results = get_rate_limiter().check_many(checks)
+        buckets = [(rule.group, result) for rule, result in zip(rules, results)]
+        denied = [(group, result) for group, result in buckets if not result['allowed']]
+        return {
+            'allowed': not denied,
+            'group': denied[0][0] if denied else None,
+            'retry_after': max((result['retry_after'] for _, result in denied), default=0),
+            'buckets': buckets,
+        }
+
+    def check(self, request, group, rate, scope='user', cost=1):
+        """
+        Comprueba un límite puntual (decoradores de vista).
+
+        Args:
+            group: Grupo del límite, parte de la clave
+            rate: Tasa en formato "número/unidad"
+            scope: 'user' o 'ip'
+
+        Returns:
+            dict: Resultado de ``RateLimitEngine.check``
+        """
+        limit, period = parse_rate(rate)
+        return get_rate_limiter().check(self.cache_key(request, group, scope), limit, period, cost)
+
+    # Administración (manage_rate_limits)
+
+    def active_keys(self):
+        """Claves de rate limiting con estado, sin prefijo de caché."""
+        return get_rate_limiter().keys(KEY_PREFIX)
+
+    def bucket_stats(self, keys=None):
+        """
+        Estado de los buckets activos, leído en una sola operación.
+
+        ``usage`` es la fracción del límite consumida (cola / período);
+        solo se conoce para los grupos de ``PATH_RULES``.
+
+        Returns:
+            list: dicts con key, group, identifier, backlog y usage
+        """
+        keys = self.active_keys() if keys is None else keys
+        stats = []
+        for key, backlog in get_rate_limiter().backlog(keys).items():
+            group, _, identifier = key[len(KEY_PREFIX):].partition(':')
+            rule = self.rules.get(group)
+            stats.append({
+                'key': key,
+                'group': group,
+                'identifier': identifier,
+                'backlog': backlog,
+                'usage': min(1.0, backlog / rule.period) if rule else None,
+            })
+        return sorted(stats, key=lambda item: item['backlog'], reverse=True)
+
+    def clear(self, ip=None, user_id=None, group=None):
+        """
+        Borra los buckets de una IP, un usuario o un grupo (todos sin filtros).
+
+        Returns:
+            int: Claves borradas
+        """
+        keys = self.active_keys()
+        if ip:
+            keys = [key for key in keys if key.endswith(f":ip:{ip}")]
+        if user_id:
+            keys = [key for key in keys if key.endswith(f":user:{user_id}")]
+        if group:
+            keys = [key for key in keys if key.startswith(f"{KEY_PREFIX}{group}:")]
+        get_rate_limiter().reset_many(keys)
+        return len(keys)
+
+
+def retry_after_seconds(result):
+    """``retry_after`` de un resultado, redondeado hacia arriba para Retry-After."""
+    return max(1, math.ceil(result['retry_after']))
+
+
+# Instancia global de la política
+rate_limit_policy = RateLimitPolicy()
@@ -15,22 +15,12 @@ from django.conf import settings
 from django.utils.decorators import sync_and_async_middleware
 from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from blog.ratelimit_config import get_rate_limit, RATELIMIT_TIMEOUTS, PROGRESSIVE_RATELIMIT
+from blog.rate_limit_engine import get_rate_limiter
+from blog.rate_limit_policy import get_client_ip, rate_limit_policy
 
 
 logger = logging.getLogger('django.security')
 
-def get_client_ip(request):
-    """
-    Obtiene la dirección IP real del cliente, considerando proxies.
-    """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        # Tomar la primera IP (la del cliente original)
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '')
-    return ip
-
 def ratelimit_view(request, exception=None, block_time=None):
     """
     Vista para mostrar cuando se excede el rate limit.
@@ -77,16 +67,7 @@ def get_cache_key(group, request):
     """
     Genera una clave de caché única para el rate limiting.
     """
-    if not hasattr(request, 'user') or not request.user.is_authenticated:
-        # Para usuarios anónimos, usar IP
-        identifier = get_client_ip(request)
-    else:
-        # Para usuarios autenticados, usar ID de usuario
-        identifier = str(request.user.id)
-    
-    # Crear hash para la clave
-    key = f"ratelimit:{group}:{identifier}"
-    return key
+    return rate_limit_policy.cache_key(request, group)
 
 @sync_and_async_middleware
 def api_rate_limit(get_response=None, *, group='api_default', rate=None):
@@ -111,46 +92,15 @@ def api_rate_limit(get_response=None, *, group='api_default', rate=None):
         # Determinar la tasa según el usuario y grupo
         effective_rate = rate or get_rate_limit(group, getattr(request, 'user', None))
         
-        # Parsear la tasa
-        count, period = effective_rate.split('/')
-        count = int(count)
-        
-        # Determinar duración en segundos
-        if period == 's':
-            duration = 1
-        elif period == 'm':
-            duration = 60
-        elif period == 'h':
-            duration = 3600
-        elif period == 'd':
-            duration = 86400
-        else:
-            raise ValueError(f"Unidad de tiempo no válida: {period}")
-        
-        # Generar clave de caché
-        cache_key = get_cache_key(group, request)
-        
-        # Obtener contador actual
-        now = time.time()
-        window_start = int(now - duration)
-        
-        # Estructura en caché: {timestamp1: count1, timestamp2: count2, ...}
-        request_history = cache.get(cache_key, {})
-        
-        # Limpiar entradas antiguas
-        request_history = {ts: count for ts, count in request_history.items() if int(ts) > window_start}
-        
-        # Contar solicitudes en la ventana actual
-        current_count = sum(request_history.values())
+        # Comprobar y consumir el límite en una sola operación atómica
+        result = rate_limit_policy.check(request, group, effective_rate)
         
         # Verificar si se excede el límite
-        if current_count >= count:
-            # Verificar si es abuso repetido
+        if not result['allowed']:
+            # Verificar si es abuso repetido (incremento atómico)
             abuse_key = f"abuse:{group}:{get_client_ip(request)}"
-            abuse_count = cache.get(abuse_key, 0)
-            
-            # Incrementar contador de abuso
-            cache.set(abuse_key, abuse_count + 1, 86400)  # 24 horas
+            cache.add(abuse_key, 0, 86400)  # 24 horas
+            abuse_count = cache.incr(abuse_key) - 1
             
             # Determinar tiempo de bloqueo según nivel de abuso
             if PROGRESSIVE_RATELIMIT['enabled']:
@@ -169,7 +119,7 @@ def api_rate_limit(get_response=None, *, group='api_default', rate=None):
                     block_time = RATELIMIT_TIMEOUTS.get('default', 60)
             
             logger.warning(
-                f"Rate limit excedido para {group}: {current_count}/{count} solicitudes (abuso #{abuse_count+1})",
+                f"Rate limit excedido para {group}: {effective_rate} (abuso #{abuse_count+1})",
                 extra={
                     'ip': get_client_ip(request),
                     'user_id': getattr(request.user, 'id', None),
@@ -180,16 +130,6 @@ def api_rate_limit(get_response=None, *, group='api_default', rate=None):
                 }
             )
             return ratelimit_view(request, block_time=block_time)
-        
-        # Actualizar contador
-        current_timestamp = str(int(now))
-        if current_timestamp in request_history:
-            request_history[current_timestamp] += 1
-        else:
-            request_history[current_timestamp] = 1
-        
-        # Guardar en caché
-        cache.set(cache_key, request_history, duration * 2)  # Doble duración para mantener historial
 
     if iscoroutinefunction(get_response):
         async def middleware(request):
@@ -197,6 +137,8 @@ def api_rate_limit(get_response=None, *, group='api_default', rate=None):
             if response:
                 return response
             return await get_response(request)
+
+        markcoroutinefunction(middleware)
     else:
         def middleware(request):
             response = _check_rate_limit(request)
@@ -204,7 +146,6 @@ def api_rate_limit(get_response=None, *, group='api_default', rate=None):
                 return response
             return get_response(request)
 
-    markcoroutinefunction(middleware)
     return middleware
 
 
@@ -253,7 +194,7 @@ def progressive_rate_limit(request, group, base_rate=100, period=60):
         (allowed, current_limit): Tupla con booleano indicando si está permitido
                                  y el límite actual
     """
-    cache_key = f"prog_ratelimit:{group}:{get_client_ip(request)}"
+    cache_key = rate_limit_policy.cache_key(request, f"progressive_{group}", scope='ip')
     abuse_key = f"abuse:{group}:{get_client_ip(request)}"
     
     # Verificar si el usuario está en la lista de abuso
@@ -262,18 +203,13 @@ def progressive_rate_limit(request, group, base_rate=100, period=60):
     # Calcular límite actual (se reduce con cada abuso)
     current_limit = max(5, base_rate // (2 ** abuse_count))
     
-    # Obtener contador actual
-    counter = cache.get(cache_key, 0)
-    
-    # Verificar límite
-    if counter >= current_limit:
+    # Verificar y consumir el límite
+    if not get_rate_limiter().check(cache_key, current_limit, period)['allowed']:
         # Incrementar contador de abuso
-        cache.set(abuse_key, abuse_count + 1, 86400)  # 24 horas
+        cache.add(abuse_key, 0, 86400)  # 24 horas
+        cache.incr(abuse_key)
         return False, current_limit
     
-    # Incrementar contador
-    cache.set(cache_key, counter + 1, period)
-    
     return True, current_limit
 
 def is_suspicious_request(request):
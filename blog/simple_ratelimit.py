@@ -3,68 +3,21 @@ Sistema simplificado de rate limiting para compatibilidad.
 """
 
 from functools import wraps
-import time
 import logging
-from django.core.cache import cache
+import math
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils.translation import gettext as _
+from blog.rate_limit_engine import parse_rate
+from blog.rate_limit_policy import get_client_ip, rate_limit_policy
 
 logger = logging.getLogger('django.security')
 
-def get_client_ip(request):
-    """
-    Obtiene la dirección IP real del cliente, considerando proxies.
-    """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        # Tomar la primera IP (la del cliente original)
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '')
-    return ip
-
 def get_cache_key(group, request):
     """
     Genera una clave de caché única para el rate limiting.
     """
-    if not hasattr(request, 'user') or not request.user.is_authenticated:
-        # Para usuarios anónimos, usar IP
-        identifier = get_client_ip(request)
-    else:
-        # Para usuarios autenticados, usar ID de usuario
-        identifier = str(request.user.id)
-    
-    # Crear hash para la clave
-    key = f"ratelimit:{group}:{identifier}"
-    return key
-
-def parse_rate(rate):
-    """
-    Parsea una cadena de tasa en formato "número/unidad".
-    """
-    if '/' not in rate:
-        raise ValueError(f"Formato de tasa inválido: {rate}")
-    
-    count, period = rate.split('/')
-    count = int(count)
-    
-    # Normalizar el período
-    period = period.strip().lower()
-    
-    # Mapeo de unidades a segundos
-    time_units = {
-        's': 1, 'second': 1, 'seconds': 1,
-        'm': 60, 'minute': 60, 'minutes': 60,
-        'h': 3600, 'hour': 3600, 'hours': 3600,
-        'd': 86400, 'day': 86400, 'days': 86400,
-    }
-    
-    if period not in time_units:
-        raise ValueError(f"Unidad de tiempo no válida: {period}")
-    
-    duration = time_units[period]
-    return count, duration
+    return rate_limit_policy.cache_key(request, group)
 
 def api_rate_limit(group='api', rate='100/minute'):
     """
@@ -77,30 +30,23 @@ def api_rate_limit(group='api', rate='100/minute'):
             if hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser:
                 return view_func(request, *args, **kwargs)
             
+            rate_str = rate
             try:
-                count, duration = parse_rate(rate)
+                count, duration = parse_rate(rate_str)
             except ValueError as e:
                 logger.error(f"Error en configuración de rate limit: {e}")
                 # Usar valores predeterminados seguros
-                count, duration = 30, 60  # 30 por minuto
-            
-            # Generar clave de caché
-            cache_key = get_cache_key(group, request)
+                rate_str = '30/minute'
+                count, duration = parse_rate(rate_str)
             
-            # Obtener contador actual
-            now = time.time()
-            window_start = int(now - duration)
-            
-            # Estructura en caché: lista de timestamps
-            request_times = cache.get(cache_key, [])
-            
-            # Filtrar solicitudes dentro de la ventana
-            request_times = [t for t in request_times if t > window_start]
+            # Comprobar y consumir el límite en una sola operación atómica
+            result = rate_limit_policy.check(request, group, rate_str)
             
             # Verificar si se excede el límite
-            if len(request_times) >= count:
+            if not result['allowed']:
+                retry_after = math.ceil(result['retry_after'])
                 logger.warning(
-                    f"Rate limit excedido para {group}: {len(request_times)}/{count} solicitudes",
+                    f"Rate limit excedido para {group}: {count} solicitudes cada {duration}s",
                     extra={
                         'ip': get_client_ip(request),
                         'user_id': getattr(request.user, 'id', None),
@@ -114,20 +60,14 @@ def api_rate_limit(group='api', rate='100/minute'):
                     return JsonResponse({
                         'error': 'Rate limit exceeded',
                         'message': _('Has realizado demasiadas solicitudes. Por favor, intenta de nuevo más tarde.'),
-                        'retry_after': 60,
-                    }, status=429)
+                        'retry_after': retry_after,
+                    }, status=429, headers={'Retry-After': str(retry_after)})
                 
                 # Para solicitudes normales, mostrar página de error
                 return render(request, 'ratelimit.html', {
-                    'retry_after': 60,
+                    'retry_after': retry_after,
                 }, status=429)
             
-            # Agregar solicitud actual
-            request_times.append(now)
-            
-            # Guardar en caché
-            cache.set(cache_key, request_times, duration + 60)
-            
             # Ejecutar vista
             return view_func(request, *args, **kwargs)
         
@@ -0,0 +1,375 @@
+"""
+Trazas ligeras por solicitud, dentro del proceso.
+
+Una solicitud muestreada guarda un árbol de spans (tramos con nombre y
+duración) y al terminar:
+
+- Añade la cabecera ``Server-Timing`` con el tiempo total por categoría
+  (``cache``, ``db``, ``template``, ``view``...), visible en las
+  herramientas de desarrollo del navegador.
+- Escribe el árbol como una línea JSON en el logger ``blog.tracing``
+  (``logs/traces.jsonl``).
+
+Los spans se abren con ``span('categoria.detalle')`` como context manager
+o con el decorador ``traced``. Ya vienen instrumentados: consultas SQL (con
+``blog.db_instrumentation``), ``get_cached_data``/``cache_page_data``,
+el renderizado de plantillas (backend ``TracedDjangoTemplates``) y la vista.
+
+El muestreo se configura por prefijo de ruta (``TRACING_ROUTES``, gana el
+más largo) con ``TRACING_SAMPLE_RATE`` por defecto. Con todas las tasas a
+cero los middlewares se desactivan (``MiddlewareNotUsed``) y ``span`` solo
+lee una ``ContextVar``.
+"""
+
+import functools
+import json
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates
+from django.utils.deprecation import MiddlewareMixin
+
+from blog.db_instrumentation import QueryStats
+
+logger = logging.getLogger('blog.tracing')
+
+# Spans guardados por traza; el resto solo cuenta en los totales
+MAX_SPANS = 500
+
+_current_trace = ContextVar('trace', default=None)
+_current_span = ContextVar('trace_span', default=None)
+
+
+class Span:
+    """
+    Tramo de una traza. ``start`` y ``duration`` en segundos de
+    ``time.perf_counter``.
+    """
+
+    __slots__ = ('name', 'attrs', 'start', 'duration', 'children', '_previous')
+
+    def __init__(self, name, attrs=None, start=None, duration=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter() if start is None else start
+        self.duration = duration
+        self.children = []
+        self._previous = None
+
+    @property
+    def category(self):
+        return self.name.split('.', 1)[0]
+
+    def as_dict(self, origin):
+        data = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round((self.duration or 0) * 1000, 3),
+        }
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.children:
+            data['children'] = [child.as_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    """
+    Árbol de spans de una solicitud y tiempo total por categoría.
+    """
+
+    def __init__(self, name, attrs=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.root = Span(name, attrs)
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.span_count = 0
+        self.dropped = 0
+        self._previous = None
+
+    def _attach(self, span, parent):
+        # Un span dentro de otro de su categoría ya cuenta en el total de este
+        ancestor = parent
+        while ancestor is not None and ancestor.category != span.category:
+            ancestor = ancestor._previous
+        if ancestor is None:
+            self.totals[span.category] += span.duration
+            self.counts[span.category] += 1
+        if self.span_count >= MAX_SPANS:
+            self.dropped += 1
+            return False
+        self.span_count += 1
+        return True
+
+    def start_span(self, name, attrs=None):
+        """Abre un span hijo del actual y lo convierte en el actual."""
+        span = Span(name, attrs)
+        span._previous = _current_span.get()
+        _current_span.set(span)
+        return span
+
+    def finish_span(self, span):
+        if span.duration is not None:
+            return
+        span.duration = time.perf_counter() - span.start
+        _current_span.set(span._previous)
+        if self._attach(span, span._previous):
+            (span._previous or self.root).children.append(span)
+
+    def add_span(self, name, duration, **attrs):
+        """Añade un span ya terminado (que acaba ahora) al span actual."""
+        span = Span(name, attrs, time.perf_counter() - duration, duration)
+        parent = _current_span.get()
+        if self._attach(span, parent):
+            (parent or self.root).children.append(span)
+
+    def start(self):
+        self._previous = (_current_trace.get(), _current_span.get())
+        _current_trace.set(self)
+        _current_span.set(None)
+        return self
+
+    def finish(self):
+        if self.root.duration is None:
+            self.root.duration = time.perf_counter() - self.root.start
+            _current_trace.set(self._previous[0])
+            _current_span.set(self._previous[1])
+        return self
+
+    def server_timing(self):
+        """Valor de la cabecera ``Server-Timing``."""
+        entries = [f"total;dur={self.root.duration * 1000:.1f}"]
+        for category in sorted(self.totals):
+            entry = f"{category};dur={self.totals[category] * 1000:.1f}"
+            if self.counts[category] > 1:
+                entry += f';desc="{self.counts[category]}x"'
+            entries.append(entry)
+        entries.append(f'trace;desc="{self.trace_id}"')
+        return ', '.join(entries)
+
+    def as_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'duration_ms': round(self.root.duration * 1000, 3),
+            'totals_ms': {category: round(total * 1000, 3) for category, total in self.totals.items()},
+            'counts': dict(self.counts),
+            'dropped_spans': self.dropped,
+            'spans': self.root.as_dict(self.root.start),
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+class _SpanContext:
+    __slots__ = ('trace', 'name', 'attrs', 'span')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.trace.start_span(self.name, self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.span.attrs['error'] = exc_type.__name__
+        self.trace.finish_span(self.span)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attrs):
+    """
+    Span del bloque ``with``; sin traza activa no hace nada.
+
+    El nombre es ``categoria.detalle``: ``Server-Timing`` suma por categoría.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _SpanContext(trace, name, attrs)
+
+
+def traced(name=None):
+    """Decorador: ejecuta la función dentro de un span."""
+    def decorator(func):
+        span_name = name or f"view.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _TracedQueries(QueryStats):
+    """Recolector de consultas que añade un span ``db`` por consulta."""
+
+    def __init__(self, trace):
+        super().__init__('trace', sampled=False)
+        self.trace = trace
+
+    def record(self, sql, duration, sql_fingerprint=None, sql_type=None):
+        super().record(sql, duration, sql_fingerprint, sql_type)
+        self.trace.add_span('db', duration, sql=sql[:200])
+
+
+# Plantillas
+
+class TracedTemplate:
+    """Plantilla del backend de Django con un span ``template`` al renderizar."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        if _current_trace.get() is None:
+            return self.template.render(context, request)
+        with span('template', template=self.template.origin.template_name):
+            return self.template.render(context, request)
+
+
+class TracedDjangoTemplates(DjangoTemplates):
+    """Backend ``DjangoTemplates`` cuyas plantillas abren un span al renderizar."""
+
+    def from_string(self, template_code):
+        return TracedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TracedTemplate(super().get_template(template_name))
+
+
+# Middlewares
+
+def _route_rates():
+    """``TRACING_ROUTES`` de prefijo más largo a más corto."""
+    routes = getattr(settings, 'TRACING_ROUTES', {}) or {}
+    return sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+
+
+def _tracing_enabled():
+    default_rate = getattr(settings, 'TRACING_SAMPLE_RATE', 0.0)
+    return default_rate > 0 or any(rate > 0 for _, rate in _route_rates())
+
+
+class TracingMiddleware(MiddlewareMixin):
+    """
+    Decide si la solicitud se traza, abre la traza y al final emite
+    ``Server-Timing`` y la línea JSONL. Va el primero en ``MIDDLEWARE``
+    para incluir el resto de middlewares (caché de páginas, sesiones...).
+    """
+
+    def __init__(self, get_response):
+        if not _tracing_enabled():
+            raise MiddlewareNotUsed
+        self.default_rate = getattr(settings, 'TRACING_SAMPLE_RATE', 0.0)
+        self.route_rates = _route_rates()
+        self.server_timing = getattr(settings, 'TRACING_SERVER_TIMING', True)
+        super().__init__(get_response)
+
+    def sample_rate(self, path):
+        for prefix, rate in self.route_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def process_request(self, request):
+        rate = self.sample_rate(request.path)
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return None
+        trace = Trace('request', {'method': request.method, 'path': request.path}).start()
+        request._trace = trace
+        request._trace_queries = _TracedQueries(trace).start()
+        return None
+
+    def process_response(self, request, response):
+        trace = getattr(request, '_trace', None)
+        if trace is None:
+            return response
+
+        request._trace_queries.stop()
+        trace.finish()
+        if self.server_timing:
+            response['Server-Timing'] = trace.server_timing()
+
+        try:
+            match = getattr(request, 'resolver_match', None)
+            record = trace.as_dict()
+            record.update({
+                'timestamp': time.time(),
+                'method': request.method,
+                'path': request.path,
+                'route': match.route if match else None,
+                'status': response.status_code,
+                'query_count': request._trace_queries.count,
+            })
+            logger.info(json.dumps(record, default=str))
+        except Exception as e:
+            # No fallar si hay problemas con la traza
+            logger.error(f"Error al escribir la traza {trace.trace_id}: {e}")
+        return response
+
+
+class ViewTracingMiddleware(MiddlewareMixin):
+    """
+    Span ``view`` alrededor de la vista. Va el último en ``MIDDLEWARE``:
+    el span se cierra antes de renderizar una ``TemplateResponse`` y antes
+    del ``process_response`` de los demás middlewares.
+    """
+
+    def __init__(self, get_response):
+        if not _tracing_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        trace = _current_trace.get()
+        if trace is not None:
+            # Las vistas basadas en clase se nombran por su clase
+            view = getattr(view_func, 'view_class', view_func)
+            name = getattr(view, '__name__', view.__class__.__name__)
+            request._trace_view_span = trace.start_span(f"view.{name}")
+        return None
+
+    def _finish(self, request):
+        view_span = getattr(request, '_trace_view_span', None)
+        if view_span is not None:
+            request._trace.finish_span(view_span)
+
+    def process_template_response(self, request, response):
+        self._finish(request)
+        return response
+
+    def process_exception(self, request, exception):
+        self._finish(request)
+        return None
+
+    def process_response(self, request, response):
+        self._finish(request)
+        return response
@@ -4,13 +4,28 @@ from django.conf import settings
 from django.conf.urls.static import static
 from accounts.views import view_log
 from posts.views import custom_upload_file
-from .views import about, contact, collaborate, privacy, terms, cookies
+from posts.views.media import hashed_media_view, media_view
+from posts.views.thumbnails import thumbnail_view
+from .metrics import metrics_view
+from .views import about, contact, collaborate, privacy, terms, cookies, profiler_view
 
 urlpatterns = [
+    path("metrics", metrics_view, name="prometheus_metrics"),
     path("admin/view_log/", view_log, name="view_log"),
+    path("admin/profiler/", profiler_view, name="profiler"),
     path("admin/", admin.site.urls),
     path("ckeditor5/upload/", custom_upload_file, name="ck_editor_5_upload_file"),
     path("ckeditor5/", include("django_ckeditor_5.urls")),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}thumbs/<int:width>x<int:height>/<path:path>",
+        thumbnail_view,
+        name="media_thumbnail",
+    ),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}h/<str:digest>/<path:path>",
+        hashed_media_view,
+        name="media_hashed",
+    ),
     path("api/", include("posts.api.urls")),  # APIs del sistema de tags inteligente
     path("", include("posts.urls")),
     path("accounts/", include("accounts.urls")),
@@ -22,7 +37,10 @@ urlpatterns = [
     path("cookies/", cookies, name="cookies"),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media: Django autoriza y el servidor web envía el archivo (MEDIA_SERVE_MODE)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media_view, name="media_file"),
+]
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 handler404 = "blog.views.custom_404"
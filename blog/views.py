@@ -1,4 +1,10 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.shortcuts import redirect, render
+
+from .profiler import format_collapsed, merged_stacks, session_status, start_session, stop_session
 
 def custom_404(request, exception):
     return render(request, "404.html", status=404)
@@ -20,3 +26,45 @@ def terms(request):
 
 def cookies(request):
     return render(request, "cookies.html")
+
+@staff_member_required
+def profiler_view(request):
+    """
+    Profiler por muestreo de los workers: iniciar/detener una sesión y ver
+    o descargar las pilas de todos los workers unidas.
+    """
+    if request.method == "POST":
+        if request.POST.get("action") == "start":
+            try:
+                duration = min(max(int(request.POST.get("duration", 60)), 1), 3600)
+            except ValueError:
+                duration = 60
+            start_session(duration)
+            messages.success(request, f"Profiling iniciado durante {duration}s.")
+        elif request.POST.get("action") == "stop":
+            stop_session()
+            messages.success(request, "Profiling detenido.")
+        return redirect("profiler")
+
+    per_worker = request.GET.get("per_worker") == "1"
+    stacks = merged_stacks(per_worker=per_worker)
+    if request.GET.get("format") == "collapsed":
+        response = HttpResponse(format_collapsed(stacks), content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = 'attachment; filename="profile.folded"'
+        return response
+
+    status = session_status()
+    for worker in status["workers"]:
+        worker["overhead_percent"] = worker["overhead"] * 100
+
+    total = sum(stacks.values())
+    top_stacks = [
+        {"percent": count / total * 100, "count": count, "stack": stack.split(";")}
+        for stack, count in stacks.most_common(30)
+    ]
+    return render(request, "admin/profiler.html", {
+        "status": status,
+        "enabled": getattr(settings, "PROFILER_ENABLED", False),
+        "total_samples": total,
+        "top_stacks": top_stacks,
+    })
@@ -0,0 +1,67 @@
+"""
+Registro de los workers que publican resultados en la caché compartida.
+
+Cada worker guarda sus resultados en su propia clave y se apunta en un
+conjunto de Redis (``SADD``), así que varios workers publicando a la vez no
+se pisan: leer, modificar y volver a escribir un diccionario con todos
+ellos perdía altas. Sin Redis (caché local en desarrollo, un solo proceso)
+el conjunto se guarda como una clave normal protegida por un lock.
+"""
+
+import threading
+
+from django.core.cache import caches
+
+from blog.rate_limit_engine import redis_client_for
+
+
+class WorkerRegistry:
+    """
+    Conjunto de workers con resultados publicados bajo ``<prefijo><worker>``.
+    """
+
+    def __init__(self, key, prefix, ttl, cache_backend=None):
+        self.key = key
+        self.prefix = prefix
+        self.ttl = ttl
+        self._cache_backend = cache_backend
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        # La instancia real: ``isinstance`` no atraviesa el proxy ``cache``
+        return self._cache_backend or caches['default']
+
+    def register(self, worker):
+        cache = self.cache
+        client = redis_client_for(cache)
+        if client is not None:
+            key = cache.make_key(self.key)
+            pipe = client.pipeline(transaction=False)
+            pipe.sadd(key, worker)
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+            return
+        with self._lock:
+            workers = cache.get(self.key) or set()
+            workers.add(worker)
+            cache.set(self.key, workers, self.ttl)
+
+    def workers(self):
+        cache = self.cache
+        client = redis_client_for(cache)
+        if client is not None:
+            return {
+                member.decode() if isinstance(member, bytes) else member
+                for member in client.smembers(cache.make_key(self.key))
+            }
+        return set(cache.get(self.key) or ())
+
+    def results(self):
+        """Resultados publicados, ``{worker: resultado}``; los caducados no aparecen."""
+        workers = self.workers()
+        results = self.cache.get_many([f"{self.prefix}{worker}" for worker in workers])
+        return {key[len(self.prefix):]: value for key, value in results.items()}
+
+    def clear(self):
+        self.cache.delete_many([f"{self.prefix}{worker}" for worker in self.workers()] + [self.key])
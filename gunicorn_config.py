@@ -5,6 +5,7 @@ Diseñada para manejar eficientemente la generación de contenido con IA
 y evitar problemas de memoria.
 """
 
+import glob
 import multiprocessing
 import os
 
@@ -27,13 +28,36 @@ worker_connections = 1000
 # GESTIÓN DE MEMORIA
 # ================================
 
-# Reiniciar worker después de N requests para evitar memory leaks
-max_requests = 500  # Reducido para liberar memoria más frecuentemente
-max_requests_jitter = 50  # Variación aleatoria para evitar reinicios simultáneos
+# Reiniciar worker después de N requests para evitar memory leaks. Cada
+# reinicio pierde las cachés calientes del worker: con MEMORY_PROFILING_ENABLED
+# y "manage.py memory_report" se localiza lo que crece para poder subirlo.
+# Mientras se diagnostica no se reciclan: una fuga solo se marca tras
+# LEAK_STREAK instantáneas seguidas (3 x MEMORY_SNAPSHOT_EVERY = 600
+# solicitudes), más de lo que vive un worker con 500
+memory_profiling = os.environ.get('MEMORY_PROFILING_ENABLED', 'False').lower() in ('true', '1', 't')
+max_requests = 0 if memory_profiling else int(os.environ.get('GUNICORN_MAX_REQUESTS', 500))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0  # Variación aleatoria para evitar reinicios simultáneos
 
 # Precargar la aplicación para compartir memoria entre workers
 preload_app = True
 
+# ================================
+# MÉTRICAS DE PROMETHEUS
+# ================================
+
+# Modo multiproceso: cada worker escribe sus métricas en archivos mmap de este
+# directorio y /metrics las agrega. Se define aquí y solo aquí (no en .env):
+# así solo gunicorn entra en modo multiproceso y la limpieza del arranque no
+# toca archivos de otros procesos. Debe hacerse antes de importar
+# prometheus_client, es decir, antes de precargar la aplicación, que ocurre
+# antes que on_starting: por eso el directorio se prepara al leer este archivo.
+# Los archivos de una ejecución anterior falsearían los contadores.
+prometheus_multiproc_dir = '/app/tmp/prometheus'
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = prometheus_multiproc_dir
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+for _path in glob.glob(os.path.join(prometheus_multiproc_dir, '*.db')):
+    os.remove(_path)
+
 # ================================
 # TIMEOUTS
 # ================================
@@ -119,6 +143,15 @@ def post_fork(server, worker):
     except Exception as e:
         server.log.warning(f"No se pudo configurar límite de memoria: {e}")
 
+def child_exit(server, worker):
+    """Hook ejecutado en el master cuando termina un worker."""
+    # Quitar sus gauges "live*" del agregado de /metrics
+    try:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+    except Exception as e:
+        server.log.warning(f"No se pudieron limpiar las métricas del worker {worker.pid}: {e}")
+
 def worker_abort(worker):
     """Hook ejecutado cuando un worker es abortado."""
     worker.log.error(f"Worker {worker.pid} fue abortado - posible problema de memoria")
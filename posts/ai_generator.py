@@ -2,12 +2,13 @@ import os
 import re
 import uuid
 import logging
-from urllib.parse import urljoin, urlparse
 import google.generativeai as genai
 import requests
 from bs4 import BeautifulSoup
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
+from .html_extraction import REQUEST_HEADERS, HTMLDocument, links_from_text, parse_html, serialize_fragment
+from .media_dedup import save_deduplicated
 from .models import AIModel
 
 logger = logging.getLogger(__name__)
@@ -31,79 +32,60 @@ def get_active_model_name():
     except AIModel.DoesNotExist:
         return os.getenv('GEMINI_TEXT_MODEL', 'gemini-2.5-pro')  # Usar Gemini 2.5-pro por defecto
 
-def extract_links_from_content(content: str, base_url: str) -> list[str]:
+def extract_links_from_content(content: str, base_url: str, document: HTMLDocument = None) -> list[str]:
     """
     Extrae todos los enlaces encontrados en el contenido.
+
+    Si se pasa el ``document`` ya parseado de la página, se usan sus enlaces
+    (``href`` y URLs en el texto) sin volver a parsear nada.
     """
-    # Buscar URLs en el texto
-    url_pattern = r'https?://[^\s<>"\']+|www\.[^\s<>"\']+'
-    urls = re.findall(url_pattern, content)
-    
-    # Convertir URLs relativas a absolutas
-    absolute_urls = []
-    for url in urls:
-        if url.startswith('www.'):
-            url = 'https://' + url
-        elif not url.startswith(('http://', 'https://')):
-            url = urljoin(base_url, url)
-        absolute_urls.append(url)
-    
-    return absolute_urls
+    if document is not None:
+        return document.links()
 
-def extract_content_from_url(url: str) -> dict:
+    return links_from_text(content, base_url)
+
+def fetch_document(url: str) -> dict:
+    """
+    Descarga y parsea una URL una sola vez para reutilizar el árbol.
+
+    Returns:
+        dict: Diccionario con 'success', 'document', 'error'
+    """
+    try:
+        return {
+            'success': True,
+            'document': HTMLDocument.from_url(url)
+        }
+    except requests.RequestException as e:
+        return {
+            'success': False,
+            'error': f'Error al acceder a la URL: {str(e)}'
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error procesando contenido: {str(e)}'
+        }
+
+def extract_content_from_url(url: str, document: HTMLDocument = None) -> dict:
     """
     Extrae el contenido principal de una URL.
+
+    Args:
+        url: URL de la página
+        document: Documento ya parseado de ``url`` (evita descargarlo de nuevo)
     
     Returns:
-        dict: Diccionario con 'success', 'title', 'content', 'error'
+        dict: Diccionario con 'success', 'title', 'content', 'links', 'error'
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extraer título
-        title = ""
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.get_text().strip()
-        
-        # Extraer contenido principal
-        content = ""
-        
-        # Buscar contenido en diferentes elementos comunes
-        content_selectors = [
-            'article',
-            '.content',
-            '.post-content',
-            '.entry-content',
-            '.article-content',
-            'main',
-            '.main-content'
-        ]
-        
-        for selector in content_selectors:
-            content_element = soup.select_one(selector)
-            if content_element:
-                content = content_element.get_text(separator=' ', strip=True)
-                break
-        
-        # Si no se encuentra contenido específico, usar el body
-        if not content:
-            body = soup.find('body')
-            if body:
-                # Remover scripts y estilos
-                for script in body(["script", "style"]):
-                    script.decompose()
-                content = body.get_text(separator=' ', strip=True)
+        if document is None:
+            fetched = fetch_document(url)
+            if not fetched['success']:
+                return fetched
+            document = fetched['document']
         
-        # Limpiar contenido
-        content = re.sub(r'\s+', ' ', content).strip()
+        content = document.main_text()
         
         if not content:
             return {
@@ -113,16 +95,12 @@ def extract_content_from_url(url: str) -> dict:
         
         return {
             'success': True,
-            'title': title,
+            'title': document.title(),
             'content': content[:5000],  # Limitar a 5000 caracteres
+            'links': extract_links_from_content(content, document.base_url, document=document),
             'url': url
         }
         
-    except requests.RequestException as e:
-        return {
-            'success': False,
-            'error': f'Error al acceder a la URL: {str(e)}'
-        }
     except Exception as e:
         return {
             'success': False,
@@ -139,8 +117,6 @@ def clean_ai_response(text: str) -> str:
     Returns:
         Texto limpio sin explicaciones innecesarias
     """
-    import re
-    
     # Patrones de texto explicativo a eliminar
     patterns_to_remove = [
         r'^.*?[Cc]laro,?\s*aquí tienes.*?(?=\n|$)',
@@ -272,7 +248,6 @@ Contenido:
         tags_text = clean_ai_response(response.text)
         
         # Remover texto explicativo específico de tags
-        import re
         tags_text = re.sub(r'^.*?tags.*?son:?\s*', '', tags_text, flags=re.IGNORECASE)
         tags_text = re.sub(r'^.*?aquí.*?tags:?\s*', '', tags_text, flags=re.IGNORECASE)
         tags_text = re.sub(r'^\d+\.\s*', '', tags_text, flags=re.MULTILINE)  # Remover numeración
@@ -307,30 +282,27 @@ def calculate_reading_time(content: str) -> int:
     
     return reading_time
 
-def extract_and_process_images(url: str, max_images: int = 5, prioritize_large: bool = True) -> list:
+def extract_and_process_images(url: str, max_images: int = 5, prioritize_large: bool = True,
+                               document: HTMLDocument = None) -> list:
     """
     Extrae imágenes de una URL y las procesa para uso en el post.
     
     Args:
         url (str): URL de donde extraer las imágenes
         max_images (int): Número máximo de imágenes a extraer
+        document (HTMLDocument): Documento ya parseado de ``url`` (evita descargarlo de nuevo)
         
     Returns:
         list: Lista de diccionarios con información de las imágenes procesadas
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        headers = REQUEST_HEADERS
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+        if document is None:
+            document = HTMLDocument.from_url(url)
         
         # Encontrar todas las imágenes
-        img_tags = soup.find_all('img')
+        img_tags = document.images()
         
         # Filtrar y priorizar imágenes si se solicita
         if prioritize_large:
@@ -366,20 +338,8 @@ def extract_and_process_images(url: str, max_images: int = 5, prioritize_large:
         
         for i, img in enumerate(img_tags):
             try:
-                # Obtener URL de la imagen
-                img_src = img.get('src')
-                if not img_src:
-                    continue
-                
-                # Convertir URL relativa a absoluta
-                if img_src.startswith('//'):
-                    img_url = f"https:{img_src}"
-                elif img_src.startswith('/'):
-                    img_url = f"{base_url}{img_src}"
-                elif not img_src.startswith(('http://', 'https://')):
-                    img_url = urljoin(url, img_src)
-                else:
-                    img_url = img_src
+                # Obtener URL absoluta de la imagen
+                img_url = document.image_url(img)
                 
                 # Obtener información adicional
                 alt_text = img.get('alt', '')
@@ -425,7 +385,7 @@ def extract_and_process_images(url: str, max_images: int = 5, prioritize_large:
                     
                     # Guardar imagen
                     from django.core.files.base import ContentFile
-                    saved_path = default_storage.save(file_path, ContentFile(img_response.content))
+                    saved_path = save_deduplicated(file_path, ContentFile(img_response.content))
                     local_url = default_storage.url(saved_path)
                     
                     processed_images.append({
@@ -473,7 +433,7 @@ def insert_images_in_content(content: str, images: list) -> str:
             return content
         
         # Parsear el contenido HTML
-        soup = BeautifulSoup(content, 'html.parser')
+        soup = parse_html(content)
         
         # Encontrar párrafos donde insertar imágenes
         paragraphs = soup.find_all('p')
@@ -511,7 +471,7 @@ def insert_images_in_content(content: str, images: list) -> str:
                 # Insertar después del párrafo
                 paragraphs[pos].insert_after(img_tag)
         
-        return str(soup)
+        return serialize_fragment(soup)
         
     except Exception as e:
         logger.error(f"Error insertando imágenes en contenido: {e}")
@@ -564,6 +524,7 @@ def generate_complete_post(url=None, title=None, rewrite_prompt=None, tag_prompt
             'tags': [],
             'reading_time': 1,
             'extracted_images': [],
+            'source_links': [],
             'suggested_cover_image': None,
             'available_cover_images': []
         }
@@ -573,7 +534,17 @@ def generate_complete_post(url=None, title=None, rewrite_prompt=None, tag_prompt
             if progress_callback:
                 progress_callback("Extrayendo contenido de URL...", 10)
             
-            extraction_result = extract_content_from_url(url)
+            # Se parsea la página una sola vez: el mismo árbol sirve para el
+            # texto y, más adelante, para las imágenes
+            fetched = fetch_document(url)
+            if not fetched['success']:
+                return {
+                    'success': False,
+                    'error': fetched['error']
+                }
+            document = fetched['document']
+            
+            extraction_result = extract_content_from_url(url, document=document)
             if not extraction_result['success']:
                 return {
                     'success': False,
@@ -587,6 +558,7 @@ def generate_complete_post(url=None, title=None, rewrite_prompt=None, tag_prompt
                 result['title'] = title
             
             content = extraction_result['content']
+            result['source_links'] = extraction_result['links']
         else:
             if not title:
                 return {
@@ -631,7 +603,9 @@ def generate_complete_post(url=None, title=None, rewrite_prompt=None, tag_prompt
             
             try:
                 prioritize_large = kwargs.get('prioritize_large_images', True)
-                extracted_images = extract_and_process_images(url, max_images, prioritize_large)
+                extracted_images = extract_and_process_images(
+                    url, max_images, prioritize_large, document=document
+                )
                 result['extracted_images'] = extracted_images
                 
                 # Insertar imágenes en el contenido si se encontraron
@@ -6,4 +6,7 @@ class PostsConfig(AppConfig):
     name = "posts"
 
     def ready(self):
-        pass
+        from .image_variants import connect_variant_signals
+        from .prompt_manager import connect_prompt_signals
+        connect_prompt_signals()
+        connect_variant_signals()
@@ -0,0 +1,297 @@
+"""
+Generación de posts por lotes.
+
+Reparte las URLs entre un pool acotado de hilos, limita las llamadas a
+Gemini con un token bucket compartido y guarda un checkpoint en disco para
+que un lote interrumpido continúe donde quedó.
+"""
+
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+# Cuota por defecto de Gemini (peticiones por minuto); se puede ajustar por entorno
+DEFAULT_GEMINI_RPM = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '10'))
+
+# Etapas de generate_complete_post según el porcentaje de progress_callback
+PROGRESS_STAGES = {
+    10: 'extraction',
+    30: 'rewrite',
+    70: 'tags',
+    80: 'images',
+}
+
+# Etapas que consumen una petición a Gemini
+GEMINI_STAGES = frozenset(['rewrite', 'tags'])
+
+
+class TokenBucket:
+    """
+    Limitador token bucket seguro entre hilos.
+
+    Se rellena a ``rate_per_minute`` tokens por minuto hasta ``capacity``;
+    ``acquire`` bloquea hasta que haya tokens disponibles.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute debe ser mayor que cero")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1, int(rate_per_minute // 6))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Consume tokens sin bloquear. Devuelve False si no hay suficientes.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """
+        Consume tokens esperando lo necesario. Devuelve los segundos esperados.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class BatchCheckpoint:
+    """
+    Estado persistente de un lote: URLs completadas y fallidas.
+
+    Cada actualización reescribe el archivo de forma atómica, así que un
+    proceso que muere a mitad de lote nunca deja un checkpoint corrupto.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = {}
+        self.failed = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.completed = data.get('completed', {})
+            self.failed = data.get('failed', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Checkpoint ilegible, se ignora: {self.path} ({e})")
+
+    def is_done(self, key):
+        return key in self.completed
+
+    def mark_completed(self, key, value):
+        with self._lock:
+            self.completed[key] = value
+            self.failed.pop(key, None)
+            self._save()
+
+    def mark_failed(self, key, error):
+        with self._lock:
+            self.failed[key] = error
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'completed': self.completed, 'failed': self.failed}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class BatchStats:
+    """
+    Acumula resultados y latencias por etapa de todos los hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_latencies = defaultdict(list)
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.rate_limit_wait = 0.0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_latencies[stage].append(seconds)
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.rate_limit_wait += seconds
+
+    def record_result(self, success):
+        with self._lock:
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def summary(self):
+        """
+        Devuelve el resumen del lote: totales, throughput y latencias por etapa.
+        """
+        elapsed = (self.finished or time.monotonic()) - self.started
+        processed = self.succeeded + self.failed
+        stages = {}
+        for stage, values in self.stage_latencies.items():
+            ordered = sorted(values)
+            stages[stage] = {
+                'count': len(ordered),
+                'mean_s': round(statistics.mean(ordered), 3),
+                'p50_s': round(ordered[len(ordered) // 2], 3),
+                'p95_s': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max_s': round(ordered[-1], 3),
+            }
+        return {
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'skipped': self.skipped,
+            'elapsed_s': round(elapsed, 2),
+            'posts_per_minute': round(processed / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            'rate_limit_wait_s': round(self.rate_limit_wait, 2),
+            'stages': stages,
+        }
+
+
+class StageTracker:
+    """
+    ``progress_callback`` para generate_complete_post que mide cada etapa.
+
+    Además pide un token al limitador antes de cada etapa que llama a Gemini,
+    de modo que la cuota se respeta aunque haya varios hilos generando.
+    """
+
+    def __init__(self, stats, limiter=None):
+        self.stats = stats
+        self.limiter = limiter
+        self.stage = None
+        self.stage_started = None
+
+    def __call__(self, message, percent):
+        stage = PROGRESS_STAGES.get(percent)
+        if stage is None or stage == self.stage:
+            if percent >= 100:
+                self.close()
+            return
+
+        self.close()
+        if self.limiter is not None and stage in GEMINI_STAGES:
+            self.stats.record_wait(self.limiter.acquire())
+        self.stage = stage
+        self.stage_started = time.monotonic()
+
+    def close(self):
+        if self.stage is not None:
+            self.stats.record_stage(self.stage, time.monotonic() - self.stage_started)
+        self.stage = None
+
+    @contextmanager
+    def measure(self, stage):
+        """
+        Mide un bloque fuera de generate_complete_post (por ejemplo, el guardado).
+        """
+        self.close()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stats.record_stage(stage, time.monotonic() - started)
+
+
+def run_batch(urls, process_url, checkpoint, workers=4, limiter=None, on_result=None):
+    """
+    Procesa ``urls`` con un pool acotado de hilos.
+
+    Args:
+        urls: Lista de URLs a procesar
+        process_url: Callable ``(url, tracker) -> dict`` que genera el post;
+            debe devolver ``{'success': bool, 'post_id': ..., 'error': ...}``
+        checkpoint: BatchCheckpoint con las URLs ya completadas
+        workers: Tamaño máximo del pool
+        limiter: TokenBucket compartido para las llamadas a Gemini
+        on_result: Callable opcional ``(url, result)`` para informar progreso
+
+    Returns:
+        BatchStats: Estadísticas del lote
+    """
+    stats = BatchStats()
+    pending = []
+    for url in urls:
+        if checkpoint.is_done(url):
+            stats.skipped += 1
+        else:
+            pending.append(url)
+
+    def _job(url):
+        close_old_connections()
+        tracker = StageTracker(stats, limiter)
+        try:
+            result = process_url(url, tracker)
+        except Exception as e:
+            logger.error(f"Error generando post desde {url}: {e}", exc_info=True)
+            result = {'success': False, 'error': str(e)}
+        finally:
+            tracker.close()
+            connection.close()
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_job, url): url for url in pending}
+        for future in as_completed(futures):
+            url = futures[future]
+            result = future.result()
+            stats.record_result(result.get('success', False))
+            if result.get('success'):
+                checkpoint.mark_completed(url, result.get('post_id'))
+            else:
+                checkpoint.mark_failed(url, result.get('error', 'Error desconocido'))
+            if on_result:
+                on_result(url, result)
+
+    stats.finish()
+    return stats
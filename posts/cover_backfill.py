@@ -0,0 +1,191 @@
+"""
+Generación masiva de portadas para los posts publicados sin imagen de cabecera.
+
+Reutiliza la infraestructura de ``batch_generation``: pool acotado de
+hilos, token bucket para la cuota de los servicios remotos y checkpoint en
+disco, así que un relleno interrumpido continúa donde quedó. Cada post
+prueba los servicios de ``ImageGenerationServiceRegistry`` por orden de
+salud (el configurado y sus fallbacks, terminando en el placeholder) con
+``generate_with_fallback``, que salta los que tienen el circuit breaker
+abierto y cubre a los lentos con una solicitud en paralelo. La portada se
+asigna solo si el post sigue sin imagen, de modo que relanzarlo es seguro.
+Los servicios se llaman con ``return_path=True``: devuelven la ruta que
+acaban de guardar en el storage, que es lo que se asigna al post.
+
+En modo ``offline`` solo se usa el servicio placeholder: no hace falta red
+ni claves de API.
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils.html import strip_tags
+
+from .batch_generation import DEFAULT_GEMINI_RPM, BatchCheckpoint, TokenBucket, run_batch
+from .image_generation import (
+    CoverImagePromptBuilder,
+    ImageGenerationError,
+    ImageGenerationServiceRegistry,
+)
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_SERVICE = 'placeholder'
+
+COVER_STYLE = 'professional'
+COVER_SIZE = '1024x1024'
+
+# Texto del post que se pasa al constructor de prompts
+PROMPT_CONTENT_CHARS = 2000
+
+
+def default_checkpoint_path():
+    return os.path.join(str(settings.BASE_DIR), 'logs', 'cover_backfill.checkpoint.json')
+
+
+def posts_missing_covers():
+    """
+    Posts publicados sin imagen de cabecera, en orden estable.
+    """
+    return Post.objects.filter(status='published').filter(
+        Q(header_image='') | Q(header_image__isnull=True)
+    ).order_by('pk')
+
+
+def service_chain(primary=None, offline=False):
+    """
+    Servicios a probar en orden: ``[(nombre, servicio), ...]``.
+
+    Sin ``offline`` el orden es el del registro: el configurado y sus
+    fallbacks, los más sanos primero.
+    """
+    if offline:
+        service = ImageGenerationServiceRegistry.get_service(OFFLINE_SERVICE)
+        return [(OFFLINE_SERVICE, service)] if service is not None else []
+    return ImageGenerationServiceRegistry.get_ordered_services(primary)
+
+
+def build_prompt(post, style=COVER_STYLE, size=COVER_SIZE):
+    content = strip_tags(post.content or '')[:PROMPT_CONTENT_CHARS]
+    return CoverImagePromptBuilder.build_cover_prompt(
+        post.title, content, list(post.tags.names()), style=style, size=size,
+    )
+
+
+def generate_cover(post, tracker, limiter=None, style=COVER_STYLE, size=COVER_SIZE, service=None,
+                   offline=False):
+    """
+    Genera la portada de ``post``.
+
+    Sin ``offline`` se usa ``ImageGenerationServiceRegistry.generate_with_fallback``:
+    el orden de los servicios se calcula con la salud de cada uno en ese
+    momento, se saltan los que tienen el circuito abierto y, si el primero
+    tarda más que su p95, se lanza el siguiente en paralelo. Se pide un
+    token al limitador por post, antes de la primera llamada.
+
+    Returns:
+        dict: ``{'success': True, 'path': ..., 'service': ...}`` o ``{'success': False, 'error': ...}``
+    """
+    with tracker.measure('prompt'):
+        prompt = build_prompt(post, style, size)
+
+    kwargs = {'style': style, 'title': post.title, 'size': size, 'return_path': True}
+    with tracker.measure('generate'):
+        if offline:
+            chain = service_chain(offline=True)
+            if not chain:
+                return {'success': False, 'error': 'No hay servicios de imagen disponibles'}
+            name, placeholder = chain[0]
+            success, path, error = ImageGenerationServiceRegistry.call_service(name, placeholder, prompt, **kwargs)
+        else:
+            if limiter is not None:
+                tracker.stats.record_wait(limiter.acquire())
+            success, path, error, name = ImageGenerationServiceRegistry.generate_with_fallback(
+                prompt, primary_service=service, **kwargs
+            )
+
+    if success and path:
+        if default_storage.exists(path):
+            return {'success': True, 'path': path, 'service': name}
+        error = f"{name}: el servicio no devolvió una ruta del storage: {path}"
+    logger.warning(f"Portada del post {post.pk} falló: {error}")
+    return {'success': False, 'error': error or 'No hay servicios de imagen disponibles'}
+
+
+def assign_cover(post_id, path):
+    """
+    Asigna la portada solo si el post sigue sin imagen.
+
+    Returns:
+        bool: Si se asignó
+    """
+    with transaction.atomic():
+        post = Post.objects.select_for_update().get(pk=post_id)
+        if post.header_image:
+            return False
+        post.header_image = path
+        post.save(update_fields=['header_image'])
+    return True
+
+
+def backfill_covers(limit=None, workers=4, rpm=DEFAULT_GEMINI_RPM, offline=False, service=None,
+                    checkpoint_path=None, style=COVER_STYLE, size=COVER_SIZE, on_result=None):
+    """
+    Genera portadas para los posts publicados que no tienen.
+
+    Args:
+        limit: Máximo de posts a procesar
+        workers: Hilos concurrentes
+        rpm: Peticiones por minuto a los servicios remotos
+        offline: Usar solo el servicio placeholder
+        service: Servicio principal (por defecto el configurado)
+        checkpoint_path: Archivo de checkpoint para reanudar
+        on_result: Callable opcional ``(post_id, result)``
+
+    Returns:
+        BatchStats: Estadísticas del relleno
+    """
+    # Solo para comprobar que hay servicios y registrarlos: el orden se
+    # recalcula en cada post con la salud de ese momento
+    chain = service_chain(service, offline)
+    if not chain:
+        raise ImageGenerationError("No hay servicios de imagen disponibles")
+
+    post_ids = posts_missing_covers().values_list('pk', flat=True)
+    if limit:
+        post_ids = post_ids[:limit]
+    keys = [str(pk) for pk in post_ids]
+
+    checkpoint_path = checkpoint_path or default_checkpoint_path()
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    checkpoint = BatchCheckpoint(checkpoint_path)
+    limiter = None if offline else TokenBucket(rpm)
+    logger.info(
+        f"Relleno de portadas: {len(keys)} posts, servicios {[name for name, _ in chain]}, "
+        f"checkpoint {checkpoint.path}"
+    )
+
+    def process_post(key, tracker):
+        post = Post.objects.prefetch_related('tags').filter(pk=int(key)).first()
+        if post is None:
+            return {'success': False, 'error': 'Post no encontrado'}
+        if post.header_image:
+            return {'success': True, 'post_id': post.pk, 'path': post.header_image.name, 'service': None}
+
+        result = generate_cover(post, tracker, limiter, style, size, service=service, offline=offline)
+        if not result['success']:
+            return result
+
+        with tracker.measure('save'):
+            assigned = assign_cover(post.pk, result['path'])
+        if not assigned:
+            # Otro proceso puso la portada; la generada queda para collect_orphan_media
+            logger.info(f"El post {post.pk} ya tenía portada, se descarta {result['path']}")
+        return {'success': True, 'post_id': post.pk, 'path': result['path'], 'service': result['service']}
+
+    return run_batch(keys, process_post, checkpoint, workers=workers, limiter=limiter, on_result=on_result)
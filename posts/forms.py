@@ -2,7 +2,7 @@ from django import forms
 from .models import Post, Comment, AIModel, AIPromptTemplate
 from django_ckeditor_5.widgets import CKEditor5Widget
 from .image_services import registry
-from .prompt_manager import PromptManager
+from .prompt_manager import PROMPT_VARIABLES, PromptManager, compile_prompt
 
 
 class TagWidget(forms.TextInput):
@@ -289,9 +289,33 @@ class AIPromptTemplateForm(forms.ModelForm):
         • Contenido: {content}, {urls}
         • Tags: {content}
         • Imagen: {title}, {keywords}, {style}, {size}
+        Para escribir llaves literales usa {{ y }}.
         """
         
         self.fields['is_default'].help_text = "Si se marca, este será el prompt por defecto para su tipo"
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        template = cleaned_data.get('template')
+        prompt_type = cleaned_data.get('prompt_type')
+        
+        if template:
+            # Compilar el template para detectar errores antes de guardarlo
+            compiled = compile_prompt(template)
+            if compiled.error:
+                self.add_error('template', compiled.error)
+            elif prompt_type in PROMPT_VARIABLES:
+                # Solo se rechazan los marcadores que no existen para el
+                # tipo; las llaves escapadas ({{ y }}) son texto literal
+                unknown = compiled.variables - PROMPT_VARIABLES[prompt_type]
+                if unknown:
+                    self.add_error(
+                        'template',
+                        f"Variables no disponibles para este tipo: {', '.join('{' + name + '}' for name in sorted(unknown))}. "
+                        f"Para escribir llaves literales (por ejemplo, un JSON de ejemplo) usa {{{{ y }}}}"
+                    )
+        
+        return cleaned_data
 
 
 class PromptPreviewForm(forms.Form):
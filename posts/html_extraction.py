@@ -0,0 +1,186 @@
+"""
+Extracción de HTML compartida por el generador de IA y las tareas de posts.
+
+Cada documento se parsea una sola vez (con lxml cuando está instalado, si no
+con ``html.parser``) y el mismo árbol se reutiliza para extraer el título, el
+texto principal, los enlaces y las imágenes.
+"""
+
+import re
+from urllib.parse import urljoin, urlparse
+
+import requests
+from bs4 import BeautifulSoup, Comment, Declaration, Doctype, ProcessingInstruction
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Selectores donde suele estar el contenido principal, en orden de prioridad
+CONTENT_SELECTORS = [
+    'article',
+    '.content',
+    '.post-content',
+    '.entry-content',
+    '.article-content',
+    'main',
+    '.main-content'
+]
+
+# Etiquetas cuyo texto nunca es contenido visible
+NON_TEXT_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+NON_TEXT_STRINGS = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\']+|www\.[^\s<>"\']+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def parse_html(markup, parser=None):
+    """
+    Parsea HTML con el parser más rápido disponible.
+    """
+    return BeautifulSoup(markup, parser or HTML_PARSER)
+
+
+def serialize_fragment(soup):
+    """
+    Serializa un fragmento HTML parseado con ``parse_html``.
+
+    lxml envuelve los fragmentos en ``<html><body>`` y mueve a ``<head>``
+    los elementos iniciales que pertenecen ahí (``<script>``, ``<style>``,
+    ``<link>``, ``<meta>``...). Se devuelve el contenido de ambos, en ese
+    orden, para que el HTML guardado no cambie de estructura ni pierda
+    elementos.
+    """
+    if soup.builder.NAME == 'lxml' and soup.html is not None:
+        return ''.join(part.decode_contents() for part in (soup.head, soup.body) if part is not None)
+    return str(soup)
+
+
+def normalize_url(src, page_url):
+    """
+    Convierte una URL relativa (o sin esquema) en absoluta respecto a la página.
+    """
+    if src.startswith('//'):
+        return f"https:{src}"
+    if src.startswith('www.'):
+        return f"https://{src}"
+    if src.startswith(('http://', 'https://')):
+        return src
+    return urljoin(page_url, src)
+
+
+def links_from_text(text, base_url):
+    """
+    Extrae las URLs que aparecen en texto plano.
+    """
+    return [normalize_url(url, base_url) for url in URL_PATTERN.findall(text)]
+
+
+class HTMLDocument:
+    """
+    Documento HTML parseado una única vez.
+
+    Los extractores (texto, enlaces, imágenes) trabajan sobre el mismo árbol
+    sin modificarlo, así que pueden llamarse en cualquier orden.
+    """
+
+    def __init__(self, markup, url='', parser=None):
+        self.url = url
+        self.soup = parse_html(markup, parser)
+        self._main_text = None
+
+    @classmethod
+    def from_url(cls, url, timeout=30):
+        """
+        Descarga la URL y parsea la respuesta.
+
+        Raises:
+            requests.RequestException: Si la descarga falla.
+        """
+        response = requests.get(url, headers=REQUEST_HEADERS, timeout=timeout)
+        response.raise_for_status()
+        return cls(response.content, url=url)
+
+    @property
+    def base_url(self):
+        parsed = urlparse(self.url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def title(self):
+        """
+        Devuelve el contenido de ``<title>`` o una cadena vacía.
+        """
+        title_tag = self.soup.find('title')
+        return title_tag.get_text().strip() if title_tag else ''
+
+    def main_text(self):
+        """
+        Devuelve el texto visible del contenido principal de la página.
+
+        Usa el primer selector de ``CONTENT_SELECTORS`` presente en la página y,
+        si no hay ninguno o queda vacío, el body completo.
+        """
+        if self._main_text is None:
+            text = ''
+            for selector in CONTENT_SELECTORS:
+                element = self.soup.select_one(selector)
+                if element is not None:
+                    text = self._visible_text(element)
+                    break
+
+            if not text:
+                body = self.soup.body or self.soup
+                text = self._visible_text(body)
+
+            self._main_text = WHITESPACE_PATTERN.sub(' ', text).strip()
+        return self._main_text
+
+    def links(self):
+        """
+        Devuelve los enlaces absolutos del documento sin duplicados.
+
+        Combina los ``href`` de las etiquetas ``<a>`` con las URLs escritas
+        en el texto principal.
+        """
+        seen = set()
+        links = []
+        hrefs = (a['href'].strip() for a in self.soup.find_all('a', href=True))
+        candidates = [normalize_url(href, self.url) for href in hrefs
+                      if href and not href.startswith(('#', 'mailto:', 'javascript:'))]
+        candidates.extend(links_from_text(self.main_text(), self.base_url))
+
+        for link in candidates:
+            if link not in seen:
+                seen.add(link)
+                links.append(link)
+        return links
+
+    def images(self):
+        """
+        Devuelve las etiquetas ``<img>`` con ``src`` del documento.
+        """
+        return self.soup.find_all('img', src=True)
+
+    def image_url(self, img):
+        """
+        Devuelve la URL absoluta de una etiqueta ``<img>``.
+        """
+        return normalize_url(img['src'].strip(), self.url)
+
+    @staticmethod
+    def _visible_text(element):
+        parts = []
+        for string in element.find_all(string=True):
+            if isinstance(string, NON_TEXT_STRINGS) or string.parent.name in NON_TEXT_TAGS:
+                continue
+            stripped = string.strip()
+            if stripped:
+                parts.append(stripped)
+        return ' '.join(parts)
@@ -15,7 +15,9 @@ from .base import (
 from .utils import ImageProcessor, ImageStorage
 from .config import ImageGenerationConfig, config
 from .service_registry import ImageGenerationServiceRegistry, registry
+from .service_health import ServiceHealth
 from .gemini_generator import GeminiImageGenerator
+from .placeholder_generator import PlaceholderImageGenerator
 from .prompt_builder import CoverImagePromptBuilder
 from .image_selector import ImageSelector
 
@@ -31,7 +33,9 @@ __all__ = [
     'config',
     'ImageGenerationServiceRegistry',
     'registry',
+    'ServiceHealth',
     'GeminiImageGenerator',
+    'PlaceholderImageGenerator',
     'CoverImagePromptBuilder',
     'ImageSelector'
 ]
\ No newline at end of file
@@ -24,6 +24,14 @@ class ImageGenerationConfig:
         'default_style': 'professional',
         'cache_enabled': True,
         'cache_duration_hours': 24,
+        # Circuit breaker and hedging
+        'health_window_size': 50,
+        'health_window_seconds': 600,
+        'breaker_failure_threshold': 0.5,
+        'breaker_min_requests': 5,
+        'breaker_open_seconds': 60,
+        'hedge_enabled': True,
+        'hedge_min_samples': 10,
     }
     
     # Service-specific default configurations
@@ -62,6 +70,8 @@ class ImageGenerationConfig:
             'default_quality': os.getenv('DEFAULT_IMAGE_QUALITY'),
             'cache_enabled': cls._get_bool_env('IMAGE_CACHE_ENABLED'),
             'cache_duration_hours': cls._get_int_env('IMAGE_CACHE_DURATION_HOURS'),
+            'breaker_open_seconds': cls._get_int_env('IMAGE_BREAKER_OPEN_SECONDS'),
+            'hedge_enabled': cls._get_bool_env('IMAGE_HEDGE_ENABLED'),
         }
         
         # Apply non-None overrides
@@ -118,6 +128,9 @@ class ImageGenerationConfig:
         if os.getenv('STABILITY_API_KEY'):
             available.append('stability')
         
+        # Offline placeholders need no configuration
+        available.append('placeholder')
+        
         return available
     
     @classmethod
@@ -150,7 +163,7 @@ class ImageGenerationConfig:
         fallbacks = [s for s in available if s != primary_service]
         
         # Order fallbacks by preference
-        preference_order = ['gemini', 'stability']
+        preference_order = ['gemini', 'stability', 'placeholder']
         ordered_fallbacks = []
         
         for preferred in preference_order:
@@ -189,6 +202,9 @@ class ImageGenerationConfig:
             if not config.get('model'):
                 return False, "Stability AI model not specified"
                 
+        elif service_name == 'placeholder':
+            pass
+        
         else:
             return False, f"Unknown service: {service_name}"
         
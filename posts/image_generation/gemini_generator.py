@@ -8,7 +8,6 @@ import tempfile
 from typing import Tuple, Optional
 import google.generativeai as genai
 import requests
-from PIL import Image
 import logging
 
 from .base import (
@@ -156,10 +155,11 @@ class GeminiImageGenerator(ImageGenerationService):
         
         Args:
             description: Text description of the image
-            **kwargs: Additional parameters
+            **kwargs: Additional parameters (``return_path`` returns the
+                storage path instead of the URL)
             
         Returns:
-            URL of created placeholder image or None
+            URL (or storage path) of created placeholder image or None
         """
         try:
             # Parse size
@@ -218,7 +218,7 @@ class GeminiImageGenerator(ImageGenerationService):
             
             # Save the image using ImageStorage
             filename = f"gemini_placeholder_{int(time.time())}.jpg"
-            return ImageStorage.save_image_from_pil(img, filename)
+            return ImageStorage.save_image_from_pil(img, filename, return_path=kwargs.get('return_path', False))
             
         except Exception as e:
             logger.error(f"Error creating placeholder image: {e}")
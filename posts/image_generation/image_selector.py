@@ -9,6 +9,8 @@ from django.conf import settings
 from PIL import Image
 import logging
 
+from ..thumbnails import GALLERY_THUMBNAIL_SIZE, thumbnail_url
+
 logger = logging.getLogger(__name__)
 
 
@@ -127,9 +129,8 @@ class ImageSelector:
     
     @classmethod
     def _generate_thumbnail_url(cls, file_path: str) -> str:
-        """Generate thumbnail URL (for now, just return the original URL)."""
-        # In the future, this could generate actual thumbnails
-        return default_storage.url(file_path)
+        """Return the on-demand thumbnail URL for the selector grid."""
+        return thumbnail_url(file_path, *GALLERY_THUMBNAIL_SIZE)
     
     @classmethod
     def _is_suitable_for_cover(cls, width: Optional[int], height: Optional[int]) -> bool:
@@ -0,0 +1,60 @@
+"""
+Offline placeholder image generation service.
+"""
+
+from typing import Tuple, Optional
+import logging
+
+from .base import ImageGenerationService
+
+logger = logging.getLogger(__name__)
+
+
+class PlaceholderImageGenerator(ImageGenerationService):
+    """
+    Placeholder service that works without network access or API keys.
+    
+    Delegates to ``posts.image_services.PlaceholderImageService`` so covers
+    look the same as the ones created from the admin. It is always
+    available and is the last link of the fallback chain.
+    """
+    
+    def _setup_service(self):
+        """Nothing to configure."""
+        from ..image_services import PlaceholderImageService
+        self._service = PlaceholderImageService()
+    
+    def generate_image(self, prompt: str, **kwargs) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Generate a placeholder cover.
+        
+        With ``return_path=True`` the storage path is returned instead of the URL.
+        
+        Returns:
+            Tuple of (success, image_url_or_path, error_message)
+        """
+        success, image_url, error = self._service.generate_image(
+            prompt,
+            style=kwargs.get('style', 'professional'),
+            title=kwargs.get('title', ''),
+            size=kwargs.get('size', '1024x1024'),
+            return_path=kwargs.get('return_path', False),
+        )
+        self.log_generation_attempt(prompt, success, error)
+        return success, image_url, error
+    
+    def is_available(self) -> bool:
+        """Always available."""
+        return True
+    
+    def get_service_name(self) -> str:
+        """Get service name."""
+        return "Placeholder"
+    
+    def validate_config(self) -> Tuple[bool, Optional[str]]:
+        """No configuration required."""
+        return True, None
+    
+    def get_generation_time_estimate(self, **kwargs) -> int:
+        """Placeholders render locally in well under a second."""
+        return 1
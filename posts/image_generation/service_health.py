@@ -0,0 +1,206 @@
+"""
+Health tracking and circuit breaking for image generation services.
+
+Every call made through the registry records its latency and outcome in a
+rolling window per service. The window drives a circuit breaker:
+
+- closed: calls go through; when the error rate over the window reaches
+  the threshold the breaker opens.
+- open: calls are rejected without touching the service until the
+  cool-down elapses.
+- half_open: a single probe call is let through; success closes the
+  breaker, failure opens it again.
+
+The same window provides the p95 latency used as the hedging deadline and
+the ordering of services by observed health. State is kept per process.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+import logging
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Gauge values for the breaker state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+if Gauge is not None:
+    CIRCUIT_STATE = Gauge(
+        'image_generation_circuit_state',
+        'Estado del circuit breaker por servicio (0 cerrado, 1 semiabierto, 2 abierto)',
+        ['service']
+    )
+    SERVICE_CALLS = Counter(
+        'image_generation_calls_total',
+        'Llamadas a servicios de generación de imágenes',
+        ['service', 'outcome']
+    )
+    SERVICE_LATENCY = Histogram(
+        'image_generation_duration_seconds',
+        'Duración de las llamadas a servicios de generación de imágenes',
+        ['service'],
+        buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0]
+    )
+else:
+    CIRCUIT_STATE = SERVICE_CALLS = SERVICE_LATENCY = None
+
+
+class ServiceHealth:
+    """
+    Rolling latency/error window and circuit breaker for one service.
+    """
+
+    def __init__(self, name: str, window_size: int = 50, window_seconds: int = 600,
+                 failure_threshold: float = 0.5, min_requests: int = 5,
+                 open_seconds: int = 60, slow_call_seconds: Optional[float] = None,
+                 clock=time.monotonic):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._clock = clock
+        self._calls = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._export_state()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow_request(self) -> bool:
+        """
+        Whether a call may go to the service now.
+
+        In half-open state only one probe is allowed at a time.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        if SERVICE_CALLS is not None:
+            SERVICE_CALLS.labels(service=self.name, outcome='rejected').inc()
+        return False
+
+    def record(self, latency: float, success: bool) -> None:
+        """
+        Record the outcome of a call.
+
+        Calls slower than ``slow_call_seconds`` count as failures even if
+        they returned an image.
+        """
+        if success and self.slow_call_seconds and latency > self.slow_call_seconds:
+            success = False
+
+        with self._lock:
+            self._calls.append((self._clock(), latency, success))
+            state = self._current_state()
+            if state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self._calls.clear()
+                    self._calls.append((self._clock(), latency, success))
+                    self._transition(CLOSED)
+                else:
+                    self._open()
+            elif state == CLOSED and not success:
+                total, failures = self._counts()
+                if total >= self.min_requests and failures / total >= self.failure_threshold:
+                    self._open()
+
+        if SERVICE_CALLS is not None:
+            SERVICE_CALLS.labels(service=self.name, outcome='success' if success else 'failure').inc()
+            SERVICE_LATENCY.labels(service=self.name).observe(latency)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            total, failures = self._counts()
+        return failures / total if total else 0.0
+
+    def p95_latency(self, min_samples: int = 1) -> Optional[float]:
+        """
+        95th percentile latency of successful calls in the window, or None
+        with fewer than ``min_samples`` of them.
+        """
+        with self._lock:
+            self._expire()
+            latencies = sorted(latency for _, latency, success in self._calls if success)
+        if not latencies or len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def is_degraded(self) -> bool:
+        """Whether the error rate is at least half the breaker threshold."""
+        with self._lock:
+            total, failures = self._counts()
+        return total >= self.min_requests and failures / total >= self.failure_threshold / 2
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._probe_in_flight = False
+            self._transition(CLOSED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95_latency()
+        with self._lock:
+            total, failures = self._counts()
+            state = self._current_state()
+        return {
+            'state': state,
+            'calls': total,
+            'failures': failures,
+            'error_rate': failures / total if total else 0.0,
+            'p95_seconds': p95,
+        }
+
+    # Internal helpers; callers hold the lock
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+            self._probe_in_flight = False
+        return self._state
+
+    def _counts(self):
+        self._expire()
+        failures = sum(1 for _, _, success in self._calls if not success)
+        return len(self._calls), failures
+
+    def _expire(self) -> None:
+        cutoff = self._clock() - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(f"Circuit breaker for '{self.name}': {self._state} -> {state}")
+        self._state = state
+        self._export_state()
+
+    def _export_state(self) -> None:
+        if CIRCUIT_STATE is not None:
+            CIRCUIT_STATE.labels(service=self.name).set(STATE_VALUES[self._state])
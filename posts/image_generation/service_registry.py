@@ -2,14 +2,23 @@
 Service registry for managing image generation services.
 """
 
-from typing import Dict, List, Optional, Type
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple, Type
 import logging
+import threading
+import time
 
 from .base import ImageGenerationService
 from .config import ImageGenerationConfig
+from .service_health import CLOSED, HALF_OPEN, OPEN, ServiceHealth
 
 logger = logging.getLogger(__name__)
 
+# Services only tried once every other service has failed; never hedged
+LAST_RESORT_SERVICES = ('placeholder',)
+
+STATE_RANK = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
 
 class ImageGenerationServiceRegistry:
     """
@@ -18,6 +27,8 @@ class ImageGenerationServiceRegistry:
     
     _services: Dict[str, Type[ImageGenerationService]] = {}
     _instances: Dict[str, ImageGenerationService] = {}
+    _health: Dict[str, ServiceHealth] = {}
+    _health_lock = threading.Lock()
     
     @classmethod
     def register_service(cls, name: str, service_class: Type[ImageGenerationService]):
@@ -89,31 +100,29 @@ class ImageGenerationServiceRegistry:
         """
         Get the default image generation service.
         
+        The configured default is used unless its circuit breaker is open;
+        otherwise the healthiest available service is returned.
+        
         Returns:
             Default service instance or None
         """
         config = ImageGenerationConfig.get_config()
         default_name = config.get('default_service', 'gemini')
         
-        # Try to get the configured default service
-        service = cls.get_service(default_name)
-        if service:
+        ordered = cls.get_ordered_services(default_name)
+        if ordered:
+            name, service = ordered[0]
+            if name != default_name:
+                logger.info(f"Default service '{default_name}' not available or unhealthy, using fallback: {name}")
             return service
         
-        # Fallback to any available service
-        available = cls.get_available_services()
-        if available:
-            fallback_name = available[0]
-            logger.info(f"Default service '{default_name}' not available, using fallback: {fallback_name}")
-            return cls.get_service(fallback_name)
-        
         logger.error("No image generation services available")
         return None
     
     @classmethod
     def get_fallback_services(cls, primary_service: str) -> List[ImageGenerationService]:
         """
-        Get fallback services for a primary service.
+        Get fallback services for a primary service, healthiest first.
         
         Args:
             primary_service: Primary service name
@@ -121,15 +130,201 @@ class ImageGenerationServiceRegistry:
         Returns:
             List of fallback service instances
         """
-        fallback_names = ImageGenerationConfig.get_fallback_services(primary_service)
-        fallback_services = []
+        return [
+            service for name, service in cls.get_ordered_services(primary_service)
+            if name != primary_service
+        ]
+    
+    @classmethod
+    def get_health(cls, name: str) -> ServiceHealth:
+        """
+        Get the health tracker of a service, creating it on first use.
         
-        for name in fallback_names:
+        Args:
+            name: Service identifier
+            
+        Returns:
+            ServiceHealth for the service
+        """
+        with cls._health_lock:
+            health = cls._health.get(name)
+            if health is None:
+                config = ImageGenerationConfig.get_config()
+                health = ServiceHealth(
+                    name,
+                    window_size=config['health_window_size'],
+                    window_seconds=config['health_window_seconds'],
+                    failure_threshold=config['breaker_failure_threshold'],
+                    min_requests=config['breaker_min_requests'],
+                    open_seconds=config['breaker_open_seconds'],
+                    slow_call_seconds=config['timeout_seconds'],
+                )
+                cls._health[name] = health
+            return health
+    
+    @classmethod
+    def get_ordered_services(cls, primary_service: str = None) -> List[Tuple[str, ImageGenerationService]]:
+        """
+        Get the services to try for a request, ordered by observed health.
+        
+        Services with a closed breaker come first, then half-open, then open;
+        within a state, degraded services (high recent error rate) go after
+        healthy ones and ties keep the configured preference. Last-resort
+        services (placeholder) always go at the end.
+        
+        Args:
+            primary_service: Preferred service name (defaults to the configured one)
+            
+        Returns:
+            List of (service_name, service_instance) tuples
+        """
+        if primary_service is None:
+            primary_service = ImageGenerationConfig.get_config().get('default_service', 'gemini')
+        
+        names = [primary_service] + ImageGenerationConfig.get_fallback_services(primary_service)
+        ranked = []
+        for position, name in enumerate(dict.fromkeys(names)):
+            health = cls.get_health(name)
+            ranked.append((
+                (name in LAST_RESORT_SERVICES, STATE_RANK[health.state], health.is_degraded(), position),
+                name,
+            ))
+        
+        ordered = []
+        for _, name in sorted(ranked):
             service = cls.get_service(name)
             if service:
-                fallback_services.append(service)
+                ordered.append((name, service))
+        return ordered
+    
+    @classmethod
+    def call_service(cls, name: str, service: ImageGenerationService, prompt: str,
+                     **kwargs) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Call a service and record the outcome in its health window.
+        
+        Exceptions raised by the service are returned as failures.
         
-        return fallback_services
+        Returns:
+            Tuple of (success, image_url_or_path, error_message)
+        """
+        start = time.monotonic()
+        try:
+            success, image_url, error = service.generate_image(prompt, **kwargs)
+        except Exception as e:
+            success, image_url, error = False, None, str(e)
+        cls.get_health(name).record(time.monotonic() - start, bool(success and image_url))
+        return success, image_url, error
+    
+    @classmethod
+    def generate_with_fallback(cls, prompt: str, primary_service: str = None, hedge: bool = None,
+                               **kwargs) -> Tuple[bool, Optional[str], Optional[str], Optional[str]]:
+        """
+        Generate an image with the healthiest services, falling back on failure.
+        
+        Services whose breaker is open are skipped. When a call runs past
+        the p95 latency of that service, the next service is started in
+        parallel (hedged request) and the first image returned wins; the
+        slower call keeps running in the background and its image is left
+        for ``collect_orphan_media``. Nothing is awaited beyond
+        ``timeout_seconds``. Last-resort services are only tried when every
+        other service failed or timed out.
+        
+        Args:
+            prompt: Text description of the image to generate
+            primary_service: Preferred service name
+            hedge: Enable hedged requests (defaults to ``hedge_enabled``)
+            **kwargs: Passed to ``generate_image``
+            
+        Returns:
+            Tuple of (success, image_url_or_path, error_message, service_name)
+        """
+        config = ImageGenerationConfig.get_config()
+        if hedge is None:
+            hedge = config['hedge_enabled']
+        
+        chain = cls.get_ordered_services(primary_service)
+        queue = [(name, service) for name, service in chain if name not in LAST_RESORT_SERVICES]
+        last_resort = [(name, service) for name, service in chain if name in LAST_RESORT_SERVICES]
+        errors = []
+        
+        if queue:
+            executor = ThreadPoolExecutor(max_workers=len(queue), thread_name_prefix='image-generation')
+            pending = {}
+            
+            def launch():
+                while queue:
+                    name, service = queue.pop(0)
+                    if not cls.get_health(name).allow_request():
+                        errors.append(f"{name}: circuit open")
+                        continue
+                    pending[executor.submit(cls.call_service, name, service, prompt, **kwargs)] = name
+                    return name, time.monotonic()
+                return None, None
+            
+            started = time.monotonic()
+            current, launched_at = launch()
+            try:
+                while pending:
+                    now = time.monotonic()
+                    remaining = config['timeout_seconds'] - (now - started)
+                    if remaining <= 0:
+                        break
+                    
+                    hedge_delay = cls._hedge_delay(current, config) if hedge and queue else None
+                    timeout = remaining
+                    if hedge_delay is not None:
+                        timeout = max(0.0, min(remaining, launched_at + hedge_delay - now))
+                    
+                    done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                    if not done:
+                        if hedge_delay is not None and queue:
+                            hedged_from = current
+                            current, launched_at = launch()
+                            if current:
+                                logger.info(f"Hedging image generation: '{hedged_from}' past p95, starting '{current}'")
+                        continue
+                    
+                    for future in done:
+                        name = pending.pop(future)
+                        success, image_url, error = future.result()
+                        if success and image_url:
+                            return True, image_url, None, name
+                        errors.append(f"{name}: {error}")
+                    
+                    if not pending:
+                        current, launched_at = launch()
+                
+                for name in pending.values():
+                    errors.append(f"{name}: timed out after {config['timeout_seconds']}s")
+            finally:
+                executor.shutdown(wait=False)
+        
+        for name, service in last_resort:
+            if not cls.get_health(name).allow_request():
+                errors.append(f"{name}: circuit open")
+                continue
+            success, image_url, error = cls.call_service(name, service, prompt, **kwargs)
+            if success and image_url:
+                return True, image_url, None, name
+            errors.append(f"{name}: {error}")
+        
+        return False, None, '; '.join(errors) or "No image generation services available", None
+    
+    @classmethod
+    def _hedge_delay(cls, name: Optional[str], config: Dict) -> Optional[float]:
+        """Seconds to wait on ``name`` before hedging, or None without enough history."""
+        if not name:
+            return None
+        return cls.get_health(name).p95_latency(min_samples=config['hedge_min_samples'])
+    
+    @classmethod
+    def reset_health(cls):
+        """Forget health history and close every breaker."""
+        with cls._health_lock:
+            health = list(cls._health.values())
+        for tracker in health:
+            tracker.reset()
     
     @classmethod
     def clear_cache(cls):
@@ -154,6 +349,7 @@ class ImageGenerationServiceRegistry:
                 'class': service_class.__name__,
                 'available': service is not None and service.is_available(),
                 'service_name': service.get_service_name() if service else 'Unknown',
+                'health': cls.get_health(name).snapshot(),
             }
             
             if service:
@@ -182,6 +378,9 @@ def register_default_services():
     except ImportError as e:
         logger.warning(f"Could not register Gemini service: {e}")
     
+    from .placeholder_generator import PlaceholderImageGenerator
+    registry.register_service('placeholder', PlaceholderImageGenerator)
+    
     # Register additional services here as they are implemented
     logger.info("Default image generation services registered")
 
@@ -4,7 +4,6 @@ Utility functions for image processing and storage.
 
 import os
 import uuid
-import hashlib
 import time
 from typing import Optional, Tuple
 from urllib.parse import urlparse
@@ -232,7 +231,8 @@ class ImageStorage:
             
             # Save file
             file_content = ContentFile(response.content)
-            saved_path = default_storage.save(file_path, file_content)
+            from ..media_dedup import save_deduplicated
+            saved_path = save_deduplicated(file_path, file_content)
             
             logger.info(f"Image saved from URL: {saved_path}")
             return default_storage.url(saved_path)
@@ -242,7 +242,8 @@ class ImageStorage:
             return None
     
     @classmethod
-    def save_image_from_content(cls, image_content: bytes, filename: str = None, folder: str = None) -> Optional[str]:
+    def save_image_from_content(cls, image_content: bytes, filename: str = None, folder: str = None,
+                                return_path: bool = False) -> Optional[str]:
         """
         Save image from binary content.
         
@@ -250,9 +251,10 @@ class ImageStorage:
             image_content: Binary image data
             filename: Desired filename (will be made unique)
             folder: Storage folder (defaults to DEFAULT_FOLDER)
+            return_path: Return the storage path instead of the URL
             
         Returns:
-            Local URL of saved image or None if failed
+            Local URL (or storage path) of saved image or None if failed
         """
         if folder is None:
             folder = cls.DEFAULT_FOLDER
@@ -268,10 +270,11 @@ class ImageStorage:
             
             # Save file
             file_content = ContentFile(image_content)
-            saved_path = default_storage.save(file_path, file_content)
+            from ..media_dedup import save_deduplicated
+            saved_path = save_deduplicated(file_path, file_content)
             
             logger.info(f"Image saved from content: {saved_path}")
-            return default_storage.url(saved_path)
+            return saved_path if return_path else default_storage.url(saved_path)
             
         except Exception as e:
             logger.error(f"Error saving image from content: {e}")
@@ -305,15 +308,16 @@ class ImageStorage:
             SHA-256 hash of the image or None if failed
         """
         try:
+            from ..media_catalog import hash_stream
             with open(image_path, 'rb') as f:
-                image_data = f.read()
-                return hashlib.sha256(image_data).hexdigest()
+                return hash_stream(f)
         except Exception as e:
             logger.error(f"Error generating hash for image {image_path}: {e}")
             return None
 
     @classmethod
-    def save_image_from_pil(cls, pil_image, filename: str = None, folder: str = None) -> Optional[str]:
+    def save_image_from_pil(cls, pil_image, filename: str = None, folder: str = None,
+                            return_path: bool = False) -> Optional[str]:
         """
         Save image from PIL Image object.
         
@@ -321,9 +325,10 @@ class ImageStorage:
             pil_image: PIL Image object
             filename: Desired filename (will be made unique)
             folder: Folder to save in (defaults to cover images folder)
+            return_path: Return the storage path instead of the URL
             
         Returns:
-            URL of saved image or None if failed
+            URL (or storage path) of saved image or None if failed
         """
         try:
             import io
@@ -356,10 +361,11 @@ class ImageStorage:
             
             # Save to storage
             file_content = ContentFile(img_buffer.getvalue())
-            saved_path = default_storage.save(file_path, file_content)
+            from ..media_dedup import save_deduplicated
+            saved_path = save_deduplicated(file_path, file_content)
             
             logger.info(f"PIL image saved: {saved_path}")
-            return default_storage.url(saved_path)
+            return saved_path if return_path else default_storage.url(saved_path)
             
         except Exception as e:
             logger.error(f"Error saving PIL image: {e}")
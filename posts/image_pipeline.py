@@ -0,0 +1,224 @@
+"""
+Motor de redimensionado de imágenes con memoria acotada.
+
+Las versiones de una imagen se generan de mayor a menor y cada una se
+redimensiona a partir de la anterior, no del original: el original
+decodificado se libera en cuanto existe la primera versión. Los factores
+enteros se resuelven con ``Image.reduce()`` y los JPEG se decodifican con
+``draft()`` directamente a la escala más cercana a la versión mayor.
+
+La salida se codifica en un archivo temporal que el storage mueve a su
+sitio, sin copiar los bytes codificados en memoria.
+
+Los píxeles decodificados a la vez se limitan con un presupuesto global
+compartido por todos los workers (``IMAGE_PIXEL_BUDGET``): cada trabajo
+reserva su parte antes de decodificar y espera si no cabe.
+"""
+
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Píxeles por plaza del presupuesto
+PIXEL_BUDGET_SLOT = 1_000_000
+
+# Duración de una reserva; si el worker muere, sus plazas vuelven solas
+PIXEL_BUDGET_LEASE = 300
+
+# Espera máxima por plazas libres antes de rendirse
+PIXEL_BUDGET_TIMEOUT = 120
+
+# Etiqueta EXIF de orientación; 5-8 intercambian ancho y alto
+EXIF_ORIENTATION = 0x0112
+
+
+class PixelBudgetExceeded(Exception):
+    """No hubo píxeles libres en el presupuesto a tiempo."""
+
+
+class PixelBudget:
+    """
+    Semáforo de píxeles compartido entre procesos mediante la caché.
+
+    El presupuesto se divide en plazas de ``PIXEL_BUDGET_SLOT`` píxeles;
+    cada plaza es una clave que se reserva con ``cache.add`` (atómico) y
+    caduca a los ``lease`` segundos. Un trabajo mayor que el presupuesto
+    entero reserva todas las plazas, así que corre solo.
+    """
+
+    def __init__(self, total_pixels, slot=PIXEL_BUDGET_SLOT, lease=PIXEL_BUDGET_LEASE,
+                 key_prefix='image_pipeline:pixels'):
+        self.slot = slot
+        self.slots = max(1, total_pixels // slot)
+        self.lease = lease
+        self.key_prefix = key_prefix
+
+    def slots_for(self, pixels):
+        return min(self.slots, max(1, math.ceil(pixels / self.slot)))
+
+    @contextmanager
+    def reserve(self, pixels, timeout=PIXEL_BUDGET_TIMEOUT):
+        keys = self._acquire(self.slots_for(pixels), timeout)
+        try:
+            yield
+        finally:
+            cache.delete_many(keys)
+
+    def _acquire(self, needed, timeout):
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while True:
+            # Empezar en una plaza al azar reparte la contención
+            offset = random.randrange(self.slots)
+            taken = []
+            for i in range(self.slots):
+                key = f"{self.key_prefix}:{(offset + i) % self.slots}"
+                if cache.add(key, token, self.lease):
+                    taken.append(key)
+                    if len(taken) == needed:
+                        return taken
+            # Sin sitio: soltar lo reservado para no bloquear a otros
+            cache.delete_many(taken)
+            if time.monotonic() >= deadline:
+                raise PixelBudgetExceeded(f"Sin presupuesto para {needed} plazas de {self.slots}")
+            time.sleep(delay + random.random() * delay)
+            delay = min(1.0, delay * 2)
+
+
+_budget = None
+
+
+def get_pixel_budget():
+    global _budget
+    if _budget is None:
+        _budget = PixelBudget(getattr(settings, 'IMAGE_PIXEL_BUDGET', 64_000_000))
+    return _budget
+
+
+def fit_within(size, box):
+    """
+    Tamaño de ``size`` ajustado a ``box`` conservando la proporción
+    (mismo cálculo que ``ImageOps.contain``).
+    """
+    width, height = size
+    box_width, box_height = box
+    image_ratio = width / height
+    box_ratio = box_width / box_height
+    if image_ratio > box_ratio:
+        return box_width, max(1, round(height / width * box_width))
+    if image_ratio < box_ratio:
+        return max(1, round(width / height * box_height)), box_height
+    return box_width, box_height
+
+
+def downscale(image, size, resample=Image.Resampling.LANCZOS):
+    """
+    Redimensiona ``image`` a ``size``.
+
+    Con un factor entero exacto basta ``reduce()``; si no, se reduce por
+    enteros dejando margen 2x y el filtro final hace el resto.
+    """
+    if image.size == size:
+        return image
+    factor_x = image.width / size[0]
+    factor_y = image.height / size[1]
+    if factor_x == factor_y and factor_x.is_integer() and factor_x >= 2:
+        return image.reduce(int(factor_x))
+    factor = min(image.width // size[0], image.height // size[1]) // 2
+    if factor > 1:
+        image = image.reduce(factor)
+    return image.resize(size, resample)
+
+
+def oriented_size(image):
+    """Tamaño de ``image`` una vez aplicada la orientación EXIF."""
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return image.height, image.width
+    return image.size
+
+
+def render_variants(source_path, boxes, prepare=None, budget=None):
+    """
+    Genera las versiones de ``source_path`` ajustadas a cada caja de ``boxes``.
+
+    Es un generador de ``(caja, imagen)`` de mayor a menor, ya con la
+    orientación EXIF aplicada. Cada imagen solo es válida hasta pedir la
+    siguiente: no hay que guardar referencias a ellas, o la memoria no se
+    libera.
+
+    Args:
+        source_path: Ruta de la imagen en el storage
+        boxes: Cajas ``(ancho, alto)``; la imagen se ajusta dentro de cada una
+        prepare: Callable opcional aplicado al original tras decodificarlo
+            y orientarlo (modo de color...); debe conservar el tamaño
+        budget: ``PixelBudget`` (por defecto el global)
+    """
+    budget = budget or get_pixel_budget()
+
+    with default_storage.open(source_path, 'rb') as f:
+        image = Image.open(f)
+        origin = oriented_size(image)
+        plan = sorted(
+            ((box, fit_within(origin, box)) for box in boxes),
+            key=lambda item: item[1][0] * item[1][1],
+            reverse=True,
+        )
+        if not plan:
+            return
+
+        # JPEG: decodificar a la escala DCT más pequeña que cubra la versión mayor
+        largest = plan[0][1]
+        if origin != image.size:
+            largest = (largest[1], largest[0])
+        image.draft(None, largest)
+
+        pixels = image.width * image.height + largest[0] * largest[1]
+        with budget.reserve(pixels):
+            image.load()
+            base = ImageOps.exif_transpose(image)
+            del image
+            if prepare:
+                base = prepare(base)
+
+            for box, target in plan:
+                resized = downscale(base, target)
+                yield box, resized
+                # La siguiente versión sale de esta, salvo que se haya ampliado
+                if resized.width <= base.width:
+                    base = resized
+                del resized
+
+
+def save_image(image, path, fmt, **options):
+    """
+    Codifica ``image`` en un archivo temporal y lo guarda en ``path``.
+
+    El storage de sistema de archivos mueve el temporal a su sitio, así que
+    los bytes codificados nunca se copian en memoria.
+
+    Returns:
+        tuple: (ruta guardada, tamaño en bytes)
+    """
+    tmp = TemporaryUploadedFile(os.path.basename(path), None, 0, None)
+    try:
+        image.save(tmp, format=fmt, **options)
+        tmp.flush()
+        tmp.size = tmp.tell()
+        tmp.seek(0)
+        saved_path = default_storage.save(path, tmp)
+        return saved_path, tmp.size
+    finally:
+        tmp.close()
@@ -10,6 +10,7 @@ from PIL import Image, ImageDraw, ImageFont
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 import google.generativeai as genai
+from .placeholder_render import hex_to_rgb, render_background
 
 logger = logging.getLogger(__name__)
 
@@ -120,10 +121,6 @@ class GeminiImageService(ImageGenerationService):
             # Parsear tamaño
             width, height = map(int, size.split('x'))
             
-            # Crear imagen base
-            image = Image.new('RGB', (width, height), color='#f0f8ff')
-            draw = ImageDraw.Draw(image)
-            
             # Extraer colores de la descripción si es posible
             extracted_colors = self._extract_colors_from_description(description)
             
@@ -163,8 +160,9 @@ class GeminiImageService(ImageGenerationService):
             
             color_scheme = colors.get(style, colors['professional'])
             
-            # Crear fondo con gradiente avanzado basado en la descripción
-            self._create_advanced_background(draw, width, height, color_scheme, description)
+            # Crear fondo (cacheado por estilo, colores y tamaño) basado en la descripción
+            image = self._create_advanced_background(width, height, color_scheme, description)
+            draw = ImageDraw.Draw(image)
             
             # Agregar elementos gráficos basados en la descripción
             self._add_graphic_elements(draw, width, height, color_scheme, description)
@@ -319,51 +317,26 @@ class GeminiImageService(ImageGenerationService):
         
         return colors
     
-    def _create_advanced_background(self, draw, width, height, color_scheme, description):
+    def _create_advanced_background(self, width, height, color_scheme, description):
         """Crea un fondo avanzado basado en la descripción de Gemini 2.5-pro."""
         # Determinar tipo de fondo basado en la descripción
         description_lower = description.lower()
         
-        if 'gradiente' in description_lower or 'gradient' in description_lower:
-            self._create_gradient_background(draw, width, height, color_scheme)
-        elif 'geométrico' in description_lower or 'geometric' in description_lower:
-            self._create_geometric_background(draw, width, height, color_scheme)
-        elif 'abstracto' in description_lower or 'abstract' in description_lower:
-            self._create_abstract_background(draw, width, height, color_scheme)
-        else:
-            # Fondo gradiente por defecto mejorado
-            self._create_gradient_background(draw, width, height, color_scheme)
-    
-    def _create_gradient_background(self, draw, width, height, color_scheme):
-        """Crea un fondo con gradiente suave."""
-        bg_color = color_scheme['bg']
-        secondary_color = color_scheme['secondary']
-        
-        # Convertir colores hex a RGB
-        bg_rgb = tuple(int(bg_color[i:i+2], 16) for i in (1, 3, 5))
-        sec_rgb = tuple(int(secondary_color[i:i+2], 16) for i in (1, 3, 5))
+        if 'geométrico' in description_lower or 'geometric' in description_lower:
+            image = render_background('solid', color_scheme['bg'], color_scheme['secondary'], color_scheme['accent'], width, height)
+            self._create_geometric_background(ImageDraw.Draw(image), width, height, color_scheme)
+            return image
         
-        for y in range(height):
-            # Gradiente diagonal
-            for x in range(width):
-                alpha_y = y / height
-                alpha_x = x / width
-                alpha = (alpha_y + alpha_x) / 2
-                
-                r = int(bg_rgb[0] + (sec_rgb[0] - bg_rgb[0]) * alpha)
-                g = int(bg_rgb[1] + (sec_rgb[1] - bg_rgb[1]) * alpha)
-                b = int(bg_rgb[2] + (sec_rgb[2] - bg_rgb[2]) * alpha)
-                
-                draw.point((x, y), fill=(r, g, b))
+        if 'abstracto' in description_lower or 'abstract' in description_lower:
+            kind = 'abstract'
+        else:
+            # Fondo gradiente por defecto
+            kind = 'gradient'
+        return render_background(kind, color_scheme['bg'], color_scheme['secondary'], color_scheme['accent'], width, height)
     
     def _create_geometric_background(self, draw, width, height, color_scheme):
-        """Crea un fondo con elementos geométricos."""
-        # Fondo base
-        bg_rgb = tuple(int(color_scheme['bg'][i:i+2], 16) for i in (1, 3, 5))
-        draw.rectangle([0, 0, width, height], fill=bg_rgb)
-        
-        # Elementos geométricos
-        accent_rgb = tuple(int(color_scheme['accent'][i:i+2], 16) for i in (1, 3, 5))
+        """Dibuja elementos geométricos sobre el fondo."""
+        accent_rgb = hex_to_rgb(color_scheme['accent'])
         
         # Círculos decorativos
         for i in range(5):
@@ -378,33 +351,6 @@ class GeminiImageService(ImageGenerationService):
             draw.line([(i, 0), (i + height//2, height)], 
                      fill=accent_rgb, width=1)
     
-    def _create_abstract_background(self, draw, width, height, color_scheme):
-        """Crea un fondo abstracto."""
-        import random
-        
-        # Fondo base
-        bg_rgb = tuple(int(color_scheme['bg'][i:i+2], 16) for i in (1, 3, 5))
-        draw.rectangle([0, 0, width, height], fill=bg_rgb)
-        
-        # Formas abstractas
-        colors = [color_scheme['secondary'], color_scheme['accent']]
-        
-        for _ in range(8):
-            color = random.choice(colors)
-            color_rgb = tuple(int(color[i:i+2], 16) for i in (1, 3, 5))
-            
-            # Formas aleatorias
-            x1 = random.randint(0, width)
-            y1 = random.randint(0, height)
-            x2 = x1 + random.randint(50, 200)
-            y2 = y1 + random.randint(50, 200)
-            
-            # Transparencia simulada
-            alpha = 0.3
-            blended_color = tuple(int(bg_rgb[i] * (1-alpha) + color_rgb[i] * alpha) for i in range(3))
-            
-            draw.ellipse([x1, y1, x2, y2], fill=blended_color)
-    
     def _add_graphic_elements(self, draw, width, height, color_scheme, description):
         """Agrega elementos gráficos basados en la descripción."""
         description_lower = description.lower()
@@ -471,8 +417,8 @@ class PlaceholderImageService(ImageGenerationService):
         """Nombre legible del servicio."""
         return "Placeholder Simple"
     
-    def generate_image(self, prompt, style='professional', title='', size='1024x1024'):
-        """Genera una imagen placeholder simple."""
+    def generate_image(self, prompt, style='professional', title='', size='1024x1024', return_path=False):
+        """Genera una imagen placeholder simple (``return_path``: devuelve la ruta en el storage, no la URL)."""
         try:
             width, height = map(int, size.split('x'))
             
@@ -506,6 +452,8 @@ class PlaceholderImageService(ImageGenerationService):
             image_path = f"ai_posts/covers/{image_filename}"
             
             saved_path = default_storage.save(image_path, ContentFile(image_buffer.getvalue()))
+            if return_path:
+                return True, saved_path, None
             image_url = default_storage.url(saved_path)
             
             return True, image_url, None
@@ -557,6 +505,10 @@ def generate_image_for_post(title, content_preview, style='professional', servic
     """
     Función de conveniencia para generar imagen de post.
     
+    Usa ``ImageGenerationServiceRegistry.generate_with_fallback``: si
+    ``service_name`` falla, tiene el circuito abierto o va lento, se prueban
+    los demás servicios.
+    
     Args:
         title (str): Título del post
         content_preview (str): Vista previa del contenido
@@ -567,19 +519,7 @@ def generate_image_for_post(title, content_preview, style='professional', servic
         tuple: (success: bool, image_url: str, error: str)
     """
     try:
-        service = registry.get_service(service_name)
-        
-        if not service:
-            # Usar servicio por defecto
-            service = registry.get_default_service()
-            if not service:
-                return False, None, "No hay servicios de imagen disponibles"
-        
-        if not service.is_available():
-            # Intentar con servicio por defecto
-            service = registry.get_default_service()
-            if not service:
-                return False, None, f"Servicio {service_name} no disponible y no hay alternativas"
+        from .image_generation import ImageGenerationServiceRegistry
         
         # Crear prompt para la imagen
         prompt = f"""
@@ -594,7 +534,13 @@ def generate_image_for_post(title, content_preview, style='professional', servic
         Contenido del artículo: {content_preview[:200]}...
         """
         
-        return service.generate_image(prompt, style=style, title=title)
+        # Servicios por orden de salud, con circuit breaker y hedging
+        success, image_url, error, used_service = ImageGenerationServiceRegistry.generate_with_fallback(
+            prompt, primary_service=service_name, style=style, title=title
+        )
+        if success and used_service != service_name:
+            logger.info(f"Imagen del post generada con {used_service} en lugar de {service_name}")
+        return success, image_url, error
         
     except Exception as e:
         logger.error(f"Error en generate_image_for_post: {e}")
@@ -0,0 +1,229 @@
+"""
+Registro de variantes responsivas de imágenes.
+
+Cada imagen subida (por ejemplo ``Post.header_image``) se deriva en varios
+anchos y formatos modernos (AVIF cuando Pillow lo soporta, WebP siempre).
+Las variantes quedan registradas en ``ImageVariant`` y el template tag
+``responsive_image`` las usa para construir ``srcset``/``sizes``.
+"""
+
+import hashlib
+import logging
+import os
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from PIL import Image, features
+
+from .image_pipeline import oriented_size, render_variants, save_image
+from .models import ImageVariant, Post
+
+logger = logging.getLogger(__name__)
+
+# Carpeta de media donde se guardan las variantes
+VARIANTS_FOLDER = 'variants'
+
+# Anchos generados; los mayores que la imagen original se omiten
+VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+
+# Formatos modernos en orden de preferencia para <picture>
+MODERN_FORMATS = tuple(
+    fmt for fmt in ('avif', 'webp') if features.check(fmt)
+)
+
+VARIANT_QUALITY = {
+    'avif': 60,
+    'webp': 80,
+    'jpeg': 85,
+}
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+VARIANTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def variant_path(source_path, width, fmt):
+    """
+    Ruta de una variante: ``variants/<ruta sin extensión>/<ancho>w.<formato>``.
+    """
+    stem = os.path.splitext(source_path)[0].lstrip('/')
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f"{VARIANTS_FOLDER}/{stem}/{width}w.{extension}"
+
+
+def _cache_key(source_path):
+    digest = hashlib.md5(source_path.encode('utf-8')).hexdigest()
+    return f"image_variants:{digest}"
+
+
+def _prepare_image(img, fmt):
+    """
+    Ajusta el modo de color a lo que admite el formato de salida.
+    """
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if fmt == 'jpeg':
+        return img.convert('RGB')
+    if has_alpha:
+        return img.convert('RGBA') if img.mode != 'RGBA' else img
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def target_widths(source_width, widths=VARIANT_WIDTHS):
+    """
+    Anchos a generar para una imagen de ``source_width`` píxeles.
+
+    Incluye el ancho original cuando es menor que el mayor de la lista, para
+    que el ``srcset`` nunca obligue a escalar hacia arriba.
+    """
+    targets = {w for w in widths if w < source_width}
+    if source_width <= max(widths):
+        targets.add(source_width)
+    return sorted(targets, reverse=True)
+
+
+def register_variant(source_path, path, fmt, width, height, file_size=0):
+    """
+    Registra (o actualiza) una variante y limpia la caché de su original.
+    """
+    variant, _ = ImageVariant.objects.update_or_create(
+        source_path=source_path,
+        format=fmt,
+        width=width,
+        defaults={'path': path, 'height': height, 'file_size': file_size},
+    )
+    cache.delete(_cache_key(source_path))
+    return variant
+
+
+def generate_variants(source_path, widths=VARIANT_WIDTHS, formats=MODERN_FORMATS):
+    """
+    Genera y registra las variantes de una imagen de media.
+
+    Args:
+        source_path: Ruta de la imagen original en el storage
+        widths: Anchos a generar
+        formats: Formatos de salida (``avif``, ``webp``, ``jpeg``)
+
+    Returns:
+        list: Variantes registradas
+    """
+    with default_storage.open(source_path, 'rb') as f:
+        source_width, source_height = oriented_size(Image.open(f))
+
+    # Cajas limitadas solo por el ancho
+    boxes = [(width, source_height) for width in target_widths(source_width, widths)]
+    variants = []
+
+    for (width, _), resized in render_variants(source_path, boxes):
+        for fmt in formats:
+            path = variant_path(source_path, width, fmt)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            saved_path, file_size = save_image(
+                _prepare_image(resized, fmt), path, fmt.upper(), quality=VARIANT_QUALITY.get(fmt, 80)
+            )
+
+            variants.append(register_variant(
+                source_path, saved_path, fmt, width, resized.height, file_size
+            ))
+
+    logger.info(f"Variantes generadas para {source_path}: {len(variants)}")
+    return variants
+
+
+def get_variants(source_path):
+    """
+    Devuelve las variantes registradas de una imagen agrupadas por formato.
+
+    El resultado se guarda en caché para que las páginas con muchas tarjetas
+    no hagan una consulta por imagen.
+
+    Returns:
+        dict: ``{formato: [(ancho, ruta), ...]}`` ordenado por ancho
+    """
+    if not source_path:
+        return {}
+
+    key = _cache_key(source_path)
+    grouped = cache.get(key)
+    if grouped is None:
+        grouped = {}
+        rows = ImageVariant.objects.filter(source_path=source_path).order_by('width')
+        for fmt, width, path in rows.values_list('format', 'width', 'path'):
+            grouped.setdefault(fmt, []).append((width, path))
+        cache.set(key, grouped, VARIANTS_CACHE_TIMEOUT)
+    return grouped
+
+
+def build_srcset(candidates):
+    """
+    Construye el valor de ``srcset`` a partir de ``[(ancho, ruta), ...]``.
+    """
+    return ', '.join(f"{default_storage.url(path)} {width}w" for width, path in candidates)
+
+
+def smallest_variant_url(source_path, min_width=0):
+    """
+    URL de la variante más pequeña de al menos ``min_width`` píxeles, o None.
+    """
+    variants = get_variants(source_path)
+    for fmt in MODERN_FORMATS + ('jpeg', 'png'):
+        for width, path in variants.get(fmt, []):
+            if width >= min_width:
+                return default_storage.url(path)
+    return None
+
+
+def delete_variants(source_path):
+    """
+    Borra los archivos y el registro de las variantes de una imagen.
+    """
+    variants = ImageVariant.objects.filter(source_path=source_path)
+    for path in variants.values_list('path', flat=True):
+        default_storage.delete(path)
+    variants.delete()
+    cache.delete(_cache_key(source_path))
+
+
+def schedule_variants(source_path):
+    """
+    Encola la generación de variantes cuando termine la transacción actual.
+    """
+    from .tasks import generate_image_variants
+
+    def _enqueue():
+        try:
+            generate_image_variants.delay(source_path)
+        except Exception as e:
+            # Sin broker la imagen se sirve igual, solo que sin variantes
+            logger.warning(f"No se pudo encolar la generación de variantes de {source_path}: {e}")
+
+    transaction.on_commit(_enqueue)
+
+
+def _post_saved(sender, instance, **kwargs):
+    """
+    Genera las variantes de la imagen de cabecera la primera vez que aparece.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'header_image' not in update_fields:
+        return
+
+    name = instance.header_image.name if instance.header_image else ''
+    if not name or name.lower().endswith('.svg') or get_variants(name):
+        return
+    schedule_variants(name)
+
+
+def connect_variant_signals():
+    """
+    Conecta la generación automática de variantes. Se llama desde PostsConfig.ready().
+    """
+    post_save.connect(_post_saved, sender=Post, dispatch_uid='posts_header_image_variants')
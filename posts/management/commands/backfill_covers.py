@@ -0,0 +1,104 @@
+"""
+Comando para generar portadas a los posts publicados que no tienen imagen.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.batch_generation import DEFAULT_GEMINI_RPM
+from posts.cover_backfill import (
+    COVER_SIZE,
+    COVER_STYLE,
+    backfill_covers,
+    default_checkpoint_path,
+    posts_missing_covers,
+    service_chain,
+)
+from posts.image_generation import ImageGenerationError
+
+
+class Command(BaseCommand):
+    help = 'Genera imágenes de portada para los posts publicados sin imagen de cabecera'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Máximo de posts a procesar.')
+        parser.add_argument('--workers', type=int, default=4, help='Hilos concurrentes.')
+        parser.add_argument(
+            '--rpm',
+            type=int,
+            default=DEFAULT_GEMINI_RPM,
+            help='Peticiones por minuto permitidas a los servicios remotos.'
+        )
+        parser.add_argument('--service', type=str, help='Servicio principal (por defecto el configurado).')
+        parser.add_argument(
+            '--offline',
+            action='store_true',
+            help='Usar solo el servicio placeholder (sin red ni claves de API).'
+        )
+        parser.add_argument('--style', type=str, default=COVER_STYLE, help='Estilo de las portadas.')
+        parser.add_argument('--size', type=str, default=COVER_SIZE, help='Tamaño de las portadas (ANCHOxALTO).')
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help=f'Archivo de checkpoint (por defecto {default_checkpoint_path()}).'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar los posts sin portada.')
+        parser.add_argument('--report', type=str, help='Guardar el resumen en este archivo JSON.')
+
+    def handle(self, *args, **options):
+        if options['rpm'] <= 0:
+            raise CommandError('--rpm debe ser mayor que cero.')
+
+        pending = posts_missing_covers().count()
+        chain = [name for name, _ in service_chain(options['service'], options['offline'])]
+        self.stdout.write(self.style.NOTICE(
+            f'Posts publicados sin portada: {pending}. Servicios: {", ".join(chain) or "ninguno"}'
+        ))
+        if options['dry_run']:
+            return
+
+        def on_result(key, result):
+            if result.get('success'):
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ post {key} -> {result.get("path")} ({result.get("service") or "ya tenía portada"})'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'✗ post {key}: {result.get("error")}'))
+
+        try:
+            stats = backfill_covers(
+                limit=options['limit'],
+                workers=options['workers'],
+                rpm=options['rpm'],
+                offline=options['offline'],
+                service=options['service'],
+                checkpoint_path=options['checkpoint'],
+                style=options['style'],
+                size=options['size'],
+                on_result=on_result,
+            )
+        except ImageGenerationError as e:
+            raise CommandError(str(e))
+        summary = stats.summary()
+
+        self.stdout.write(self.style.SUCCESS('\nResumen del relleno de portadas'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f"Generadas: {summary['succeeded']}, fallidas: {summary['failed']}, "
+            f"omitidas (checkpoint): {summary['skipped']}"
+        )
+        self.stdout.write(
+            f"Tiempo total: {summary['elapsed_s']}s, throughput: {summary['posts_per_minute']} posts/min, "
+            f"espera por cuota: {summary['rate_limit_wait_s']}s"
+        )
+        for stage, data in summary['stages'].items():
+            self.stdout.write(
+                f"- {stage}: n={data['count']} media={data['mean_s']}s "
+                f"p50={data['p50_s']}s p95={data['p95_s']}s max={data['max_s']}s"
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resumen guardado en {options['report']}")
@@ -0,0 +1,107 @@
+"""
+Comando de gestión para medir la extracción de HTML sobre páginas guardadas.
+
+Compara el camino anterior (un parseo con ``html.parser`` para el texto y los
+enlaces y otro para las imágenes) con el documento compartido de
+``posts.html_extraction``. Los dos caminos usan los mismos extractores, así
+que hacen el mismo trabajo y solo cambian el parser y el número de parseos.
+"""
+
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.html_extraction import HTML_PARSER, HTMLDocument
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de extracción de texto, enlaces e imágenes sobre un corpus de páginas HTML guardadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            type=str,
+            required=True,
+            help='Directorio con páginas guardadas (*.html, *.htm)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=3,
+            help='Repeticiones por página'
+        )
+
+    def handle(self, *args, **options):
+        corpus = Path(options['corpus'])
+        iterations = max(1, options['iterations'])
+
+        if not corpus.is_dir():
+            raise CommandError(f'El directorio "{corpus}" no existe.')
+
+        pages = sorted(p for p in corpus.rglob('*') if p.suffix.lower() in ('.html', '.htm'))
+        if not pages:
+            raise CommandError(f'No se encontraron páginas HTML en "{corpus}".')
+
+        total_bytes = 0
+        legacy_times = []
+        shared_times = []
+
+        for page in pages:
+            markup = page.read_bytes()
+            total_bytes += len(markup)
+            url = f"https://example.com/{page.name}"
+
+            for _ in range(iterations):
+                legacy_times.append(self._time(self._legacy_extraction, markup, url))
+                shared_times.append(self._time(self._shared_extraction, markup, url))
+
+        self.stdout.write(self.style.SUCCESS('Benchmark de extracción HTML'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'Páginas: {len(pages)} ({total_bytes / 1024:.1f} KB), iteraciones: {iterations}')
+        self.stdout.write(f'Parser compartido: {HTML_PARSER}')
+        self._report('Anterior (html.parser, 2 parseos)', legacy_times)
+        self._report(f'Compartido ({HTML_PARSER}, 1 parseo)', shared_times)
+
+        legacy_total = sum(legacy_times)
+        shared_total = sum(shared_times)
+        if shared_total:
+            self.stdout.write(self.style.SUCCESS(f'Aceleración: {legacy_total / shared_total:.2f}x'))
+
+    @staticmethod
+    def _time(func, *args):
+        start = time.perf_counter()
+        func(*args)
+        return (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def _extract(text_document, image_document):
+        """Lo que hace ``generate_complete_post`` con la página de origen."""
+        text_document.title()
+        text_document.main_text()
+        text_document.links()
+        for img in image_document.images():
+            image_document.image_url(img)
+
+    @classmethod
+    def _legacy_extraction(cls, markup, url):
+        """Reproduce el flujo anterior: un árbol para el texto y otro para las imágenes."""
+        cls._extract(
+            HTMLDocument(markup, url=url, parser='html.parser'),
+            HTMLDocument(markup, url=url, parser='html.parser'),
+        )
+
+    @classmethod
+    def _shared_extraction(cls, markup, url):
+        document = HTMLDocument(markup, url=url)
+        cls._extract(document, document)
+
+    def _report(self, label, times):
+        ordered = sorted(times)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f'{label}: total {sum(times):.1f}ms, '
+            f'media {statistics.mean(times):.2f}ms, '
+            f'mediana {statistics.median(times):.2f}ms, p95 {p95:.2f}ms'
+        )
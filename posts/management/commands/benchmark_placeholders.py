@@ -0,0 +1,108 @@
+"""
+Comando de gestión para medir el renderizado de fondos de placeholders.
+
+Compara el gradiente anterior (``ImageDraw.point`` píxel a píxel) con
+``posts.placeholder_render``: renderizado en frío (NumPy y Pillow) y
+con el fondo ya en caché.
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw
+
+from posts import placeholder_render
+from posts.placeholder_render import BACKGROUND_KINDS, hex_to_rgb, render_background
+
+COLORS = ('#1e3a8a', '#3b82f6', '#60a5fa')
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de renderizado de los fondos de las imágenes placeholder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=str,
+            default='1024x1024',
+            help='Tamaño de la imagen (ANCHOxALTO)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Repeticiones por caso'
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            help='No medir el gradiente píxel a píxel (lento en tamaños grandes)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            width, height = (int(v) for v in options['size'].lower().split('x'))
+        except ValueError:
+            raise CommandError(f'Tamaño no válido: "{options["size"]}". Usa ANCHOxALTO.')
+        iterations = max(1, options['iterations'])
+
+        self.stdout.write(self.style.SUCCESS('Benchmark de fondos de placeholders'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f'Tamaño: {width}x{height}, iteraciones: {iterations}, '
+            f'NumPy: {"sí" if placeholder_render.np is not None else "no"}'
+        )
+
+        legacy_times = []
+        if not options['skip_legacy']:
+            legacy_times = [self._time(self._legacy_gradient, width, height) for _ in range(iterations)]
+            self._report('Anterior (gradiente, ImageDraw.point)', legacy_times)
+
+        for kind in BACKGROUND_KINDS:
+            if placeholder_render.np is not None:
+                self._report(f'NumPy en frío ({kind})', [
+                    self._time(placeholder_render._np_render, kind, *COLORS, width, height)
+                    for _ in range(iterations)
+                ])
+            self._report(f'Pillow en frío ({kind})', [
+                self._time(placeholder_render._pil_render, kind, *COLORS, width, height)
+                for _ in range(iterations)
+            ])
+
+        placeholder_render.clear_cache()
+        render_background('gradient', *COLORS, width, height)
+        cached_times = [self._time(render_background, 'gradient', *COLORS, width, height) for _ in range(iterations)]
+        self._report('En caché (gradient, copia)', cached_times)
+
+        if legacy_times:
+            self.stdout.write(self.style.SUCCESS(
+                f'Aceleración con caché: {statistics.mean(legacy_times) / statistics.mean(cached_times):.0f}x'
+            ))
+
+    @staticmethod
+    def _time(func, *args):
+        start = time.perf_counter()
+        func(*args)
+        return (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def _legacy_gradient(width, height):
+        """Reproduce el gradiente diagonal anterior de GeminiImageService."""
+        image = Image.new('RGB', (width, height), COLORS[0])
+        draw = ImageDraw.Draw(image)
+        start = hex_to_rgb(COLORS[0])
+        end = hex_to_rgb(COLORS[1])
+        for y in range(height):
+            for x in range(width):
+                ratio = (x / width + y / height) / 2
+                draw.point((x, y), fill=tuple(int(s + (e - s) * ratio) for s, e in zip(start, end)))
+
+    def _report(self, label, times):
+        ordered = sorted(times)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f'{label}: total {sum(times):.1f}ms, '
+            f'media {statistics.mean(times):.2f}ms, '
+            f'mediana {statistics.median(times):.2f}ms, p95 {p95:.2f}ms'
+        )
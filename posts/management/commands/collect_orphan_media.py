@@ -0,0 +1,66 @@
+"""
+Comando para retirar las imágenes de media que nada referencia.
+"""
+
+from django.core.management.base import BaseCommand
+
+from posts.media_gc import GC_BATCH_SIZE, GC_MIN_AGE_DAYS, collect_orphans
+
+
+class Command(BaseCommand):
+    help = 'Mueve a cuarentena (o borra) las imágenes no usadas por posts ni perfiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar las huérfanas y el espacio recuperable sin modificar nada'
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Borrar las huérfanas en lugar de moverlas a cuarentena'
+        )
+        parser.add_argument(
+            '--min-age-days',
+            type=int,
+            default=GC_MIN_AGE_DAYS,
+            help='Ignorar imágenes modificadas hace menos días'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=GC_BATCH_SIZE,
+            help='Entradas del catálogo procesadas por lote'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.NOTICE('Modo simulación: no se modificará nada'))
+
+        result = collect_orphans(
+            dry_run=dry_run,
+            delete=options['delete'],
+            min_age_days=max(0, options['min_age_days']),
+            batch_size=max(1, options['batch_size']),
+        )
+
+        self.stdout.write(self.style.SUCCESS('Recolección de media completada'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"Referencias encontradas: {result['references']}")
+        self.stdout.write(f"Imágenes revisadas: {result['scanned']}")
+        self.stdout.write(f"Huérfanas: {result['orphans']}")
+        self.stdout.write(f"Espacio recuperable: {result['bytes'] / (1024 * 1024):.2f} MB")
+        if dry_run:
+            for path in result['sample']:
+                self.stdout.write(f"  {path}")
+            if result['orphans'] > len(result['sample']):
+                self.stdout.write(f"  ... y {result['orphans'] - len(result['sample'])} más")
+        else:
+            action = 'borradas' if options['delete'] else 'movidas a cuarentena'
+            self.stdout.write(f"Imágenes {action}: {result['removed']}")
+            self.stdout.write(f"Carpetas de cuarentena purgadas: {result['purged']}")
+            self.stdout.write(f"Miniaturas borradas: {result['thumbnails']}")
+        if result['errors']:
+            self.stdout.write(self.style.ERROR(f"{result['errors']} imágenes no se pudieron retirar"))
@@ -1,14 +1,23 @@
 
+import json
+
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from posts.models import Post
 from posts.ai_generator import (
     generate_complete_post,
 )
+from posts.batch_generation import (
+    DEFAULT_GEMINI_RPM,
+    BatchCheckpoint,
+    TokenBucket,
+    run_batch,
+)
 from posts.forms import COMPLETE_POST_PROMPT
 from dotenv import load_dotenv
 
-load_dotenv()  
+load_dotenv()
 
 class Command(BaseCommand):
     help = 'Crea un nuevo post a partir de una URL usando IA para reescribir el contenido.'
@@ -16,13 +25,28 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--url', type=str, help='La URL del artículo original.')
         parser.add_argument('--author_id', type=int, help='El ID del usuario que será el autor del post.')
+        parser.add_argument('--file', type=str, help='Archivo con una URL por línea para generar posts por lotes.')
+        parser.add_argument('--workers', type=int, default=4, help='Hilos concurrentes en modo lote.')
+        parser.add_argument(
+            '--rpm',
+            type=int,
+            default=DEFAULT_GEMINI_RPM,
+            help='Peticiones por minuto permitidas a Gemini en modo lote.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Archivo de checkpoint (por defecto <file>.checkpoint.json).'
+        )
+        parser.add_argument('--report', type=str, help='Guardar el resumen del lote en este archivo JSON.')
 
     def handle(self, *args, **options):
         url = options['url']
         author_id = options['author_id']
+        batch_file = options['file']
 
-        if not url:
-            raise CommandError('La URL es obligatoria. Usa --url <URL>')
+        if not url and not batch_file:
+            raise CommandError('La URL es obligatoria. Usa --url <URL> o --file <ARCHIVO>')
         if not author_id:
             raise CommandError('El ID del autor es obligatorio. Usa --author_id <ID>')
 
@@ -32,12 +56,16 @@ class Command(BaseCommand):
         except User.DoesNotExist:
             raise CommandError(f'El usuario con ID "{author_id}" no existe.')
 
+        if batch_file:
+            self.handle_batch(batch_file, author, options)
+            return
+
         self.stdout.write(self.style.NOTICE(f'Procesando URL: {url}'))
 
         self.stdout.write(self.style.NOTICE('Generando post completo con IA, incluyendo imágenes...'))
         result = generate_complete_post(
-            url=url, 
-            rewrite_prompt=COMPLETE_POST_PROMPT, 
+            url=url,
+            rewrite_prompt=COMPLETE_POST_PROMPT,
             extract_images=True,
             generate_cover=True
         )
@@ -45,24 +73,119 @@ class Command(BaseCommand):
         if not result.get('success'):
             raise CommandError(f"No se pudo generar el post: {result.get('error', 'Error desconocido')}")
 
-        title = result.get('title', 'Título no generado')
-        content = result.get('content', '')
-        tags = result.get('tags', [])
-
         self.stdout.write(self.style.SUCCESS('Creando el post en la base de datos...'))
-        
-        new_post = Post.objects.create(
-            author=author,
-            title=title,
-            content=content,
-            status='published',
-        )
 
-        if tags:
-            new_post.tags.add(*tags)
-        
-        new_post.save()
+        new_post = self.create_post(author, result)
 
         self.stdout.write(self.style.SUCCESS(
             f'¡Post creado con éxito! ID: {new_post.id}, Título: "{new_post.title}"'
         ))
+
+    def create_post(self, author, result, source_url=None):
+        """
+        Crea el post publicado a partir del resultado de generate_complete_post.
+
+        Con ``source_url`` es idempotente: si ya hay un post de esa URL (un
+        lote que murió después de crearlo y antes de guardar el checkpoint)
+        se devuelve ese en lugar de crear otro.
+        """
+        fields = {
+            'author': author,
+            'title': result.get('title', 'Título no generado'),
+            'content': result.get('content', ''),
+            'status': 'published',
+        }
+        with transaction.atomic():
+            if source_url:
+                new_post, created = Post.objects.get_or_create(source_url=source_url, defaults=fields)
+                if not created:
+                    return new_post
+            else:
+                new_post = Post.objects.create(**fields)
+
+            tags = result.get('tags', [])
+            if tags:
+                new_post.tags.add(*tags)
+
+            new_post.save()
+        return new_post
+
+    def handle_batch(self, batch_file, author, options):
+        """Genera un post por cada URL del archivo con un pool acotado de hilos."""
+        try:
+            with open(batch_file, 'r', encoding='utf-8') as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo "{batch_file}": {e}')
+
+        # Quitar duplicados conservando el orden
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            raise CommandError(f'El archivo "{batch_file}" no contiene URLs.')
+
+        if options['rpm'] <= 0:
+            raise CommandError('--rpm debe ser mayor que cero.')
+
+        checkpoint = BatchCheckpoint(options['checkpoint'] or f'{batch_file}.checkpoint.json')
+        limiter = TokenBucket(options['rpm'])
+
+        self.stdout.write(self.style.NOTICE(
+            f'Procesando {len(urls)} URLs con {options["workers"]} hilos '
+            f'({options["rpm"]} peticiones/min a Gemini). Checkpoint: {checkpoint.path}'
+        ))
+
+        def process_url(url, tracker):
+            existing = Post.objects.filter(source_url=url).values('id', 'title').first()
+            if existing:
+                return {'success': True, 'post_id': existing['id'], 'title': existing['title']}
+
+            result = generate_complete_post(
+                url=url,
+                rewrite_prompt=COMPLETE_POST_PROMPT,
+                extract_images=True,
+                generate_cover=True,
+                progress_callback=tracker,
+            )
+            if not result.get('success'):
+                return {'success': False, 'error': result.get('error', 'Error desconocido')}
+
+            with tracker.measure('save'):
+                new_post = self.create_post(author, result, source_url=url)
+            return {'success': True, 'post_id': new_post.id, 'title': new_post.title}
+
+        def on_result(url, result):
+            if result.get('success'):
+                self.stdout.write(self.style.SUCCESS(f'✓ {url} -> post {result["post_id"]}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'✗ {url}: {result.get("error")}'))
+
+        stats = run_batch(
+            urls,
+            process_url,
+            checkpoint,
+            workers=options['workers'],
+            limiter=limiter,
+            on_result=on_result,
+        )
+        summary = stats.summary()
+
+        self.stdout.write(self.style.SUCCESS('\nResumen del lote'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f"Creados: {summary['succeeded']}, fallidos: {summary['failed']}, "
+            f"omitidos (checkpoint): {summary['skipped']}"
+        )
+        self.stdout.write(
+            f"Tiempo total: {summary['elapsed_s']}s, throughput: {summary['posts_per_minute']} posts/min, "
+            f"espera por cuota: {summary['rate_limit_wait_s']}s"
+        )
+        for stage, data in summary['stages'].items():
+            self.stdout.write(
+                f"- {stage}: n={data['count']} media={data['mean_s']}s "
+                f"p50={data['p50_s']}s p95={data['p95_s']}s max={data['max_s']}s"
+            )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resumen guardado en {options['report']}")
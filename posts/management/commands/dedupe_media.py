@@ -0,0 +1,33 @@
+"""
+Comando para unificar las imágenes de media duplicadas por contenido.
+"""
+
+from django.core.management.base import BaseCommand
+
+from posts.media_dedup import collapse_duplicates
+
+
+class Command(BaseCommand):
+    help = 'Unifica las imágenes con el mismo contenido (SHA-256) y reescribe sus referencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Mostrar los duplicados sin modificar nada'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.NOTICE('Modo simulación: no se modificará nada'))
+
+        result = collapse_duplicates(dry_run=dry_run)
+
+        self.stdout.write(self.style.SUCCESS('Deduplicación de media completada'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"Grupos de duplicados: {result['groups']}")
+        self.stdout.write(f"Archivos {'a eliminar' if dry_run else 'eliminados'}: {result['removed']}")
+        if not dry_run:
+            self.stdout.write(f"Referencias reescritas: {result['references']}")
+        self.stdout.write(f"Espacio liberado: {result['bytes'] / (1024 * 1024):.2f} MB")
@@ -0,0 +1,58 @@
+"""
+Comando para sincronizar el catálogo de imágenes (MediaAsset) con MEDIA_ROOT.
+"""
+
+from django.core.management.base import BaseCommand
+
+from posts.media_catalog import SCAN_BATCH_SIZE, SCAN_WORKERS, scan_media
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza de forma incremental el catálogo de imágenes de media con los archivos en disco'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=SCAN_WORKERS,
+            help='Hilos para leer las cabeceras de las imágenes'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SCAN_BATCH_SIZE,
+            help='Archivos procesados por lote'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Volver a inspeccionar todas las imágenes aunque no hayan cambiado'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Escaneando la carpeta media...'))
+
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {stats.files} archivos ({stats.files_per_second:.0f}/s)')
+
+        stats = scan_media(
+            workers=options['workers'],
+            batch_size=max(1, options['batch_size']),
+            full=options['full'],
+            progress=progress,
+        )
+        summary = stats.summary()
+
+        self.stdout.write(self.style.SUCCESS('Catálogo de media sincronizado'))
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"Directorios: {summary['directories']}, imágenes: {summary['files']}")
+        self.stdout.write(
+            f"Inspeccionadas: {summary['probed']}, sin cambios: {summary['unchanged']}, "
+            f"eliminadas: {summary['removed']}"
+        )
+        self.stdout.write(f"Tiempo: {summary['elapsed_s']}s ({summary['files_per_second']} archivos/s)")
+        if summary['errors']:
+            self.stdout.write(self.style.ERROR(
+                f"{summary['errors']} errores de lectura; no se eliminaron entradas del catálogo"
+            ))
@@ -62,10 +62,9 @@ class Command(BaseCommand):
         
         # Obtener prompt personalizado
         try:
-            image_prompt_template = PromptManager.get_default_prompt('image')
-            
             # Formatear el prompt
-            cover_prompt = image_prompt_template.format(
+            cover_prompt = PromptManager.render_prompt(
+                'image',
                 title=title,
                 keywords='inteligencia artificial, machine learning, tecnología',
                 style=style,
@@ -0,0 +1,315 @@
+"""
+Catálogo persistente de las imágenes de media.
+
+``MediaAsset`` guarda ruta, carpeta, tamaño, dimensiones y fecha de cada
+imagen para que la galería liste, filtre, ordene y pagine con consultas
+indexadas en lugar de recorrer ``MEDIA_ROOT`` en cada petición.
+
+Las entradas se crean al guardar archivos a través del storage
+(``posts.storage.CatalogFileSystemStorage``) y ``scan_media`` reconcilia el
+catálogo con el disco para los archivos que llegan por otras vías
+(scripts, copias directas a MEDIA_ROOT). El escáner es incremental: solo
+vuelve a inspeccionar los archivos cuyo (inodo, mtime, tamaño) cambió.
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .media_image_selector import MediaImageSelector
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Hilos que leen cabeceras de imagen y archivos por lote del escáner
+SCAN_WORKERS = 4
+SCAN_BATCH_SIZE = 500
+
+# Tamaño de bloque al calcular hashes (los archivos nunca se leen enteros)
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def is_catalog_path(path):
+    """
+    Indica si ``path`` (relativa a MEDIA_ROOT) debe estar en el catálogo.
+    """
+    if not path or not MediaImageSelector._is_image_file(path):
+        return False
+    folders = path.replace('\\', '/').split('/')[:-1]
+    return not any(MediaImageSelector._should_exclude_folder(folder) for folder in folders)
+
+
+def read_dimensions(full_path):
+    """
+    Lee ancho y alto de la cabecera de la imagen sin decodificar los píxeles.
+    """
+    try:
+        with Image.open(full_path) as img:
+            return img.size
+    except Exception as e:
+        logger.warning(f"No se pudieron leer las dimensiones de {full_path}: {e}")
+        return None, None
+
+
+def hash_stream(fileobj, chunk_size=HASH_CHUNK_SIZE):
+    """
+    SHA-256 de un archivo abierto leyéndolo por bloques.
+
+    Acepta objetos File de Django (usa ``chunks()``) o archivos normales y,
+    si se puede, deja el puntero al principio para poder guardarlo después.
+    """
+    digest = hashlib.sha256()
+    if hasattr(fileobj, 'chunks'):
+        for chunk in fileobj.chunks(chunk_size):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+            digest.update(chunk)
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(full_path):
+    """
+    SHA-256 de un archivo en disco, o cadena vacía si no se puede leer.
+    """
+    try:
+        with open(full_path, 'rb') as f:
+            return hash_stream(f)
+    except OSError as e:
+        logger.warning(f"No se pudo calcular el hash de {full_path}: {e}")
+        return ''
+
+
+def probe_file(full_path):
+    """
+    Inspecciona un archivo: ``(ancho, alto, sha256)``.
+    """
+    width, height = read_dimensions(full_path)
+    return width, height, hash_file(full_path)
+
+
+def asset_fields(path, stat, width, height, content_hash=''):
+    """
+    Campos de ``MediaAsset`` para un archivo ya inspeccionado.
+    """
+    path = path.replace('\\', '/')
+    folder, filename = os.path.split(path)
+    return {
+        'folder': folder,
+        'filename': filename,
+        'size_bytes': stat.st_size,
+        'width': width,
+        'height': height,
+        'modified_at': datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc),
+        'is_suitable_for_cover': MediaImageSelector._is_suitable_for_cover(width, height),
+        'inode': stat.st_ino,
+        'mtime_ns': stat.st_mtime_ns,
+        'last_seen_at': timezone.now(),
+        'content_hash': content_hash,
+    }
+
+
+def catalog_file(path):
+    """
+    Crea o actualiza la entrada de un archivo de media.
+
+    Returns:
+        MediaAsset o None si el archivo no pertenece al catálogo
+    """
+    path = path.replace('\\', '/')
+    if not is_catalog_path(path):
+        return None
+
+    full_path = os.path.join(str(settings.MEDIA_ROOT), path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        forget_file(path)
+        return None
+
+    width, height, content_hash = probe_file(full_path)
+    asset, _ = MediaAsset.objects.update_or_create(
+        path=path,
+        defaults=asset_fields(path, stat, width, height, content_hash),
+    )
+    return asset
+
+
+def forget_file(path):
+    """
+    Elimina la entrada de un archivo borrado.
+    """
+    MediaAsset.objects.filter(path=path.replace('\\', '/')).delete()
+
+
+class ScanStats:
+    """
+    Contadores de una pasada del escáner.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.directories = 0
+        self.files = 0
+        self.probed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started
+
+    @property
+    def files_per_second(self):
+        elapsed = self.elapsed or (time.monotonic() - self.started)
+        return self.files / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return {
+            'directories': self.directories,
+            'files': self.files,
+            'probed': self.probed,
+            'unchanged': self.unchanged,
+            'removed': self.removed,
+            'errors': self.errors,
+            'elapsed_s': round(self.elapsed, 2),
+            'files_per_second': round(self.files_per_second, 1),
+        }
+
+
+def iter_media_files(root, stats):
+    """
+    Recorre ``root`` con ``os.scandir`` y genera ``(ruta relativa, stat)``.
+
+    Es un generador con una pila de directorios pendientes: nunca tiene en
+    memoria más que el directorio actual, aunque haya cientos de miles de
+    archivos.
+    """
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            iterator = os.scandir(os.path.join(root, rel_dir))
+        except OSError as e:
+            logger.warning(f"No se pudo listar {rel_dir or root}: {e}")
+            stats.errors += 1
+            continue
+
+        stats.directories += 1
+        with iterator:
+            for entry in iterator:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not MediaImageSelector._should_exclude_folder(entry.name):
+                            pending.append(rel_path)
+                    elif entry.is_file(follow_symlinks=False) and MediaImageSelector._is_image_file(entry.name):
+                        yield rel_path, entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    logger.warning(f"No se pudo leer {rel_path}: {e}")
+                    stats.errors += 1
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def scan_media(workers=SCAN_WORKERS, batch_size=SCAN_BATCH_SIZE, full=False, progress=None):
+    """
+    Reconciliación incremental del catálogo con MEDIA_ROOT.
+
+    Los archivos se procesan por lotes: cada lote consulta sus firmas
+    guardadas (inodo, mtime, tamaño) y solo los que cambiaron se vuelven a
+    inspeccionar (cabecera de la imagen y SHA-256) en un pool de hilos. Las
+    entradas cuyo archivo ya no existe se eliminan al final, salvo que el
+    recorrido haya tenido errores.
+
+    Args:
+        workers: Hilos para leer cabeceras
+        batch_size: Archivos por lote (acota la memoria usada)
+        full: Volver a inspeccionar todos los archivos aunque no cambien
+        progress: Callable opcional ``(ScanStats)`` llamado tras cada lote
+
+    Returns:
+        ScanStats: Contadores de la pasada
+    """
+    root = str(settings.MEDIA_ROOT)
+    scan_started = timezone.now()
+    stats = ScanStats()
+    update_fields = [
+        'folder', 'filename', 'size_bytes', 'width', 'height', 'modified_at',
+        'is_suitable_for_cover', 'inode', 'mtime_ns', 'last_seen_at', 'indexed_at',
+        'content_hash',
+    ]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='media-scan') as pool:
+        for batch in _batches(iter_media_files(root, stats), batch_size):
+            stats.files += len(batch)
+            # Las entradas sin hash se tratan como cambiadas para completarlas
+            signatures = {
+                path: (inode, mtime_ns, size)
+                for path, inode, mtime_ns, size in MediaAsset.objects.filter(
+                    path__in=[path for path, _ in batch]
+                ).exclude(content_hash='').values_list('path', 'inode', 'mtime_ns', 'size_bytes')
+            }
+
+            changed = []
+            unchanged = []
+            for path, stat in batch:
+                if not full and signatures.get(path) == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                    unchanged.append(path)
+                else:
+                    changed.append((path, stat))
+
+            if changed:
+                probes = pool.map(lambda item: probe_file(os.path.join(root, item[0])), changed)
+                assets = []
+                for (path, stat), (width, height, content_hash) in zip(changed, probes):
+                    fields = asset_fields(path, stat, width, height, content_hash)
+                    fields['last_seen_at'] = scan_started
+                    assets.append(MediaAsset(path=path, **fields))
+                MediaAsset.objects.bulk_create(
+                    assets,
+                    update_conflicts=True,
+                    unique_fields=['path'],
+                    update_fields=update_fields,
+                )
+
+            if unchanged:
+                MediaAsset.objects.filter(path__in=unchanged).update(last_seen_at=scan_started)
+
+            stats.probed += len(changed)
+            stats.unchanged += len(unchanged)
+            if progress:
+                progress(stats)
+
+    if stats.errors:
+        logger.warning("Escaneo de media con errores: no se eliminan entradas del catálogo")
+    else:
+        stats.removed, _ = MediaAsset.objects.filter(
+            Q(last_seen_at__lt=scan_started) | Q(last_seen_at__isnull=True)
+        ).delete()
+
+    stats.finish()
+    logger.info(
+        f"Catálogo de media sincronizado: {stats.files} imágenes, {stats.probed} inspeccionadas, "
+        f"{stats.removed} eliminadas ({stats.files_per_second:.0f} archivos/s)"
+    )
+    return stats
@@ -0,0 +1,180 @@
+"""
+Deduplicación de imágenes de media por contenido.
+
+``save_deduplicated`` guarda un archivo solo si sus bytes no existen ya en
+el catálogo (SHA-256 calculado por bloques); si existen, devuelve la ruta
+del archivo existente y renueva su fecha de modificación, para que
+``collect_orphan_media`` lo trate como una subida reciente. ``collapse_duplicates`` agrupa los duplicados que ya
+están en disco, reescribe sus referencias (cabeceras de posts, HTML de los
+posts y avatares) hacia una copia canónica y borra el resto.
+"""
+
+import datetime
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from accounts.models import Profile
+
+from .image_variants import delete_variants, schedule_variants
+from .media_catalog import forget_file, hash_stream
+from .media_serving import HASHED_PREFIX
+from .models import ImageVariant, MediaAsset, Post
+
+logger = logging.getLogger(__name__)
+
+
+def find_by_hash(content_hash):
+    """
+    Ruta de un archivo existente con ese hash, o None.
+
+    Las entradas cuyo archivo ya no existe se eliminan del catálogo.
+    """
+    for path in MediaAsset.objects.filter(content_hash=content_hash).order_by('modified_at').values_list('path', flat=True):
+        if default_storage.exists(path):
+            return path
+        forget_file(path)
+    return None
+
+
+def touch(path):
+    """
+    Renueva la fecha de modificación de un archivo reutilizado, en disco y
+    en el catálogo.
+
+    El editor sube las imágenes antes de guardar el post que las usa: sin
+    esto, un duplicado de un archivo antiguo y sin referencias podría irse
+    a cuarentena antes de que el post se guarde.
+    """
+    try:
+        full_path = default_storage.path(path)
+        os.utime(full_path)
+        stat = os.stat(full_path)
+    except (NotImplementedError, OSError) as e:
+        logger.warning(f"No se pudo renovar la fecha de {path}: {e}")
+        return
+    MediaAsset.objects.filter(path=path).update(
+        modified_at=datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc),
+        mtime_ns=stat.st_mtime_ns,
+        last_seen_at=timezone.now(),
+    )
+
+
+def save_deduplicated(path, content):
+    """
+    Guarda ``content`` en ``path`` salvo que ya exista un archivo idéntico.
+
+    Args:
+        path: Ruta deseada dentro del storage
+        content: File de Django (ContentFile, UploadedFile...)
+
+    Returns:
+        str: Ruta guardada o ruta del duplicado existente
+    """
+    content_hash = hash_stream(content)
+    existing = find_by_hash(content_hash)
+    if existing:
+        logger.info(f"Imagen duplicada, se reutiliza {existing} en lugar de {path}")
+        touch(existing)
+        return existing
+    return default_storage.save(path, content)
+
+
+def _referenced_by_header(path):
+    return Post.objects.filter(header_image=path).exists()
+
+
+def _url_pattern(path):
+    """URLs de ``path`` en el HTML, con o sin el segmento de hash."""
+    return re.compile(
+        re.escape(settings.MEDIA_URL) + f'(?:{HASHED_PREFIX})?' + re.escape(filepath_to_uri(path)) + r'(?=[\s"\'),?#]|$)'
+    )
+
+
+def _replace_references(duplicate, canonical):
+    """
+    Reescribe las referencias a ``duplicate`` para que apunten a ``canonical``.
+
+    En el HTML se reconocen tanto las URLs normales como las que llevan hash
+    (``MEDIA_HASHED_URLS``), que incluyen un hash distinto por archivo.
+
+    Returns:
+        int: Filas actualizadas
+    """
+    pattern = _url_pattern(duplicate)
+    canonical_url = default_storage.url(canonical)
+
+    updated = Post.objects.filter(header_image=duplicate).update(header_image=canonical)
+    candidates = Post.objects.filter(content__contains=filepath_to_uri(duplicate)).values_list('pk', 'content')
+    for pk, content in candidates.iterator():
+        content, replaced = pattern.subn(lambda match: canonical_url, content)
+        if replaced:
+            updated += Post.objects.filter(pk=pk).update(content=content)
+    updated += Profile.objects.filter(avatar=duplicate).update(avatar=canonical)
+    return updated
+
+
+def collapse_duplicates(dry_run=False):
+    """
+    Unifica los archivos con el mismo contenido.
+
+    La copia canónica es la usada como cabecera de algún post o, si no hay
+    ninguna, la más antigua. Las referencias se reescriben dentro de una
+    transacción y los archivos sobrantes se borran después del commit.
+
+    Args:
+        dry_run: Solo calcular lo que se haría
+
+    Returns:
+        dict: Grupos, archivos eliminados, referencias reescritas y bytes liberados
+    """
+    result = {'groups': 0, 'removed': 0, 'references': 0, 'bytes': 0}
+
+    hashes = (
+        MediaAsset.objects.exclude(content_hash='')
+        .values('content_hash')
+        .annotate(copies=Count('id'))
+        .filter(copies__gt=1)
+        .values_list('content_hash', flat=True)
+    )
+
+    for content_hash in list(hashes):
+        assets = [
+            asset for asset in MediaAsset.objects.filter(content_hash=content_hash).order_by('modified_at')
+            if default_storage.exists(asset.path)
+        ]
+        if len(assets) < 2:
+            continue
+
+        canonical = next((a for a in assets if _referenced_by_header(a.path)), assets[0])
+        duplicates = [a for a in assets if a.pk != canonical.pk]
+        result['groups'] += 1
+        result['removed'] += len(duplicates)
+        result['bytes'] += sum(a.size_bytes for a in duplicates)
+
+        if dry_run:
+            continue
+
+        with transaction.atomic():
+            for duplicate in duplicates:
+                result['references'] += _replace_references(duplicate.path, canonical.path)
+
+        for duplicate in duplicates:
+            delete_variants(duplicate.path)
+            default_storage.delete(duplicate.path)
+
+        if _referenced_by_header(canonical.path) and not ImageVariant.objects.filter(source_path=canonical.path).exists():
+            schedule_variants(canonical.path)
+
+    logger.info(
+        f"Deduplicación de media{' (simulación)' if dry_run else ''}: {result['groups']} grupos, "
+        f"{result['removed']} duplicados, {result['references']} referencias, {result['bytes']} bytes"
+    )
+    return result
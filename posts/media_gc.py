@@ -0,0 +1,205 @@
+"""
+Recolección de imágenes de media huérfanas.
+
+Una imagen es huérfana cuando ninguna referencia la usa: ni
+``Post.header_image``, ni ``Profile.avatar``, ni un ``src``/``srcset``/
+``href`` dentro del HTML de los posts. El conjunto de referencias se
+construye recorriendo el contenido de los posts en streaming y se compara
+con el catálogo ``MediaAsset``; las huérfanas se mueven a cuarentena (o se
+borran) por lotes.
+
+Las imágenes recientes nunca se tocan: el editor sube las imágenes antes
+de que se guarde el post que las usa.
+
+Las miniaturas de las imágenes retiradas se borran con ellas, y al final
+de cada pasada se retiran de la caché las que ya no corresponden a ninguna
+imagen del catálogo.
+"""
+
+import datetime
+import logging
+import os
+import re
+import shutil
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from accounts.models import Profile
+
+from .image_variants import delete_variants
+from .media_serving import strip_hashed_prefix
+from .models import MediaAsset, Post
+from .thumbnails import purge_stale_thumbnails, purge_thumbnails
+
+logger = logging.getLogger(__name__)
+
+# Carpeta de media donde se mueven las huérfanas antes de borrarlas
+QUARANTINE_FOLDER = 'quarantine'
+
+# Antigüedad mínima para considerar una imagen huérfana
+GC_MIN_AGE_DAYS = 7
+
+# Días que una imagen pasa en cuarentena antes de borrarse
+QUARANTINE_DAYS = 30
+
+GC_BATCH_SIZE = 500
+
+# Valores de src/srcset/href en el HTML de los posts
+ATTRIBUTE_RE = re.compile(r'''\b(?:src|srcset|href)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+# URLs de miniaturas: thumbs/<ancho>x<alto>/<ruta original>
+THUMBNAIL_RE = re.compile(r'^thumbs/\d+x\d+/(.+)$')
+
+
+def media_path_from_url(url):
+    """
+    Ruta relativa a MEDIA_ROOT de una URL de media, o None si no lo es.
+
+    Admite URLs con hash (``h/<hash>/<ruta>``) y de miniaturas.
+    """
+    path = unquote(urlparse(url.strip()).path)
+    media_url = settings.MEDIA_URL
+    if not path.startswith(media_url):
+        return None
+    path = strip_hashed_prefix(path[len(media_url):])
+    match = THUMBNAIL_RE.match(path)
+    return match.group(1) if match else path
+
+
+def extract_media_paths(html):
+    """
+    Rutas de media referenciadas por un fragmento HTML.
+    """
+    paths = set()
+    if not html or settings.MEDIA_URL not in html:
+        return paths
+    for match in ATTRIBUTE_RE.finditer(html):
+        value = match.group(1) or match.group(2) or match.group(3) or ''
+        # srcset: "url 320w, url 640w"
+        for candidate in value.split(','):
+            url = candidate.strip().split(' ')[0]
+            path = media_path_from_url(url) if url else None
+            if path:
+                paths.add(path)
+    return paths
+
+
+def collect_references():
+    """
+    Conjunto de rutas de media usadas por posts y perfiles.
+    """
+    references = set()
+    references.update(
+        Post.objects.exclude(header_image='').exclude(header_image__isnull=True)
+        .values_list('header_image', flat=True)
+    )
+    references.update(
+        Profile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        .values_list('avatar', flat=True)
+    )
+    for content in Post.objects.filter(content__contains=settings.MEDIA_URL).values_list('content', flat=True).iterator(chunk_size=200):
+        references.update(extract_media_paths(content))
+    return references
+
+
+def _quarantine(path):
+    """
+    Mueve un archivo a ``quarantine/<fecha>/<ruta>`` dentro de MEDIA_ROOT.
+    """
+    root = str(settings.MEDIA_ROOT)
+    target = os.path.join(root, QUARANTINE_FOLDER, timezone.now().strftime('%Y%m%d'), path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(os.path.join(root, path), target)
+
+
+def purge_quarantine(days=QUARANTINE_DAYS):
+    """
+    Borra las carpetas de cuarentena con más de ``days`` días.
+
+    Returns:
+        int: Carpetas eliminadas
+    """
+    quarantine_root = os.path.join(str(settings.MEDIA_ROOT), QUARANTINE_FOLDER)
+    if not os.path.isdir(quarantine_root):
+        return 0
+
+    cutoff = (timezone.now() - datetime.timedelta(days=days)).strftime('%Y%m%d')
+    purged = 0
+    for entry in os.scandir(quarantine_root):
+        if entry.is_dir() and entry.name.isdigit() and entry.name < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            purged += 1
+    return purged
+
+
+def collect_orphans(dry_run=False, delete=False, min_age_days=GC_MIN_AGE_DAYS, batch_size=GC_BATCH_SIZE):
+    """
+    Busca y retira las imágenes del catálogo que nada referencia.
+
+    Args:
+        dry_run: Solo informar de lo que se haría
+        delete: Borrar en lugar de mover a cuarentena
+        min_age_days: Ignorar imágenes modificadas hace menos días
+        batch_size: Entradas del catálogo procesadas por lote
+
+    Returns:
+        dict: Contadores, bytes recuperables y una muestra de rutas
+    """
+    references = collect_references()
+    cutoff = timezone.now() - datetime.timedelta(days=min_age_days)
+    result = {
+        'references': len(references),
+        'scanned': 0,
+        'orphans': 0,
+        'bytes': 0,
+        'removed': 0,
+        'errors': 0,
+        'sample': [],
+        'purged': 0,
+        'thumbnails': 0,
+    }
+
+    candidates = MediaAsset.objects.filter(modified_at__lt=cutoff).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(candidates.filter(pk__gt=last_pk).values_list('pk', 'path', 'size_bytes')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        result['scanned'] += len(batch)
+
+        orphans = [(path, size) for _, path, size in batch if path not in references]
+        result['orphans'] += len(orphans)
+        result['bytes'] += sum(size for _, size in orphans)
+        result['sample'].extend(path for path, _ in orphans[:max(0, 20 - len(result['sample']))])
+        if dry_run or not orphans:
+            continue
+
+        removed = []
+        for path, _ in orphans:
+            try:
+                delete_variants(path)
+                if delete:
+                    default_storage.delete(path)
+                else:
+                    result['thumbnails'] += purge_thumbnails(path)
+                    _quarantine(path)
+                removed.append(path)
+            except OSError as e:
+                logger.warning(f"No se pudo retirar la imagen huérfana {path}: {e}")
+                result['errors'] += 1
+        MediaAsset.objects.filter(path__in=removed).delete()
+        result['removed'] += len(removed)
+
+    if not dry_run:
+        result['purged'] = purge_quarantine()
+        result['thumbnails'] += purge_stale_thumbnails(min_age_days * 24 * 60 * 60)
+
+    logger.info(
+        f"Recolección de media{' (simulación)' if dry_run else ''}: {result['orphans']} huérfanas de "
+        f"{result['scanned']} imágenes, {result['bytes']} bytes, {result['removed']} retiradas"
+    )
+    return result
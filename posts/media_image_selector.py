@@ -5,21 +5,37 @@ Selector de imágenes para toda la carpeta media.
 import os
 from typing import List, Dict, Optional
 from django.core.files.storage import default_storage
-from django.conf import settings
-from PIL import Image
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Lower
 import logging
 
+from .models import MediaAsset
+from .thumbnails import GALLERY_THUMBNAIL_SIZE, thumbnail_url
+
 logger = logging.getLogger(__name__)
 
 
 class MediaImageSelector:
     """
     Utility class for selecting images from the entire media folder.
+    
+    Listings, search and stats are served from the MediaAsset catalog
+    (see posts.media_catalog) instead of walking MEDIA_ROOT.
     """
     
     # Extensiones de imagen soportadas
     SUPPORTED_FORMATS = ['.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.svg']
     
+    # Tamaño de las miniaturas de la galería (debe estar en THUMBNAIL_SIZES)
+    THUMBNAIL_SIZE = GALLERY_THUMBNAIL_SIZE
+    
+    # Ordenamientos de la galería sobre el catálogo
+    SORT_ORDERS = {
+        'date': ('-modified_at',),
+        'name': (Lower('filename'),),
+        'size': ('-size_bytes',),
+    }
+    
     # Carpetas a excluir (pueden contener archivos que no son imágenes o son sensibles)
     EXCLUDED_FOLDERS = [
         '__pycache__',
@@ -29,85 +45,45 @@ class MediaImageSelector:
         'tmp',
         'cache',
         'logs',
+        'variants',  # Variantes responsivas generadas por image_variants
+        'quarantine',  # Huérfanas retiradas por media_gc
     ]
     
     @classmethod
-    def get_all_media_images(cls, folder: str = None) -> List[Dict]:
+    def query_images(cls, folder: str = None, search: str = None, sort: str = 'date'):
         """
-        Get list of all images from the media folder.
+        Build a catalog queryset for the gallery.
         
         Args:
-            folder: Specific folder to search (optional)
+            folder: Specific folder to list (non-recursive, optional)
+            search: Text to match against filename or folder (optional)
+            sort: 'date' (newest first), 'name' or 'size' (largest first)
             
         Returns:
-            List of image dictionaries with metadata
+            QuerySet of MediaAsset
         """
-        images = []
+        images = MediaAsset.objects.all()
         
-        # Si se especifica una carpeta, buscar solo en ella
         if folder:
-            if default_storage.exists(folder):
-                folder_images = cls._get_images_from_folder(folder)
-                images.extend(folder_images)
-        else:
-            # Buscar en toda la carpeta media
-            images = cls._scan_media_directory()
+            images = images.filter(folder=folder.strip('/'))
         
-        # Sort by modification time (newest first)
-        images.sort(key=lambda x: x.get('modified_time', 0), reverse=True)
-        
-        return images
-    
-    @classmethod
-    def _scan_media_directory(cls, base_path: str = '') -> List[Dict]:
-        """Escanear recursivamente toda la carpeta media."""
-        images = []
-        
-        try:
-            # Obtener el contenido del directorio
-            if default_storage.exists(base_path):
-                dirs, files = default_storage.listdir(base_path)
-                
-                # Procesar archivos en el directorio actual
-                for filename in files:
-                    if cls._is_image_file(filename):
-                        file_path = os.path.join(base_path, filename).replace('\\', '/')
-                        image_info = cls._get_image_info(file_path, filename)
-                        if image_info:
-                            images.append(image_info)
-                
-                # Procesar subdirectorios recursivamente
-                for dirname in dirs:
-                    if not cls._should_exclude_folder(dirname):
-                        subdir_path = os.path.join(base_path, dirname).replace('\\', '/')
-                        subdir_images = cls._scan_media_directory(subdir_path)
-                        images.extend(subdir_images)
-                        
-        except Exception as e:
-            logger.error(f"Error scanning directory {base_path}: {e}")
+        if search:
+            images = images.filter(Q(filename__icontains=search) | Q(folder__icontains=search))
         
-        return images
+        return images.order_by(*cls.SORT_ORDERS.get(sort, cls.SORT_ORDERS['date']))
     
     @classmethod
-    def _get_images_from_folder(cls, folder: str) -> List[Dict]:
-        """Get images from a specific folder (non-recursive)."""
-        images = []
+    def get_all_media_images(cls, folder: str = None) -> List[Dict]:
+        """
+        Get list of all images from the media catalog.
         
-        try:
-            # List files in the folder
-            files = default_storage.listdir(folder)[1]  # [1] gets files, [0] gets subdirs
+        Args:
+            folder: Specific folder to search (optional)
             
-            for filename in files:
-                if cls._is_image_file(filename):
-                    file_path = os.path.join(folder, filename).replace('\\', '/')
-                    image_info = cls._get_image_info(file_path, filename)
-                    if image_info:
-                        images.append(image_info)
-                        
-        except Exception as e:
-            logger.error(f"Error listing files in folder {folder}: {e}")
-        
-        return images
+        Returns:
+            List of image dictionaries with metadata, newest first
+        """
+        return [asset.as_dict() for asset in cls.query_images(folder=folder)]
     
     @classmethod
     def _should_exclude_folder(cls, folder_name: str) -> bool:
@@ -120,66 +96,10 @@ class MediaImageSelector:
         """Check if file is a supported image format."""
         return any(filename.lower().endswith(ext) for ext in cls.SUPPORTED_FORMATS)
     
-    @classmethod
-    def _get_image_info(cls, file_path: str, filename: str) -> Optional[Dict]:
-        """Get detailed information about an image file."""
-        try:
-            # Get file stats
-            try:
-                file_stats = default_storage.get_created_time(file_path)
-                modified_time = file_stats.timestamp() if file_stats else 0
-            except:
-                modified_time = 0
-            
-            try:
-                file_size = default_storage.size(file_path)
-                size_mb = round(file_size / (1024 * 1024), 2)
-            except:
-                file_size = 0
-                size_mb = 0
-            
-            # Get image dimensions
-            width, height = cls._get_image_dimensions(file_path)
-            
-            # Generate thumbnail URL (if needed)
-            thumbnail_url = cls._generate_thumbnail_url(file_path)
-            
-            return {
-                'filename': filename,
-                'path': file_path,
-                'url': default_storage.url(file_path),
-                'thumbnail_url': thumbnail_url,
-                'size_bytes': file_size,
-                'size_mb': size_mb,
-                'width': width,
-                'height': height,
-                'dimensions': f"{width}x{height}" if width and height else "Unknown",
-                'modified_time': modified_time,
-                'is_suitable_for_cover': cls._is_suitable_for_cover(width, height),
-                'folder': os.path.dirname(file_path),
-                'folder_name': os.path.basename(os.path.dirname(file_path)) if os.path.dirname(file_path) else 'root'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error getting info for image {file_path}: {e}")
-            return None
-    
-    @classmethod
-    def _get_image_dimensions(cls, file_path: str) -> tuple[Optional[int], Optional[int]]:
-        """Get image dimensions."""
-        try:
-            with default_storage.open(file_path, 'rb') as f:
-                with Image.open(f) as img:
-                    return img.size
-        except Exception as e:
-            logger.warning(f"Could not get dimensions for {file_path}: {e}")
-            return None, None
-    
     @classmethod
     def _generate_thumbnail_url(cls, file_path: str) -> str:
-        """Generate thumbnail URL (for now, just return the original URL)."""
-        # In the future, this could generate actual thumbnails
-        return default_storage.url(file_path)
+        """Return the on-demand thumbnail URL for the gallery grid."""
+        return thumbnail_url(file_path, *cls.THUMBNAIL_SIZE)
     
     @classmethod
     def _is_suitable_for_cover(cls, width: Optional[int], height: Optional[int]) -> bool:
@@ -198,21 +118,17 @@ class MediaImageSelector:
     @classmethod
     def get_folder_structure(cls) -> Dict[str, int]:
         """Get the folder structure with image counts."""
-        folder_counts = {}
-        images = cls.get_all_media_images()
-        
-        for image in images:
-            folder = image.get('folder', 'root')
-            if folder not in folder_counts:
-                folder_counts[folder] = 0
-            folder_counts[folder] += 1
-        
-        return dict(sorted(folder_counts.items()))
+        folders = (
+            MediaAsset.objects.values_list('folder')
+            .annotate(count=Count('id'))
+            .order_by('folder')
+        )
+        return dict(folders)
     
     @classmethod
     def search_images(cls, query: str, folder: str = None) -> List[Dict]:
         """
-        Search for images by filename or metadata.
+        Search for images by filename or folder.
         
         Args:
             query: Search query
@@ -221,38 +137,18 @@ class MediaImageSelector:
         Returns:
             List of matching images
         """
-        all_images = cls.get_all_media_images(folder)
-        query_lower = query.lower()
-        
-        matching_images = []
-        for image in all_images:
-            # Search in filename
-            if query_lower in image['filename'].lower():
-                matching_images.append(image)
-                continue
-            
-            # Search in folder path
-            if query_lower in image['folder'].lower():
-                matching_images.append(image)
-                continue
-        
-        return matching_images
+        return [asset.as_dict() for asset in cls.query_images(folder=folder, search=query)]
     
     @classmethod
     def get_recent_images(cls, limit: int = 20) -> List[Dict]:
         """Get most recently added images."""
-        all_images = cls.get_all_media_images()
-        return all_images[:limit]
+        return [asset.as_dict() for asset in cls.query_images()[:limit]]
     
     @classmethod
     def get_suitable_cover_images(cls, limit: int = 50) -> List[Dict]:
         """Get images suitable for use as cover images."""
-        all_images = cls.get_all_media_images()
-        suitable_images = [
-            img for img in all_images 
-            if img['is_suitable_for_cover']
-        ]
-        return suitable_images[:limit]
+        images = cls.query_images().filter(is_suitable_for_cover=True)[:limit]
+        return [asset.as_dict() for asset in images]
     
     @classmethod
     def validate_image_selection(cls, image_path: str) -> tuple[bool, Optional[str]]:
@@ -281,32 +177,17 @@ class MediaImageSelector:
     @classmethod
     def get_image_stats(cls) -> Dict:
         """Get statistics about available images."""
-        all_images = cls.get_all_media_images()
-        
-        if not all_images:
-            return {
-                'total_images': 0,
-                'total_size_mb': 0,
-                'suitable_for_cover': 0,
-                'by_folder': {}
-            }
-        
-        total_size = sum(img['size_bytes'] for img in all_images)
-        suitable_count = sum(1 for img in all_images if img['is_suitable_for_cover'])
-        
-        # Group by folder
-        by_folder = {}
-        for img in all_images:
-            folder = img['folder']
-            if folder not in by_folder:
-                by_folder[folder] = 0
-            by_folder[folder] += 1
+        totals = MediaAsset.objects.aggregate(
+            total_images=Count('id'),
+            total_size=Sum('size_bytes'),
+            suitable_for_cover=Count('id', filter=Q(is_suitable_for_cover=True)),
+        )
         
         return {
-            'total_images': len(all_images),
-            'total_size_mb': round(total_size / (1024 * 1024), 2),
-            'suitable_for_cover': suitable_count,
-            'by_folder': by_folder
+            'total_images': totals['total_images'],
+            'total_size_mb': round((totals['total_size'] or 0) / (1024 * 1024), 2),
+            'suitable_for_cover': totals['suitable_for_cover'],
+            'by_folder': cls.get_folder_structure() if totals['total_images'] else {}
         }
     
     @classmethod
@@ -327,6 +208,7 @@ class MediaImageSelector:
             
             if not default_storage.exists(image_path):
                 logger.warning(f"Image file does not exist: {image_path}")
+                MediaAsset.objects.filter(path=image_path).delete()
                 return False, "Image file does not exist"
             
             # Validate it's an image file
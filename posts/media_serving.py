@@ -0,0 +1,245 @@
+"""
+Servido de archivos de media con el servidor web delante.
+
+Django solo decide si el archivo se puede servir (ruta dentro de
+MEDIA_ROOT, fuera de carpetas privadas, existe) y delega el envío de los
+bytes según ``MEDIA_SERVE_MODE``:
+
+- ``accel``: cabecera ``X-Accel-Redirect`` hacia una location ``internal``
+  de nginx (``MEDIA_ACCEL_PREFIX``). nginx atiende los ``Range``.
+- ``sendfile``: cabecera ``X-Sendfile`` con la ruta absoluta (Apache con
+  mod_xsendfile, lighttpd).
+- ``django`` (por defecto): el propio worker envía el archivo; solo para
+  desarrollo. Admite un rango de bytes simple.
+
+Con ``MEDIA_HASHED_URLS`` activo, ``default_storage.url()`` devuelve
+``/media/h/<hash>/<ruta>``, donde ``<hash>`` se deriva del tamaño y la
+fecha de modificación del archivo (un ``stat``, sin leerlo ni consultar la
+base de datos). Esas URLs no cambian mientras no cambie el archivo y se
+sirven con ``Cache-Control: immutable``; si el hash ya no coincide se
+redirige a la URL actual.
+
+Ejemplo de nginx para el modo ``accel``::
+
+    location /protected-media/ {
+        internal;
+        alias /app/media/;
+    }
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, quote_etag
+from django.views.static import was_modified_since
+
+logger = logging.getLogger(__name__)
+
+SERVE_MODES = ('django', 'accel', 'sendfile')
+
+# Segmento de las URLs con hash: /media/h/<hash>/<ruta>
+HASHED_SEGMENT = 'h'
+HASH_LENGTH = 16
+HASHED_PREFIX = rf'{HASHED_SEGMENT}/[0-9a-f]{{{HASH_LENGTH}}}/'
+HASHED_PREFIX_RE = re.compile('^' + HASHED_PREFIX)
+
+# URLs con hash: el contenido de una URL no cambia nunca
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# URLs sin hash: el archivo puede reemplazarse con el mismo nombre
+MEDIA_MAX_AGE = 60 * 60
+
+# Carpetas de media que nunca se sirven
+PRIVATE_FOLDERS = ('quarantine',)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def serve_mode():
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+    return mode if mode in SERVE_MODES else 'django'
+
+
+def hashed_urls_enabled():
+    return getattr(settings, 'MEDIA_HASHED_URLS', False) and settings.MEDIA_URL.startswith('/')
+
+
+def resolve_media_path(path):
+    """
+    Ruta absoluta de un archivo de media servible, o None.
+
+    Rechaza rutas fuera de MEDIA_ROOT, archivos ocultos, carpetas privadas
+    y lo que no sea un archivo normal.
+    """
+    parts = path.replace('\\', '/').split('/')
+    if not path or any(part.startswith('.') for part in parts) or parts[0] in PRIVATE_FOLDERS:
+        return None
+    try:
+        full_path = safe_join(str(settings.MEDIA_ROOT), path)
+    except SuspiciousFileOperation:
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def content_digest(path, stat=None):
+    """
+    Hash de la versión de ``path``, o None si no existe.
+
+    Se calcula con el tamaño y la fecha de modificación del archivo: basta
+    un ``stat`` por URL, y cualquier reemplazo del archivo cambia el hash.
+    """
+    if stat is None:
+        try:
+            stat = os.stat(os.path.join(str(settings.MEDIA_ROOT), path))
+        except OSError:
+            return None
+    version = f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+    return hashlib.sha256(version).hexdigest()[:HASH_LENGTH]
+
+
+def strip_hashed_prefix(path):
+    """``h/<hash>/<ruta>`` → ``<ruta>``; el resto de rutas no cambia."""
+    return HASHED_PREFIX_RE.sub('', path, count=1)
+
+
+def hashed_url(path, url):
+    """
+    Inserta el hash del contenido en ``url`` (la URL normal de ``path``).
+    """
+    digest = content_digest(path)
+    if not digest or not url.startswith(settings.MEDIA_URL):
+        return url
+    return f"{settings.MEDIA_URL}{HASHED_SEGMENT}/{digest}/{url[len(settings.MEDIA_URL):]}"
+
+
+def parse_range(header, size):
+    """
+    Rango ``(inicio, fin)`` inclusivo de una cabecera ``Range`` simple.
+
+    Returns:
+        tuple, None si no hay rango utilizable o False si no es satisfacible
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return False
+    return start, end
+
+
+def _stream_range(full_path, start, length):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, full_path, accel_path=None, content_type=None, cache_control=None, etag=None,
+                  mode=None):
+    """
+    Respuesta que envía ``full_path`` sin que el worker copie los bytes
+    (salvo en modo ``django``).
+
+    Args:
+        request: Petición (cabeceras condicionales y ``Range``)
+        full_path: Ruta absoluta del archivo
+        accel_path: URI interna de nginx para el modo ``accel``
+        content_type: Tipo MIME (por defecto según la extensión)
+        cache_control: Valor de ``Cache-Control``
+        etag: ETag sin comillas
+        mode: Modo de envío (por defecto ``MEDIA_SERVE_MODE``)
+    """
+    stat = os.stat(full_path)
+    quoted_etag = quote_etag(etag) if etag else None
+
+    if quoted_etag and request.META.get('HTTP_IF_NONE_MATCH') in (quoted_etag, f'W/{quoted_etag}'):
+        response = HttpResponseNotModified()
+    elif not quoted_etag and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type = content_type or mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        mode = mode or serve_mode()
+        if mode == 'accel' and accel_path:
+            # nginx rellena Content-Length y atiende Range/If-Range
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(accel_path)
+        elif mode == 'sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+        else:
+            response = _django_file_response(request, full_path, stat.st_size, content_type)
+
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if quoted_etag:
+        response['ETag'] = quoted_etag
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def _django_file_response(request, full_path, size, content_type):
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size) if request.method == 'GET' else None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _stream_range(full_path, start, end - start + 1), status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def media_response(request, path, full_path, digest=None, immutable=False):
+    """
+    Respuesta para un archivo de media ya autorizado.
+
+    Args:
+        path: Ruta relativa a MEDIA_ROOT
+        full_path: Ruta absoluta (de ``resolve_media_path``)
+        digest: Hash del contenido, usado como ETag
+        immutable: La URL lleva el hash vigente del contenido
+    """
+    if immutable:
+        cache_control = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = f'public, max-age={MEDIA_MAX_AGE}'
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+    return file_response(
+        request,
+        full_path,
+        accel_path=f"{accel_prefix.rstrip('/')}/{path}",
+        cache_control=cache_control,
+        etag=digest,
+    )
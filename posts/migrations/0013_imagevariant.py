@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2025-08-02 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_add_intelligent_tag_system'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_path', models.CharField(max_length=500, verbose_name='Imagen original')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='Ruta de la variante')),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP'), ('jpeg', 'JPEG'), ('png', 'PNG')], max_length=10, verbose_name='Formato')),
+                ('width', models.PositiveIntegerField(verbose_name='Ancho')),
+                ('height', models.PositiveIntegerField(verbose_name='Alto')),
+                ('file_size', models.PositiveIntegerField(default=0, verbose_name='Tamaño en bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Variante de imagen',
+                'verbose_name_plural': 'Variantes de imagen',
+                'indexes': [models.Index(fields=['source_path', 'format'], name='variant_source_format')],
+                'unique_together': {('source_path', 'format', 'width')},
+            },
+        ),
+    ]
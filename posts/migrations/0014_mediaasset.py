@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True, verbose_name='Ruta')),
+                ('folder', models.CharField(blank=True, max_length=500, verbose_name='Carpeta')),
+                ('filename', models.CharField(max_length=255, verbose_name='Nombre de archivo')),
+                ('size_bytes', models.BigIntegerField(default=0, verbose_name='Tamaño en bytes')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ancho')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Alto')),
+                ('modified_at', models.DateTimeField(verbose_name='Fecha de modificación')),
+                ('is_suitable_for_cover', models.BooleanField(default=False, verbose_name='Apta para portada')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='Última indexación')),
+            ],
+            options={
+                'verbose_name': 'Imagen de media',
+                'verbose_name_plural': 'Imágenes de media',
+                'ordering': ['-modified_at'],
+                'indexes': [models.Index(fields=['-modified_at'], name='media_asset_recent'), models.Index(fields=['folder', '-modified_at'], name='media_asset_folder_recent'), models.Index(fields=['-size_bytes'], name='media_asset_size'), models.Index(fields=['filename'], name='media_asset_filename'), models.Index(fields=['is_suitable_for_cover', '-modified_at'], name='media_asset_cover_recent')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_mediaasset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaasset',
+            name='inode',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Inodo'),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Visto por última vez'),
+        ),
+        migrations.AddField(
+            model_name='mediaasset',
+            name='mtime_ns',
+            field=models.BigIntegerField(default=0, verbose_name='mtime (ns)'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaasset',
+            index=models.Index(fields=['last_seen_at'], name='media_asset_last_seen'),
+        ),
+    ]
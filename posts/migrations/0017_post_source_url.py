@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_mediaasset_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='source_url',
+            field=models.URLField(blank=True, max_length=500, null=True, unique=True, verbose_name='URL de origen'),
+        ),
+    ]
@@ -50,6 +50,12 @@ class Post(models.Model):
     )
     reading_time = models.PositiveIntegerField(default=0, verbose_name="Tiempo de lectura")
     is_sticky = models.BooleanField(default=False, verbose_name="Destacado")
+
+    # URL del artículo original de los posts generados por lotes: evita
+    # duplicarlos al reanudar un lote
+    source_url = models.URLField(
+        max_length=500, null=True, blank=True, unique=True, verbose_name="URL de origen"
+    )
     
     # Campos para optimización de rendimiento
     cached_likes_count = models.PositiveIntegerField(default=0, verbose_name="Contador de likes en caché")
@@ -210,6 +216,126 @@ class AIPromptTemplate(models.Model):
         ]
 
 
+class ImageVariant(models.Model):
+    """
+    Archivo derivado (ancho y formato) de una imagen subida a media.
+    """
+    FORMAT_CHOICES = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+        ('png', 'PNG'),
+    ]
+
+    source_path = models.CharField(max_length=500, verbose_name="Imagen original")
+    path = models.CharField(max_length=500, unique=True, verbose_name="Ruta de la variante")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Formato")
+    width = models.PositiveIntegerField(verbose_name="Ancho")
+    height = models.PositiveIntegerField(verbose_name="Alto")
+    file_size = models.PositiveIntegerField(default=0, verbose_name="Tamaño en bytes")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+
+    def __str__(self):
+        return f"{self.source_path} ({self.format} {self.width}w)"
+
+    class Meta:
+        verbose_name = "Variante de imagen"
+        verbose_name_plural = "Variantes de imagen"
+        unique_together = ['source_path', 'format', 'width']
+        indexes = [
+            models.Index(fields=['source_path', 'format'], name='variant_source_format'),
+        ]
+
+
+class MediaAsset(models.Model):
+    """
+    Entrada del catálogo de imágenes de media.
+
+    Se actualiza al guardar archivos a través del storage y la reconcilia el
+    escáner incremental (``sync_media_catalog``), así la galería no recorre
+    el disco.
+    """
+    path = models.CharField(max_length=500, unique=True, verbose_name="Ruta")
+    folder = models.CharField(max_length=500, blank=True, verbose_name="Carpeta")
+    filename = models.CharField(max_length=255, verbose_name="Nombre de archivo")
+    size_bytes = models.BigIntegerField(default=0, verbose_name="Tamaño en bytes")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Ancho")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Alto")
+    modified_at = models.DateTimeField(verbose_name="Fecha de modificación")
+    is_suitable_for_cover = models.BooleanField(default=False, verbose_name="Apta para portada")
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name="Última indexación")
+
+    # Firma del archivo en disco: el escáner solo vuelve a leer los que cambian
+    inode = models.BigIntegerField(null=True, blank=True, verbose_name="Inodo")
+    mtime_ns = models.BigIntegerField(default=0, verbose_name="mtime (ns)")
+    last_seen_at = models.DateTimeField(null=True, blank=True, verbose_name="Visto por última vez")
+
+    # SHA-256 del contenido: permite reutilizar archivos idénticos
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="Hash SHA-256")
+
+    def __str__(self):
+        return self.path
+
+    @property
+    def url(self):
+        from django.core.files.storage import default_storage
+        return default_storage.url(self.path)
+
+    @property
+    def thumbnail_url(self):
+        from .thumbnails import GALLERY_THUMBNAIL_SIZE, thumbnail_url
+        return thumbnail_url(self.path, *GALLERY_THUMBNAIL_SIZE)
+
+    @property
+    def size_mb(self):
+        return round(self.size_bytes / (1024 * 1024), 2)
+
+    @property
+    def dimensions(self):
+        return f"{self.width}x{self.height}" if self.width and self.height else "Unknown"
+
+    @property
+    def modified_time(self):
+        return self.modified_at.timestamp()
+
+    @property
+    def folder_name(self):
+        return self.folder.rsplit('/', 1)[-1] if self.folder else 'root'
+
+    def as_dict(self):
+        """
+        Mismo formato que devolvía MediaImageSelector al recorrer el disco.
+        """
+        return {
+            'filename': self.filename,
+            'path': self.path,
+            'url': self.url,
+            'thumbnail_url': self.thumbnail_url,
+            'size_bytes': self.size_bytes,
+            'size_mb': self.size_mb,
+            'width': self.width,
+            'height': self.height,
+            'dimensions': self.dimensions,
+            'modified_time': self.modified_time,
+            'is_suitable_for_cover': self.is_suitable_for_cover,
+            'folder': self.folder,
+            'folder_name': self.folder_name,
+        }
+
+    class Meta:
+        verbose_name = "Imagen de media"
+        verbose_name_plural = "Imágenes de media"
+        ordering = ['-modified_at']
+        indexes = [
+            models.Index(fields=['-modified_at'], name='media_asset_recent'),
+            models.Index(fields=['folder', '-modified_at'], name='media_asset_folder_recent'),
+            models.Index(fields=['-size_bytes'], name='media_asset_size'),
+            models.Index(fields=['filename'], name='media_asset_filename'),
+            models.Index(fields=['is_suitable_for_cover', '-modified_at'], name='media_asset_cover_recent'),
+            models.Index(fields=['last_seen_at'], name='media_asset_last_seen'),
+        ]
+
+
 # ============================================================================
 # SISTEMA DE TAGS INTELIGENTE - MODELOS EXTENDIDOS
 # ============================================================================
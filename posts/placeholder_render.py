@@ -0,0 +1,168 @@
+"""
+Renderizado de fondos para las imágenes placeholder.
+
+Las máscaras de los gradientes y los campos de ruido se calculan como
+arrays de NumPy y se mezclan con ``Image.composite`` en lugar de pintarse
+píxel a píxel con ``ImageDraw``. Sin NumPy se usan operaciones de Pillow
+equivalentes (``linear_gradient``, ``resize``), también sin bucles en Python.
+
+Los fondos renderizados se cachean por (tipo, colores, tamaño): las
+portadas del mismo estilo comparten fondo y solo cambia el texto.
+"""
+
+import hashlib
+import logging
+import random
+from functools import lru_cache
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_KINDS = ('solid', 'gradient', 'abstract')
+
+# Fondos en caché (cada uno ocupa ancho x alto x 3 bytes)
+BACKGROUND_CACHE_SIZE = 16
+
+# Celdas de la rejilla de ruido: menos celdas, manchas más grandes
+NOISE_CELLS = 6
+
+# Opacidad de las manchas del fondo abstracto
+ABSTRACT_OPACITY = 0.3
+
+
+def hex_to_rgb(value):
+    value = value.lstrip('#')
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def shade(value, factor):
+    """Oscurece (factor < 1) o aclara (factor > 1) un color hex."""
+    return '#' + ''.join(f'{min(255, int(c * factor)):02x}' for c in hex_to_rgb(value))
+
+
+def _seed(*parts):
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+# --- NumPy ---------------------------------------------------------------
+
+def _np_diagonal_ramp(width, height):
+    """Rampa 0..1 de la esquina superior izquierda a la inferior derecha."""
+    ys = np.arange(height, dtype=np.float32)[:, None] / height
+    xs = np.arange(width, dtype=np.float32)[None, :] / width
+    return (ys + xs) / 2
+
+
+def _np_interpolation_weights(size, cells):
+    """Pesos (size, cells + 1) de la interpolación lineal sobre la rejilla."""
+    positions = np.linspace(0, cells, size, endpoint=False, dtype=np.float32)
+    index = positions.astype(np.int32)
+    frac = positions - index
+    weights = np.zeros((size, cells + 1), dtype=np.float32)
+    rows = np.arange(size)
+    weights[rows, index] = 1 - frac
+    weights[rows, index + 1] = frac
+    return weights
+
+
+def _np_noise(width, height, seed, cells=NOISE_CELLS):
+    """Ruido suave 0..1: rejilla aleatoria interpolada bilinealmente."""
+    grid = np.random.default_rng(seed).random((cells + 1, cells + 1), dtype=np.float32)
+    # La interpolación bilineal es separable: filas y columnas por producto de matrices
+    return _np_interpolation_weights(height, cells) @ grid @ _np_interpolation_weights(width, cells).T
+
+
+def _np_blob_mask(noise, threshold=0.6, softness=0.1, opacity=ABSTRACT_OPACITY):
+    """
+    Máscara ``L`` con manchas de borde suave donde el ruido supera ``threshold``.
+
+    La curva se evalúa en una tabla de 256 entradas y se indexa con el ruido
+    cuantizado, en lugar de operar en coma flotante sobre cada píxel.
+    """
+    t = np.clip((np.arange(256, dtype=np.float32) / 255 - threshold) / softness, 0, 1)
+    lut = (t * t * (3 - 2 * t) * opacity * 255 + 0.5).astype(np.uint8)
+    return Image.fromarray(lut[(noise * 255 + 0.5).astype(np.uint8)], 'L')
+
+
+def _np_mask(values):
+    """Array 0..1 a máscara ``L`` de Pillow."""
+    return Image.fromarray((values * 255 + 0.5).astype(np.uint8), 'L')
+
+
+def _np_render(kind, bg, secondary, accent, width, height):
+    image = Image.new('RGB', (width, height), hex_to_rgb(bg))
+    if kind == 'gradient':
+        layers = [(secondary, _np_mask(_np_diagonal_ramp(width, height)))]
+    elif kind == 'abstract':
+        seed = _seed(kind, bg, secondary, accent, width, height)
+        layers = [
+            (color, _np_blob_mask(_np_noise(width, height, seed + offset)))
+            for offset, color in enumerate((secondary, accent))
+        ]
+    else:
+        layers = []
+    # La mezcla por canal la hace Pillow en C sobre máscaras de 8 bits
+    for color, mask in layers:
+        image = Image.composite(Image.new('RGB', (width, height), hex_to_rgb(color)), image, mask)
+    return image
+
+
+# --- Pillow (sin NumPy) --------------------------------------------------
+
+def _pil_diagonal_ramp(width, height):
+    vertical = Image.linear_gradient('L')
+    horizontal = vertical.transpose(Image.Transpose.ROTATE_90)
+    return Image.blend(vertical, horizontal, 0.5).resize((width, height), Image.Resampling.BILINEAR)
+
+
+def _pil_blob_mask(width, height, seed, threshold=0.6, softness=0.1, opacity=ABSTRACT_OPACITY):
+    cells = NOISE_CELLS + 1
+    grid = Image.frombytes('L', (cells, cells), random.Random(seed).randbytes(cells * cells))
+    noise = grid.resize((width, height), Image.Resampling.BILINEAR)
+
+    def _curve(value):
+        t = min(1.0, max(0.0, (value / 255 - threshold) / softness))
+        return int(t * t * (3 - 2 * t) * opacity * 255 + 0.5)
+
+    return noise.point(_curve)
+
+
+def _pil_render(kind, bg, secondary, accent, width, height):
+    image = Image.new('RGB', (width, height), hex_to_rgb(bg))
+    if kind == 'gradient':
+        image = Image.composite(Image.new('RGB', (width, height), hex_to_rgb(secondary)), image, _pil_diagonal_ramp(width, height))
+    elif kind == 'abstract':
+        seed = _seed(kind, bg, secondary, accent, width, height)
+        for offset, color in enumerate((secondary, accent)):
+            layer = Image.new('RGB', (width, height), hex_to_rgb(color))
+            image = Image.composite(layer, image, _pil_blob_mask(width, height, seed + offset))
+    return image
+
+
+@lru_cache(maxsize=BACKGROUND_CACHE_SIZE)
+def _render_cached(kind, bg, secondary, accent, width, height):
+    render = _np_render if np is not None else _pil_render
+    return render(kind, bg, secondary, accent, width, height)
+
+
+def render_background(kind, bg, secondary, accent, width, height):
+    """
+    Fondo de ``width`` x ``height`` del tipo ``kind`` (solid, gradient o abstract).
+
+    Devuelve una copia de la imagen cacheada, así que se puede dibujar
+    encima sin alterar la caché.
+    """
+    if kind not in BACKGROUND_KINDS:
+        kind = 'gradient'
+    return _render_cached(kind, bg.lower(), secondary.lower(), accent.lower(), int(width), int(height)).copy()
+
+
+def clear_cache():
+    _render_cached.cache_clear()
@@ -2,9 +2,267 @@
 Gestor de prompts para IA - Permite crear, editar y usar prompts personalizados.
 """
 
+import logging
+import string
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from .models import AIPromptTemplate
 
+logger = logging.getLogger(__name__)
+
+# Clave compartida entre procesos para invalidar los registros locales
+PROMPT_REGISTRY_VERSION_KEY = 'prompt_templates:version'
+
+# Variables que cada tipo de prompt recibe al renderizarse
+PROMPT_VARIABLES = {
+    'content': frozenset(['content', 'urls']),
+    'tags': frozenset(['content']),
+    'image': frozenset(['title', 'keywords', 'style', 'size']),
+}
+
+
+class PromptTemplateError(ValueError):
+    """Error al compilar o renderizar un template de prompt."""
+
+    def __init__(self, message, missing=None):
+        super().__init__(message)
+        self.missing = sorted(missing or [])
+
+
+class CompiledPrompt:
+    """
+    Template de prompt precompilado.
+
+    Las variables se extraen una sola vez al compilar, así que renderizar solo
+    valida el diccionario recibido y llama a ``str.format_map``.
+    """
+
+    __slots__ = ('id', 'name', 'prompt_type', 'description', 'is_default', 'template', 'variables', 'error')
+
+    def __init__(self, template, id=None, name='', prompt_type='', description='', is_default=False):
+        self.id = id
+        self.name = name
+        self.prompt_type = prompt_type
+        self.description = description
+        self.is_default = is_default
+        self.template = template
+        self.error = None
+        try:
+            self.variables = self._parse_variables(template)
+        except PromptTemplateError as e:
+            self.variables = frozenset()
+            self.error = str(e)
+
+    @classmethod
+    def from_model(cls, instance):
+        return cls(
+            instance.template,
+            id=instance.id,
+            name=instance.name,
+            prompt_type=instance.prompt_type,
+            description=instance.description,
+            is_default=instance.is_default,
+        )
+
+    @staticmethod
+    def _parse_variables(template):
+        names = set()
+        try:
+            for _, field_name, _, _ in string.Formatter().parse(template):
+                if field_name is None:
+                    continue
+                root = field_name.split('.', 1)[0].split('[', 1)[0]
+                if not root or root.isdigit():
+                    raise PromptTemplateError(
+                        'Los templates no admiten variables posicionales como "{}" o "{0}"; '
+                        'para llaves literales usa "{{" y "}}"'
+                    )
+                names.add(root)
+        except ValueError as e:
+            if isinstance(e, PromptTemplateError):
+                raise
+            raise PromptTemplateError(f'Template mal formado: {e}. Para llaves literales usa "{{{{" y "}}}}"')
+        return frozenset(names)
+
+    @property
+    def is_valid(self):
+        return self.error is None
+
+    def missing_variables(self, variables):
+        """Devuelve las variables del template que no están en ``variables``."""
+        return self.variables.difference(variables)
+
+    def render(self, strict=True, **variables):
+        """
+        Renderiza el template con las variables dadas.
+
+        Args:
+            strict: Si es True, falta de variables lanza PromptTemplateError;
+                si es False, las variables ausentes se reemplazan por ''.
+            **variables: Valores de las variables; las que el template no usa
+                se ignoran.
+
+        Raises:
+            PromptTemplateError: Si el template es inválido o faltan variables.
+        """
+        if self.error:
+            raise PromptTemplateError(self.error)
+
+        missing = self.missing_variables(variables)
+        if missing and strict:
+            raise PromptTemplateError(
+                f"Variables no encontradas en el template: {', '.join(sorted(missing))}",
+                missing=missing
+            )
+
+        values = {name: variables.get(name, '') for name in self.variables}
+        return self.template.format_map(values)
+
+
+@lru_cache(maxsize=128)
+def compile_prompt(template: str) -> CompiledPrompt:
+    """
+    Compila un template suelto (por ejemplo, el de la vista previa).
+    """
+    return CompiledPrompt(template)
+
+
+class PromptTemplateRegistry:
+    """
+    Registro en memoria de los templates activos.
+
+    Carga todos los templates activos con una sola consulta y los mantiene
+    compilados por proceso. Al guardar o borrar un AIPromptTemplate se
+    invalida el registro local y se incrementa una versión en el caché
+    compartido, que los demás procesos comprueban cada
+    ``VERSION_CHECK_INTERVAL`` segundos.
+    """
+
+    VERSION_CHECK_INTERVAL = 5
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_id = None
+        self._by_type = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._fallbacks = {}
+
+    def _shared_version(self):
+        try:
+            return cache.get(PROMPT_REGISTRY_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión de prompts del caché: {e}")
+            return self._version
+
+    def _snapshot(self):
+        """Devuelve (por_id, por_tipo), recargando si el registro está obsoleto."""
+        now = time.monotonic()
+        by_id, by_type = self._by_id, self._by_type
+        if by_id is not None and now - self._checked_at < self.VERSION_CHECK_INTERVAL:
+            return by_id, by_type
+
+        with self._lock:
+            version = self._shared_version()
+            if self._by_id is None or version != self._version:
+                self._load()
+                self._version = version
+            self._checked_at = now
+            return self._by_id, self._by_type
+
+    def _load(self):
+        by_id = {}
+        by_type = defaultdict(list)
+        templates = AIPromptTemplate.objects.filter(is_active=True).order_by('-is_default', 'name')
+        for instance in templates:
+            compiled = CompiledPrompt.from_model(instance)
+            if compiled.error:
+                logger.warning(f"Template de prompt inválido '{instance.name}': {compiled.error}")
+            by_id[compiled.id] = compiled
+            by_type[compiled.prompt_type].append(compiled)
+
+        self._by_type = dict(by_type)
+        self._by_id = by_id
+        logger.debug(f"Registro de prompts cargado: {len(by_id)} templates activos")
+
+    def invalidate(self):
+        """Descarta el registro local y avisa al resto de procesos."""
+        with self._lock:
+            self._by_id = None
+            self._by_type = {}
+        try:
+            cache.set(PROMPT_REGISTRY_VERSION_KEY, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"No se pudo publicar la versión de prompts en el caché: {e}")
+
+    def get(self, prompt_id):
+        """Devuelve el template activo con ese ID o None."""
+        by_id, _ = self._snapshot()
+        return by_id.get(prompt_id)
+
+    def available(self, prompt_type):
+        """Templates activos de un tipo, el por defecto primero y luego por nombre."""
+        _, by_type = self._snapshot()
+        return list(by_type.get(prompt_type, []))
+
+    def default(self, prompt_type):
+        """Template por defecto de un tipo, o el prompt de fallback si no hay ninguno."""
+        for compiled in self.available(prompt_type):
+            if compiled.is_default:
+                return compiled
+
+        fallback = self._fallbacks.get(prompt_type)
+        if fallback is None:
+            fallback = CompiledPrompt(
+                PromptManager._get_fallback_prompt(prompt_type),
+                name=f"Fallback - {prompt_type}",
+                prompt_type=prompt_type,
+                is_default=True,
+            )
+            self._fallbacks[prompt_type] = fallback
+        return fallback
+
+    def render(self, prompt_type=None, prompt_id=None, strict=True, **variables):
+        """
+        Renderiza un template por ID o el por defecto de ``prompt_type``.
+
+        Si el ID no corresponde a un template activo se usa el por defecto.
+        """
+        compiled = self.get(prompt_id) if prompt_id is not None else None
+        if compiled is None:
+            if prompt_type is None:
+                raise PromptTemplateError(f"Template de prompt no encontrado: {prompt_id}")
+            compiled = self.default(prompt_type)
+        return compiled.render(strict=strict, **variables)
+
+
+prompt_registry = PromptTemplateRegistry()
+
+
+def _invalidate_prompt_registry(sender, **kwargs):
+    # Tras el commit: si se invalida antes, otro proceso (o este mismo)
+    # puede recargar el registro con los datos anteriores y quedarse con
+    # ellos hasta el siguiente cambio
+    transaction.on_commit(prompt_registry.invalidate)
+
+
+def connect_prompt_signals():
+    """
+    Conecta la invalidación del registro a los cambios de AIPromptTemplate.
+    Debe llamarse desde PostsConfig.ready().
+    """
+    post_save.connect(_invalidate_prompt_registry, sender=AIPromptTemplate,
+                      dispatch_uid='prompt_registry_invalidate_on_save')
+    post_delete.connect(_invalidate_prompt_registry, sender=AIPromptTemplate,
+                        dispatch_uid='prompt_registry_invalidate_on_delete')
+
 
 class PromptManager:
     """Gestor de prompts de IA."""
@@ -20,16 +278,23 @@ class PromptManager:
         Returns:
             Template del prompt por defecto
         """
-        try:
-            template = AIPromptTemplate.objects.get(
-                prompt_type=prompt_type,
-                is_default=True,
-                is_active=True
-            )
-            return template.template
-        except AIPromptTemplate.DoesNotExist:
-            # Fallback a prompts hardcodeados
-            return PromptManager._get_fallback_prompt(prompt_type)
+        return prompt_registry.default(prompt_type).template
+    
+    @staticmethod
+    def render_prompt(prompt_type: str, prompt_id: int = None, strict: bool = True, **variables) -> str:
+        """
+        Renderiza un prompt precompilado validando sus variables.
+        
+        Args:
+            prompt_type: Tipo de prompt a usar si no se indica ``prompt_id``
+            prompt_id: ID de un template concreto (opcional)
+            strict: Si es True, lanza PromptTemplateError si faltan variables
+            **variables: Valores para las variables del template
+            
+        Returns:
+            Prompt renderizado
+        """
+        return prompt_registry.render(prompt_type, prompt_id, strict=strict, **variables)
     
     @staticmethod
     def _get_fallback_prompt(prompt_type: str) -> str:
@@ -286,12 +551,9 @@ La imagen debe ser visualmente atractiva tanto en tamaño completo como en minia
             prompt_type: Tipo de prompt
             
         Returns:
-            Lista de templates disponibles
+            Lista de templates compilados (CompiledPrompt) disponibles
         """
-        return AIPromptTemplate.objects.filter(
-            prompt_type=prompt_type,
-            is_active=True
-        ).order_by('-is_default', 'name')
+        return prompt_registry.available(prompt_type)
     
     @staticmethod
     def create_prompt(name: str, prompt_type: str, template: str, user: User, 
@@ -356,6 +618,19 @@ La imagen debe ser visualmente atractiva tanto en tamaño completo como en minia
         template.save()  # El modelo se encarga de desactivar otros defaults
         return template
     
+    @staticmethod
+    def get_compiled_prompt(prompt_id: int) -> CompiledPrompt:
+        """
+        Obtiene un template activo ya compilado sin consultar la base de datos.
+        
+        Args:
+            prompt_id: ID del template
+            
+        Returns:
+            Template compilado o None si no existe o no está activo
+        """
+        return prompt_registry.get(prompt_id)
+    
     @staticmethod
     def get_prompt_by_id(prompt_id: int) -> AIPromptTemplate:
         """
@@ -389,9 +664,11 @@ La imagen debe ser visualmente atractiva tanto en tamaño completo como en minia
                     is_active=True
                 ).exclude(id=prompt_id)
                 
-                if other_templates.exists():
+                new_default = other_templates.first()
+                if new_default:
                     # Hacer que otro template sea el por defecto
-                    other_templates.first().update(is_default=True)
+                    new_default.is_default = True
+                    new_default.save(update_fields=['is_default', 'updated_at'])
                 else:
                     # No permitir eliminar el último template
                     return False
@@ -12,7 +12,7 @@ import json
 
 from .models import AIPromptTemplate
 from .forms import AIPromptTemplateForm, PromptPreviewForm
-from .prompt_manager import PromptManager, initialize_default_prompts
+from .prompt_manager import PromptManager, PromptTemplateError, compile_prompt, initialize_default_prompts
 
 
 def is_staff_or_superuser(user):
@@ -162,7 +162,7 @@ def prompt_preview_view(request):
             
             # Generar preview del prompt
             try:
-                preview = template.format(
+                preview = compile_prompt(template).render(
                     content=test_content,
                     title=test_title,
                     keywords=test_keywords,
@@ -176,10 +176,10 @@ def prompt_preview_view(request):
                     'preview': preview,
                     'success': True
                 }
-            except KeyError as e:
+            except PromptTemplateError as e:
                 context = {
                     'form': form,
-                    'error': f'Variable no encontrada en el template: {e}',
+                    'error': str(e),
                     'success': False
                 }
             except Exception as e:
@@ -0,0 +1,51 @@
+"""
+Storage de media que mantiene al día el catálogo de imágenes.
+"""
+
+import logging
+
+from django.core.files.storage import FileSystemStorage
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage que registra en ``MediaAsset`` cada imagen guardada o
+    borrada. Un fallo del catálogo nunca impide guardar el archivo; el
+    escáner lo corrige en la siguiente pasada. Al borrar una imagen se
+    borran también sus miniaturas.
+
+    Con ``MEDIA_HASHED_URLS`` las URLs llevan el hash del contenido
+    (``posts.media_serving``).
+    """
+
+    def url(self, name):
+        url = super().url(name)
+        if name:
+            from .media_serving import hashed_url, hashed_urls_enabled
+            if hashed_urls_enabled():
+                return hashed_url(name.replace('\\', '/'), url)
+        return url
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        try:
+            from .media_catalog import catalog_file
+            catalog_file(name)
+        except Exception as e:
+            logger.warning(f"No se pudo catalogar {name}: {e}")
+        return name
+
+    def delete(self, name):
+        try:
+            from .thumbnails import purge_thumbnails
+            purge_thumbnails(name.replace('\\', '/'))
+        except Exception as e:
+            logger.warning(f"No se pudieron borrar las miniaturas de {name}: {e}")
+        super().delete(name)
+        try:
+            from .media_catalog import forget_file
+            forget_file(name)
+        except Exception as e:
+            logger.warning(f"No se pudo quitar {name} del catálogo: {e}")
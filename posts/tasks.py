@@ -5,16 +5,22 @@ Tareas de Celery para la aplicación de posts.
 import logging
 import os
 import time
-from io import BytesIO
 from celery import shared_task
-from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.db.models import Count, F
 from django.utils import timezone
 from django.utils.text import slugify
-from PIL import Image, ImageOps
+from PIL import Image
 from .models import Post, Comment
 from .ai_generator import extract_content_from_url, rewrite_content_with_ai, generate_tags_with_ai, generate_complete_post
+from .html_extraction import parse_html, serialize_fragment
+from .image_pipeline import render_variants, save_image
+from .image_variants import generate_variants, register_variant
+from .media_catalog import scan_media
+from .media_dedup import collapse_duplicates
+from .media_gc import collect_orphans
+from .cover_backfill import backfill_covers
+from .uploads import process_upload
 
 logger = logging.getLogger('celery')
 
@@ -78,6 +84,11 @@ def generate_ai_content(self, prompt, user_id=None, post_id=None):
         self.retry(exc=e)
 
 
+def _rgb_or_rgba(img):
+    """Convierte a RGB las imágenes que no están en RGB/RGBA."""
+    return img if img.mode in ('RGB', 'RGBA') else img.convert('RGB')
+
+
 @shared_task(
     name='posts.tasks.optimize_images',
     bind=True,
@@ -107,53 +118,169 @@ def optimize_images(self, image_path, sizes=None, quality=85):
             logger.error(f"Imagen no encontrada: {image_path}")
             return {'error': 'Imagen no encontrada'}
         
-        # Abrir imagen
         with default_storage.open(image_path, 'rb') as f:
-            img = Image.open(f)
-            img_format = img.format
-            
-            # Convertir modo si es necesario
-            if img.mode not in ('RGB', 'RGBA'):
-                img = img.convert('RGB')
+            img_format = Image.open(f).format
+        
+        name, ext = os.path.splitext(image_path)
+        if img_format == 'JPEG' or ext.lower() in ('.jpg', '.jpeg'):
+            variant_format, save_options = 'jpeg', {'quality': quality, 'optimize': True}
+        elif img_format == 'PNG' or ext.lower() == '.png':
+            variant_format, save_options = 'png', {'optimize': True}
+        elif img_format == 'WEBP' or ext.lower() == '.webp':
+            variant_format, save_options = 'webp', {'quality': quality}
+        else:
+            # Formato por defecto
+            variant_format, save_options = 'jpeg', {'quality': quality, 'optimize': True}
+        
+        # Generar versiones optimizadas, de mayor a menor y cada una a partir de la anterior
+        results = {}
+        for size, resized_img in render_variants(image_path, sizes, prepare=_rgb_or_rgba):
+            size_suffix = f"{size[0]}x{size[1]}"
+            new_path = f"{name}_{size_suffix}{ext}"
             
-            # Generar versiones optimizadas
-            results = {}
+            saved_path, file_size = save_image(resized_img, new_path, variant_format.upper(), **save_options)
+            results[size_suffix] = saved_path
             
-            for size in sizes:
-                # Crear nombre para versión redimensionada
-                name, ext = os.path.splitext(image_path)
-                size_suffix = f"{size[0]}x{size[1]}"
-                new_path = f"{name}_{size_suffix}{ext}"
-                
-                # Redimensionar manteniendo proporción
-                resized_img = ImageOps.contain(img, size)
-                
-                # Guardar versión optimizada
-                buffer = BytesIO()
-                
-                if img_format == 'JPEG' or ext.lower() in ('.jpg', '.jpeg'):
-                    resized_img.save(buffer, format='JPEG', quality=quality, optimize=True)
-                elif img_format == 'PNG' or ext.lower() == '.png':
-                    resized_img.save(buffer, format='PNG', optimize=True)
-                elif img_format == 'WEBP' or ext.lower() == '.webp':
-                    resized_img.save(buffer, format='WEBP', quality=quality)
-                else:
-                    # Formato por defecto
-                    resized_img.save(buffer, format='JPEG', quality=quality, optimize=True)
-                
-                buffer.seek(0)
-                
-                # Guardar archivo
-                saved_path = default_storage.save(new_path, ContentFile(buffer.read()))
-                results[size_suffix] = saved_path
-            
-            logger.info(f"Imagen optimizada: {image_path} -> {len(results)} versiones")
-            return results
+            # Registrar la versión para que el srcset pueda usarla
+            register_variant(
+                image_path, saved_path, variant_format,
+                resized_img.width, resized_img.height, file_size
+            )
+        
+        logger.info(f"Imagen optimizada: {image_path} -> {len(results)} versiones")
+        return results
     except Exception as e:
         logger.error(f"Error al optimizar imagen: {str(e)}", exc_info=True)
         self.retry(exc=e)
 
 
+@shared_task(
+    name='posts.tasks.generate_image_variants',
+    bind=True,
+    max_retries=2,
+    queue='media_processing',
+)
+def generate_image_variants(self, image_path):
+    """
+    Genera las variantes responsivas (AVIF/WebP en varios anchos) de una imagen.
+    
+    Args:
+        image_path: Ruta de la imagen original en el storage
+    """
+    try:
+        if not default_storage.exists(image_path):
+            logger.error(f"Imagen no encontrada: {image_path}")
+            return {'error': 'Imagen no encontrada'}
+        
+        variants = generate_variants(image_path)
+        return {variant.path: f"{variant.format} {variant.width}w" for variant in variants}
+    except Exception as e:
+        logger.error(f"Error al generar variantes de {image_path}: {str(e)}", exc_info=True)
+        self.retry(exc=e)
+
+
+@shared_task(
+    name='posts.tasks.process_uploaded_image',
+    bind=True,
+    max_retries=2,
+    queue='media_processing',
+)
+def process_uploaded_image(self, image_path):
+    """
+    Reorienta y reduce una imagen subida desde el editor.
+    
+    Args:
+        image_path: Ruta de la imagen en el storage
+    """
+    try:
+        if not default_storage.exists(image_path):
+            logger.error(f"Imagen no encontrada: {image_path}")
+            return {'error': 'Imagen no encontrada'}
+        
+        return {'path': image_path, 'processed': process_upload(image_path)}
+    except Exception as e:
+        logger.error(f"Error al procesar la imagen subida {image_path}: {str(e)}", exc_info=True)
+        self.retry(exc=e)
+
+
+@shared_task(
+    name='posts.tasks.sync_media_catalog',
+    bind=True,
+    queue='media_processing',
+)
+def sync_media_catalog(self, full=False):
+    """
+    Reconcilia el catálogo de imágenes (MediaAsset) con MEDIA_ROOT.
+    
+    Args:
+        full: Volver a inspeccionar todas las imágenes aunque no cambien
+    """
+    try:
+        return scan_media(full=full).summary()
+    except Exception as e:
+        logger.error(f"Error al sincronizar el catálogo de media: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(
+    name='posts.tasks.dedupe_media',
+    bind=True,
+    queue='media_processing',
+)
+def dedupe_media(self, dry_run=False):
+    """
+    Unifica las imágenes duplicadas por contenido y reescribe sus referencias.
+    
+    Args:
+        dry_run: Solo calcular lo que se haría
+    """
+    try:
+        return collapse_duplicates(dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Error al deduplicar la media: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(
+    name='posts.tasks.collect_orphan_media',
+    bind=True,
+    queue='media_processing',
+)
+def collect_orphan_media(self, dry_run=False):
+    """
+    Mueve a cuarentena las imágenes que ningún post ni perfil referencia.
+    
+    Args:
+        dry_run: Solo calcular lo que se haría
+    """
+    try:
+        return collect_orphans(dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Error al recolectar la media huérfana: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(
+    name='posts.tasks.backfill_cover_images',
+    bind=True,
+    queue='ai_processing',
+)
+def backfill_cover_images(self, limit=None, offline=False, workers=2):
+    """
+    Genera portadas para los posts publicados sin imagen de cabecera.
+    
+    Args:
+        limit: Máximo de posts a procesar
+        offline: Usar solo el servicio placeholder
+        workers: Hilos concurrentes
+    """
+    try:
+        return backfill_covers(limit=limit, offline=offline, workers=workers).summary()
+    except Exception as e:
+        logger.error(f"Error al generar portadas: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
 @shared_task(
     name='posts.tasks.update_post_stats',
     bind=True,
@@ -193,9 +320,7 @@ def process_post_content(self, post_id):
         post = Post.objects.get(id=post_id)
         
         # Procesar contenido HTML
-        from bs4 import BeautifulSoup
-        
-        soup = BeautifulSoup(post.content, 'html.parser')
+        soup = parse_html(post.content)
         
         # Procesar imágenes
         images = soup.find_all('img')
@@ -214,7 +339,7 @@ def process_post_content(self, post_id):
                     img['decoding'] = 'async'
         
         # Actualizar contenido procesado
-        post.content = str(soup)
+        post.content = serialize_fragment(soup)
         post.save(update_fields=['content'])
         
         logger.info(f"Contenido de post procesado: post_id={post_id}, imágenes={len(images)}")
@@ -0,0 +1,59 @@
+"""
+Template tags para imágenes responsivas.
+
+Uso::
+
+    {% load image_tags %}
+    {% responsive_image post.header_image sizes="100vw" alt="..." class="..." %}
+"""
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from posts.image_variants import MIME_TYPES, MODERN_FORMATS, build_srcset, get_variants
+
+register = template.Library()
+
+DEFAULT_SIZES = '100vw'
+
+
+@register.simple_tag
+def responsive_image(image, sizes=DEFAULT_SIZES, **attrs):
+    """
+    Emite un ``<picture>`` con un ``<source>`` por formato moderno registrado.
+
+    El ``<img>`` conserva la imagen original como ``src`` y, si existen
+    variantes en el formato original, las añade como ``srcset``. Sin
+    variantes registradas se emite un ``<img>`` normal.
+
+    Args:
+        image: ImageFieldFile (por ejemplo ``post.header_image``)
+        sizes: Valor del atributo ``sizes``
+        **attrs: Atributos extra del ``<img>`` (``alt``, ``class``, ``loading``...)
+    """
+    if not image:
+        return ''
+
+    variants = get_variants(image.name)
+    img_attrs = {'src': image.url, **attrs}
+
+    fallback = variants.get('jpeg') or variants.get('png')
+    if fallback:
+        img_attrs['srcset'] = build_srcset(fallback)
+        img_attrs['sizes'] = sizes
+
+    img_tag = format_html('<img{}>', flatatt(img_attrs))
+
+    sources = [
+        (MIME_TYPES[fmt], build_srcset(variants[fmt]), sizes)
+        for fmt in MODERN_FORMATS if variants.get(fmt)
+    ]
+    if not sources:
+        return img_tag
+
+    return format_html(
+        '<picture style="display: contents">{}{}</picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', sources),
+        img_tag,
+    )
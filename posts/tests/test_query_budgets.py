@@ -0,0 +1,44 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from blog.query_budgets import KNOWN_GROWTH, assert_query_budgets, load_budgets, save_budgets
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Las vistas más visitadas no superan su presupuesto de consultas
+    (``query_budgets.json``) con ninguno de los tamaños de datos, y las que
+    crecen con los datos fallan salvo que estén en ``KNOWN_GROWTH``.
+    """
+
+    views = ['post_list', 'post_detail', 'tag_page', 'api_posts']
+
+    def test_views_within_budget(self):
+        results = assert_query_budgets(self.views)
+        self.assertEqual([result['view'] for result in results], self.views)
+
+    def test_budget_exceeded(self):
+        budgets = load_budgets()
+        budgets['post_list']['large']['max_queries'] -= 1
+
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        save_budgets(budgets, path)
+
+        with self.settings(QUERY_BUDGET_FILE=path):
+            with self.assertRaisesMessage(AssertionError, 'post_list: 13 consultas con large'):
+                assert_query_budgets(['post_list'])
+
+    def test_growing_view_fails(self):
+        # tag_popular hace una consulta por etiqueta: sin la excepción, falla
+        with mock.patch.dict(KNOWN_GROWTH, clear=True):
+            with self.assertRaises(AssertionError) as raised:
+                assert_query_budgets(['tag_popular'])
+        message = str(raised.exception)
+        self.assertIn('tag_popular: las consultas crecen con los datos: 11 → 21', message)
+        self.assertIn('Huellas que crecen de small a large:', message)
+        self.assertIn(' 10 → 20  SELECT … FROM "taggit_tag" WHERE "taggit_tag"."id" = ?', message)
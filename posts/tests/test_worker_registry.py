@@ -0,0 +1,98 @@
+import contextlib
+import threading
+import time
+from unittest import mock
+
+import fakeredis
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from django_redis.cache import RedisCache
+
+from blog import profiler
+from blog.rate_limit_engine import redis_client_for
+from blog.worker_registry import WorkerRegistry
+
+REDIS_CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://worker-registry-tests:6379/0',
+        'OPTIONS': {'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeConnection}},
+    }
+}
+
+WORKERS = 16
+
+
+def run_concurrently(target, count=WORKERS):
+    """
+    Lanza ``target(i)`` en ``count`` hilos que arrancan a la vez.
+
+    Cada ``cache.get`` tarda un poco más, así que un registro que lea,
+    modifique y vuelva a escribir el conjunto pierde altas con seguridad.
+    """
+    barrier = threading.Barrier(count)
+    original_get = RedisCache.get
+
+    def slow_get(self, *args, **kwargs):
+        value = original_get(self, *args, **kwargs)
+        time.sleep(0.05)
+        return value
+
+    def run(i):
+        barrier.wait()
+        target(i)
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"worker-{i}") for i in range(count)]
+    with mock.patch.object(RedisCache, 'get', slow_get):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+@override_settings(CACHES=REDIS_CACHES)
+class WorkerRegistryTests(SimpleTestCase):
+    """
+    Con Redis los workers se apuntan con ``SADD``: varios registrándose a la
+    vez no se pisan.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_uses_redis_set(self):
+        registry = WorkerRegistry('tests:workers', 'tests:result:', 60)
+        self.assertIsNotNone(redis_client_for(registry.cache))
+
+    def test_concurrent_registration(self):
+        # Un registro por hilo, como procesos distintos: sin lock compartido
+        run_concurrently(lambda i: WorkerRegistry('tests:workers', 'tests:result:', 60).register(f"worker-{i}"))
+
+        registry = WorkerRegistry('tests:workers', 'tests:result:', 60)
+        self.assertEqual(registry.workers(), {f"worker-{i}" for i in range(WORKERS)})
+
+
+@override_settings(CACHES=REDIS_CACHES)
+class ProfilerRegistryTests(SimpleTestCase):
+    """
+    ``merged_stacks`` suma las pilas de todos los workers que publican a la vez.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def test_merged_stacks_sees_every_worker(self):
+        def flush(i):
+            sampler = profiler.SamplingProfiler()
+            sampler.started_at = 1.0
+            sampler.collapsed = lambda: {'views:index': i + 1}
+            sampler.flush()
+
+        # worker_id por hilo y sin el lock del proceso, como workers distintos
+        with mock.patch.object(profiler, 'worker_id', lambda: threading.current_thread().name), \
+                mock.patch.object(profiler.registry, '_lock', contextlib.nullcontext()):
+            run_concurrently(flush)
+
+        self.assertEqual(len(profiler.worker_results()), WORKERS)
+        self.assertEqual(profiler.merged_stacks()['views:index'], sum(range(1, WORKERS + 1)))
@@ -0,0 +1,278 @@
+"""
+Miniaturas bajo demanda para las imágenes de media.
+
+La primera petición a ``/media/thumbs/<ancho>x<alto>/<ruta>`` genera la
+miniatura y la guarda en una caché en disco direccionada por contenido
+(ruta, tamaño y fecha del original más las dimensiones pedidas); las
+siguientes peticiones sirven el archivo ya generado.
+
+Las miniaturas de un original borrado o reemplazado se eliminan al
+borrarlo (``purge_thumbnails``), y ``collect_orphan_media`` retira las que
+ya no corresponden a ninguna imagen del catálogo (``purge_stale_thumbnails``).
+
+La decodificación usa ``draft()`` (escalado DCT de JPEG) y ``reduce()``
+antes del redimensionado final, y corre en un pool acotado de hilos para
+que una ráfaga de peticiones no agote la memoria del worker.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils._os import safe_join
+from PIL import Image, ImageOps
+
+from .models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Cambiar si cambia el algoritmo para invalidar la caché existente
+THUMBNAIL_VERSION = 1
+
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+THUMBNAIL_QUALITY = 80
+
+# Formatos que Pillow puede decodificar; el resto se sirve sin miniatura
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp')
+
+# Tiempo máximo que una petición espera a su miniatura
+RENDER_TIMEOUT = 15
+
+# Peticiones en cola permitidas por cada hilo del pool
+QUEUE_PER_WORKER = 4
+
+# Tamaño de las miniaturas de la galería y del selector (debe estar en THUMBNAIL_SIZES)
+GALLERY_THUMBNAIL_SIZE = (300, 300)
+
+
+class ThumbnailError(Exception):
+    """Error base de las miniaturas."""
+
+
+class ThumbnailNotFound(ThumbnailError):
+    """La imagen original no existe o no admite miniatura."""
+
+
+class ThumbnailBusy(ThumbnailError):
+    """El pool está saturado; el cliente debe reintentar."""
+
+
+def allowed_sizes():
+    return {tuple(size) for size in getattr(settings, 'THUMBNAIL_SIZES', [(300, 300)])}
+
+
+def supports_thumbnail(path):
+    return os.path.splitext(path)[1].lower() in THUMBNAIL_EXTENSIONS
+
+
+def thumbnail_url(path, width=300, height=300):
+    """
+    URL de la miniatura de ``path``; la URL original si no admite miniatura.
+    """
+    if not path or not supports_thumbnail(path):
+        return default_storage.url(path)
+    return reverse('media_thumbnail', kwargs={'width': width, 'height': height, 'path': path})
+
+
+def _cache_root():
+    return str(getattr(settings, 'THUMBNAIL_CACHE_ROOT', os.path.join(settings.MEDIA_ROOT, 'cache', 'thumbs')))
+
+
+def cache_key(path, stat, width, height):
+    """
+    Clave de la miniatura: cambia si cambia el original o las dimensiones.
+    """
+    return _key(path, stat.st_size, stat.st_mtime_ns, width, height)
+
+
+def _key(path, size, mtime_ns, width, height):
+    fingerprint = f"{path}|{size}|{mtime_ns}|{width}x{height}|v{THUMBNAIL_VERSION}"
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+
+def cache_path_for(key):
+    return os.path.join(_cache_root(), key[:2], f"{key}.webp")
+
+
+def render_thumbnail(source, target, width, height):
+    """
+    Genera la miniatura de ``source`` en ``target`` (escritura atómica).
+    """
+    with Image.open(source) as img:
+        # JPEG: decodificar directamente a 1/2, 1/4 o 1/8 de la resolución
+        box = max(width, height)
+        img.draft('RGB', (box, box))
+        img = ImageOps.exif_transpose(img)
+
+        # Reducción entera barata dejando margen 2x para el filtro final
+        factor = min(img.width // width, img.height // height) // 2
+        if factor > 1:
+            img = img.reduce(factor)
+
+        img = ImageOps.contain(img, (width, height), Image.Resampling.LANCZOS)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.thumb-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                img.save(f, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class ThumbnailPool:
+    """
+    Pool acotado de generación de miniaturas.
+
+    Las peticiones simultáneas de la misma miniatura comparten un único
+    trabajo, y si hay más trabajos pendientes que ``max_pending`` las nuevas
+    peticiones se rechazan con ``ThumbnailBusy`` en lugar de encolarse.
+    """
+
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self.max_pending = self.workers * QUEUE_PER_WORKER
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnails')
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def submit(self, key, source, target, width, height):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if len(self._inflight) >= self.max_pending:
+                    raise ThumbnailBusy('Demasiadas miniaturas en cola')
+                future = self._executor.submit(render_thumbnail, source, target, width, height)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _f: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThumbnailPool(getattr(settings, 'THUMBNAIL_WORKERS', 2))
+    return _pool
+
+
+def get_thumbnail(path, width, height):
+    """
+    Devuelve la ruta absoluta de la miniatura, generándola si no existe.
+
+    Raises:
+        ThumbnailNotFound: Si el original no existe o la ruta no es válida
+        ThumbnailBusy: Si el pool está saturado o la generación tarda demasiado
+    """
+    if not supports_thumbnail(path):
+        raise ThumbnailNotFound(path)
+    try:
+        source = safe_join(str(settings.MEDIA_ROOT), path)
+        stat = os.stat(source)
+    except (SuspiciousFileOperation, OSError):
+        raise ThumbnailNotFound(path)
+
+    key = cache_key(path, stat, width, height)
+    target = cache_path_for(key)
+    if os.path.exists(target):
+        return target
+
+    future = get_pool().submit(key, source, target, width, height)
+    try:
+        future.result(timeout=RENDER_TIMEOUT)
+    except FutureTimeoutError:
+        raise ThumbnailBusy(f'Miniatura en proceso: {path}')
+    except (OSError, Image.DecompressionBombError, ValueError) as e:
+        logger.warning(f"No se pudo generar la miniatura de {path}: {e}")
+        raise ThumbnailNotFound(path)
+    return target
+
+
+def purge_thumbnails(path):
+    """
+    Borra las miniaturas generadas de la versión actual de ``path``.
+
+    Hay que llamarla antes de borrar o reemplazar el original: la clave
+    depende de su tamaño y fecha.
+
+    Returns:
+        int: Miniaturas borradas
+    """
+    try:
+        stat = os.stat(safe_join(str(settings.MEDIA_ROOT), path))
+    except (SuspiciousFileOperation, OSError):
+        return 0
+
+    purged = 0
+    for width, height in allowed_sizes():
+        try:
+            os.unlink(cache_path_for(cache_key(path, stat, width, height)))
+            purged += 1
+        except FileNotFoundError:
+            pass
+    return purged
+
+
+def purge_stale_thumbnails(min_age_seconds):
+    """
+    Borra las miniaturas de la caché que no corresponden a la versión
+    actual de ninguna imagen del catálogo (originales borrados, movidos a
+    cuarentena o reemplazados fuera del storage).
+
+    Las miniaturas de imágenes fuera del catálogo no se pueden distinguir:
+    se borran si tienen más de ``min_age_seconds`` y se regeneran con la
+    siguiente petición.
+
+    Returns:
+        int: Miniaturas borradas
+    """
+    root = _cache_root()
+    if not os.path.isdir(root):
+        return 0
+
+    sizes = allowed_sizes()
+    current = set()
+    for path, size, mtime_ns in MediaAsset.objects.values_list('path', 'size_bytes', 'mtime_ns').iterator(chunk_size=2000):
+        current.update(_key(path, size, mtime_ns, width, height) for width, height in sizes)
+
+    cutoff = time.time() - min_age_seconds
+    purged = 0
+    for directory in os.scandir(root):
+        if not directory.is_dir():
+            continue
+        for entry in os.scandir(directory.path):
+            key, ext = os.path.splitext(entry.name)
+            if ext != '.webp' or key in current:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    purged += 1
+            except FileNotFoundError:
+                pass
+    return purged
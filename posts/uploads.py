@@ -0,0 +1,165 @@
+"""
+Subida de imágenes del editor en streaming.
+
+La validación ocurre mientras llega el cuerpo de la petición
+(``blog.file_utils.StreamingImageUploadHandler``): formato por bytes
+mágicos y tamaño máximo. Una vez recibido el archivo se comprueban las
+dimensiones y la integridad con una decodificación ``draft``, se guarda el
+original y la respuesta sale en ese momento. El reencuadre (orientación
+EXIF) y la reducción de imágenes enormes se hacen después en la cola de
+media con ``process_upload``.
+"""
+
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from blog.file_utils import IMAGE_HEADER_SIZE, inspect_image, install_image_upload_handler, sniff_image_type
+
+from .media_catalog import catalog_file
+from .media_dedup import save_deduplicated
+from .thumbnails import purge_thumbnails
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_SIZE = 5 * 1024 * 1024  # 5MB
+
+UPLOAD_ALLOWED_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif')
+
+# Las imágenes más grandes se reducen en segundo plano a este tamaño
+UPLOAD_MAX_DIMENSIONS = (2048, 2048)
+
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+}
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+    'AVIF': {'quality': 60},
+}
+
+
+def install_upload_handler(request, allowed_types=UPLOAD_ALLOWED_TYPES):
+    """
+    Activa la validación en streaming del campo ``upload`` de la petición.
+    """
+    return install_image_upload_handler(
+        request, field_name='upload', max_size=UPLOAD_MAX_SIZE, allowed_types=allowed_types,
+    )
+
+
+def validate_upload(uploaded_file, handler=None, allowed_types=UPLOAD_ALLOWED_TYPES):
+    """
+    Completa la validación de un archivo ya recibido.
+
+    Returns:
+        tuple: (tipo MIME, mensaje de error o None)
+    """
+    if handler is not None and handler.error:
+        return None, handler.error
+
+    if handler is not None and handler.detected_type:
+        mime_type = handler.detected_type
+    else:
+        # El handler no se pudo instalar: comprobar tamaño y formato ahora
+        if uploaded_file.size > UPLOAD_MAX_SIZE:
+            return None, f"El archivo es demasiado grande. Máximo permitido: {UPLOAD_MAX_SIZE // (1024 * 1024)}MB"
+        uploaded_file.seek(0)
+        mime_type = sniff_image_type(uploaded_file.read(IMAGE_HEADER_SIZE))
+        uploaded_file.seek(0)
+        if mime_type not in allowed_types:
+            return None, "El contenido del archivo no es una imagen permitida"
+
+    is_valid, error_message, _ = inspect_image(uploaded_file)
+    if not is_valid:
+        return None, error_message
+    return mime_type, None
+
+
+def store_upload(uploaded_file, folder, mime_type, stem):
+    """
+    Guarda el original y encola su procesado.
+
+    La extensión se toma del formato detectado, no del nombre enviado.
+
+    Returns:
+        str: Ruta guardada (o la de un duplicado existente)
+    """
+    file_path = f"{folder}/{stem}{EXTENSIONS.get(mime_type, '.jpg')}"
+    saved_path = save_deduplicated(file_path, uploaded_file)
+    if saved_path == file_path:
+        schedule_upload_processing(saved_path)
+    return saved_path
+
+
+def schedule_upload_processing(path):
+    """
+    Encola ``process_upload`` cuando termine la transacción actual.
+    """
+    from .tasks import process_uploaded_image
+
+    def _enqueue():
+        try:
+            process_uploaded_image.delay(path)
+        except Exception as e:
+            # Sin broker el original se sirve tal cual
+            logger.warning(f"No se pudo encolar el procesado de {path}: {e}")
+
+    transaction.on_commit(_enqueue)
+
+
+def process_upload(path):
+    """
+    Aplica la orientación EXIF y reduce a ``UPLOAD_MAX_DIMENSIONS`` una
+    imagen subida, reescribiéndola en el mismo sitio.
+
+    Las imágenes que no lo necesitan (y los GIF, que pueden ser animados)
+    no se tocan, así conservan su hash y siguen sirviendo para deduplicar.
+
+    Returns:
+        bool: Si la imagen se reescribió
+    """
+    full_path = os.path.join(str(settings.MEDIA_ROOT), path)
+    with Image.open(full_path) as img:
+        if img.format not in SAVE_OPTIONS:
+            return False
+
+        oriented = img.getexif().get(0x0112, 1) not in (0, 1)
+        oversized = img.width > UPLOAD_MAX_DIMENSIONS[0] or img.height > UPLOAD_MAX_DIMENSIONS[1]
+        if not oriented and not oversized:
+            return False
+
+        img_format = img.format
+        if oversized:
+            img.draft('RGB', UPLOAD_MAX_DIMENSIONS)
+        processed = ImageOps.exif_transpose(img)
+        if oversized:
+            processed = ImageOps.contain(processed, UPLOAD_MAX_DIMENSIONS, Image.Resampling.LANCZOS)
+        if img_format == 'JPEG' and processed.mode != 'RGB':
+            processed = processed.convert('RGB')
+
+        directory = os.path.dirname(full_path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                processed.save(f, format=img_format, **SAVE_OPTIONS[img_format])
+            purge_thumbnails(path)
+            os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    catalog_file(path)
+    logger.info(f"Imagen subida procesada: {path} ({processed.width}x{processed.height})")
+    return True
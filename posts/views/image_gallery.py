@@ -5,7 +5,6 @@ Vista para la galería de administración de imágenes.
 import os
 import json
 import logging
-from datetime import datetime
 from django.shortcuts import render, redirect
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
@@ -15,7 +14,11 @@ from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
 from django.db.models import Q
+from django.utils import timezone
+from ..media_catalog import catalog_file
 from ..media_image_selector import MediaImageSelector
+from ..media_serving import resolve_media_path
+from ..models import MediaAsset
 from ..utils import safe_get_image_url, validate_image_file
 
 logger = logging.getLogger(__name__)
@@ -32,19 +35,12 @@ def image_gallery_view(request):
     page = request.GET.get('page', 1)
     
     try:
-        # Obtener todas las imágenes de media
-        if search_query:
-            images = MediaImageSelector.search_images(search_query, folder_filter or None)
-        else:
-            images = MediaImageSelector.get_all_media_images(folder_filter or None)
-        
-        # Aplicar ordenamiento
-        if sort_by == 'name':
-            images.sort(key=lambda x: x['filename'].lower())
-        elif sort_by == 'size':
-            images.sort(key=lambda x: x.get('size_bytes', 0), reverse=True)
-        else:  # date (default)
-            images.sort(key=lambda x: x.get('modified_time', 0), reverse=True)
+        # Consultar el catálogo de media (filtrado, orden y paginación en la BD)
+        images = MediaImageSelector.query_images(
+            folder=folder_filter or None,
+            search=search_query or None,
+            sort=sort_by,
+        )
         
         # Paginación
         paginator = Paginator(images, 24)  # 24 imágenes por página
@@ -52,10 +48,7 @@ def image_gallery_view(request):
         
         # Obtener estadísticas
         stats = MediaImageSelector.get_image_stats()
-        
-        # Obtener estructura de carpetas
-        folder_structure = MediaImageSelector.get_folder_structure()
-        folders = list(folder_structure.keys())
+        folders = list(stats['by_folder'].keys())
         
         context = {
             'images': page_obj,
@@ -64,7 +57,7 @@ def image_gallery_view(request):
             'current_folder': folder_filter,
             'search_query': search_query,
             'sort_by': sort_by,
-            'total_images': len(images),
+            'total_images': paginator.count,
         }
         
         return render(request, 'admin/posts/image_gallery.html', context)
@@ -213,48 +206,27 @@ def image_details_ajax(request, image_path):
         import urllib.parse
         image_path = urllib.parse.unquote(image_path)
         
-        if not default_storage.exists(image_path):
+        # Los datos salen del catálogo; solo se lee el archivo si aún no está catalogado
+        asset = MediaAsset.objects.filter(path=image_path).first()
+        if asset is None and resolve_media_path(image_path):
+            asset = catalog_file(image_path)
+        if asset is None:
             return JsonResponse({
                 'success': False,
                 'error': 'La imagen no existe'
             })
         
-        # Obtener información detallada
-        try:
-            file_stats = default_storage.get_created_time(image_path)
-            modified_time = file_stats.timestamp() if file_stats else 0
-            created_date = datetime.fromtimestamp(modified_time).strftime('%d/%m/%Y %H:%M:%S')
-        except:
-            created_date = "No disponible"
-        
-        try:
-            file_size = default_storage.size(image_path)
-            size_mb = round(file_size / (1024 * 1024), 2)
-        except:
-            file_size = 0
-            size_mb = 0
-        
-        # Obtener dimensiones si es posible
-        try:
-            from PIL import Image
-            with default_storage.open(image_path, 'rb') as f:
-                with Image.open(f) as img:
-                    width, height = img.size
-                    dimensions = f"{width}x{height}"
-        except:
-            dimensions = "No disponible"
-        
         return JsonResponse({
             'success': True,
             'details': {
-                'filename': os.path.basename(image_path),
-                'path': image_path,
-                'url': default_storage.url(image_path),
-                'folder': os.path.dirname(image_path),
-                'size_bytes': file_size,
-                'size_mb': size_mb,
-                'dimensions': dimensions,
-                'created_date': created_date,
+                'filename': asset.filename,
+                'path': asset.path,
+                'url': asset.url,
+                'folder': asset.folder,
+                'size_bytes': asset.size_bytes,
+                'size_mb': asset.size_mb,
+                'dimensions': asset.dimensions if asset.width and asset.height else "No disponible",
+                'created_date': timezone.localtime(asset.modified_at).strftime('%d/%m/%Y %H:%M:%S'),
             }
         })
         
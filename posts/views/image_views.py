@@ -11,6 +11,7 @@ from django.core.paginator import Paginator
 from django.contrib import messages
 
 from ..image_generation import ImageSelector
+from ..models import MediaAsset
 import logging
 
 logger = logging.getLogger(__name__)
@@ -196,28 +197,29 @@ def image_preview(request, image_path):
     Vista para previsualizar una imagen específica.
     """
     try:
-        # Validar que la imagen existe y es válida
-        is_valid, error = ImageSelector.validate_image_selection(image_path)
-        
-        if not is_valid:
+        # Validar contra el catálogo, sin abrir el archivo ni recorrer carpetas
+        asset = MediaAsset.objects.filter(path=image_path).first()
+        if asset is None:
             return JsonResponse({
                 'success': False,
-                'error': error
+                'error': 'Imagen no encontrada'
             })
         
-        # Obtener información de la imagen
-        images = ImageSelector.get_available_images()
-        image_info = next((img for img in images if img['path'] == image_path), None)
+        if not any(image_path.startswith(folder) for folder in ImageSelector.AI_POSTS_FOLDERS):
+            return JsonResponse({
+                'success': False,
+                'error': 'Image must be from ai_posts folder'
+            })
         
-        if not image_info:
+        if not ImageSelector._is_suitable_for_cover(asset.width, asset.height):
             return JsonResponse({
                 'success': False,
-                'error': 'Imagen no encontrada'
+                'error': f"Image dimensions ({asset.width}x{asset.height}) not suitable for cover"
             })
         
         return JsonResponse({
             'success': True,
-            'image': image_info
+            'image': asset.as_dict()
         })
         
     except Exception as e:
@@ -5,7 +5,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from blog.decorators import ajax_required
 from django_ckeditor_5 import views as ckeditor_views
 from blog.ratelimit import (
@@ -13,6 +13,7 @@ from blog.ratelimit import (
     api_rate_limit as sensitive_rate_limit, login_rate_limit as auth_rate_limit
 )
 from blog.ratelimit import get_client_ip
+from blog.tracing import span
 import logging
 
 logger = logging.getLogger('django.security')
@@ -27,6 +28,8 @@ from django.views.generic.dates import ArchiveIndexView
 from django.utils import timezone
 from django.db import models
 from ..models import Post, Comment
+from ..media_dedup import save_deduplicated
+from ..uploads import install_upload_handler, store_upload, validate_upload
 from ..forms import CommentForm, PostForm, AiPostGeneratorForm
 from taggit.models import Tag
 from accounts.models import Notification
@@ -46,14 +49,30 @@ from django.core.files.storage import default_storage
 
 
 
+EDITOR_UPLOAD_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+
+@csrf_exempt
 @login_required
 def upload_image_view(request):
     """
     Vista para manejar la subida de imágenes desde CKEditor con seguridad avanzada.
+    
+    El handler de subida en streaming tiene que instalarse antes de que se
+    lea el cuerpo, así que la comprobación CSRF se hace en ``_upload_image``.
     """
-    if request.method == 'POST' and request.FILES.get('upload'):
-        uploaded_file = request.FILES['upload']
-        
+    handler = install_upload_handler(request, EDITOR_UPLOAD_TYPES) if request.method == 'POST' else None
+    return _upload_image(request, handler)
+
+
+@csrf_protect
+def _upload_image(request, handler):
+    # Leer request.FILES procesa el cuerpo a través del handler
+    uploaded_file = request.FILES.get('upload') if request.method == 'POST' else None
+    if handler is not None and handler.error:
+        return JsonResponse({'error': {'message': handler.error}}, status=400)
+    
+    if uploaded_file:
         try:
             # Registrar intento de subida
             ip = get_client_ip(request)
@@ -90,8 +109,13 @@ def upload_image_view(request):
                     'error': {'message': f'Tipo de contenido no válido: {uploaded_file.content_type}'}
                 }, status=400)
             
+            # Formato real, dimensiones e integridad (decodificación draft)
+            mime_type, error_message = validate_upload(uploaded_file, handler, EDITOR_UPLOAD_TYPES)
+            if error_message:
+                return JsonResponse({'error': {'message': error_message}}, status=400)
+            
             # Usar guardado simple y seguro
-            return simple_save_image(uploaded_file)
+            return simple_save_image(uploaded_file, mime_type)
                 
         except Exception as e:
             logger.error(f"Error en upload_image_view: {e}", exc_info=True)
@@ -102,13 +126,15 @@ def upload_image_view(request):
     return JsonResponse({'error': {'message': 'Petición no válida.'}}, status=400)
 
 
-def simple_save_image(uploaded_file):
+def simple_save_image(uploaded_file, mime_type):
     """
     Función para guardar imágenes de forma simple y segura.
+    
+    El original se guarda tal cual y la respuesta sale inmediatamente; el
+    procesado de la imagen se encola en la cola de media.
     """
     try:
         import uuid
-        import os
         from django.core.files.storage import default_storage
         
         # Validaciones adicionales
@@ -123,19 +149,8 @@ def simple_save_image(uploaded_file):
                 'error': {'message': 'El archivo está vacío'}
             }, status=400)
         
-        # Generar nombre único
-        file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-        if not file_extension:
-            file_extension = '.jpg'  # Extensión por defecto
-            
-        safe_filename = f"{uuid.uuid4().hex}{file_extension}"
-        
-        # Crear directorio si no existe
-        upload_dir = "uploads/posts_content"
-        
-        # Guardar archivo
-        file_path = f"{upload_dir}/{safe_filename}"
-        saved_path = default_storage.save(file_path, uploaded_file)
+        # Guardar archivo con nombre único y la extensión del formato detectado
+        saved_path = store_upload(uploaded_file, "uploads/posts_content", mime_type, uuid.uuid4().hex)
         
         # Obtener URL completa
         file_url = default_storage.url(saved_path)
@@ -159,10 +174,15 @@ def custom_upload_file(request):
     """
     Vista personalizada para subida de imágenes en CKEditor5.
     """
+    handler = install_upload_handler(request) if request.method == 'POST' else None
+    
     # Log de debug para la solicitud
     logger.info(f"Solicitud de subida de imagen: método={request.method}, usuario={request.user.username}")
     logger.info(f"Archivos en request: {list(request.FILES.keys())}")
     
+    if handler is not None and handler.error:
+        return JsonResponse({'error': {'message': handler.error}}, status=400)
+    
     if request.method == 'POST' and request.FILES.get('upload'):
         uploaded_file = request.FILES['upload']
         
@@ -203,20 +223,15 @@ def custom_upload_file(request):
                     }
                 }, status=400)
             
-            # Crear directorio si no existe
-            import os
-            upload_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
-            os.makedirs(upload_dir, exist_ok=True)
+            # Formato real, dimensiones e integridad (decodificación draft)
+            mime_type, error_message = validate_upload(uploaded_file, handler)
+            if error_message:
+                logger.warning(f"Imagen rechazada: {error_message}")
+                return JsonResponse({'error': {'message': error_message}}, status=400)
             
-            # Generar nombre único
+            # Guardar el original; el procesado se hace en la cola de media
             import uuid
-            safe_filename = f"{uuid.uuid4().hex}.{file_extension}"
-            
-            # Guardar archivo
-            file_path = f"uploads/{safe_filename}"
-            logger.info(f"Intentando guardar archivo en: {file_path}")
-            
-            saved_path = default_storage.save(file_path, uploaded_file)
+            saved_path = store_upload(uploaded_file, "uploads", mime_type, uuid.uuid4().hex)
             logger.info(f"Archivo guardado en: {saved_path}")
             
             # Obtener URL completa
@@ -263,18 +278,19 @@ class PostListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get the IDs of the most recent posts that have tags
-        tagged_posts = Post.optimized.published().filter(tags__isnull=False).order_by('-created_at')
-        # Get the tags from those posts, preserving order and uniqueness
-        tag_ids = []
-        for post in tagged_posts:
-            for tag in post.tags.all():
-                if tag.id not in tag_ids:
-                    tag_ids.append(tag.id)
+        with span('view.recent_tags'):
+            # Get the IDs of the most recent posts that have tags
+            tagged_posts = Post.optimized.published().filter(tags__isnull=False).order_by('-created_at')
+            # Get the tags from those posts, preserving order and uniqueness
+            tag_ids = []
+            for post in tagged_posts:
+                for tag in post.tags.all():
+                    if tag.id not in tag_ids:
+                        tag_ids.append(tag.id)
+                    if len(tag_ids) >= 6:
+                        break
                 if len(tag_ids) >= 6:
                     break
-            if len(tag_ids) >= 6:
-                break
         
         # Fetch the actual Tag objects
         context['all_tags'] = Tag.objects.filter(id__in=tag_ids).order_by('-post__created_at').distinct()[:6]
@@ -783,16 +799,17 @@ def _create_ai_post(title, content, tags_list, author, cover_image_url=None):
     if cover_image_url:
         try:
             from django.core.files.base import ContentFile
-            from django.core.files.storage import default_storage
             import requests
             import os
             from urllib.parse import urlparse
             
+            from ..media_gc import media_path_from_url
+            
             # If it's a local URL, convert to file path
-            if cover_image_url.startswith('/media/'):
+            relative_path = media_path_from_url(cover_image_url)
+            if relative_path:
                 # It's already saved locally, just update the field
-                # Remove /media/ prefix to get the relative path
-                relative_path = cover_image_url.replace('/media/', '')
+                # (media_path_from_url also strips the hashed URL segment)
                 post.header_image = relative_path
                 post.save()
             else:
@@ -808,7 +825,7 @@ def _create_ai_post(title, content, tags_list, author, cover_image_url=None):
                 
                 # Save the image
                 image_content = ContentFile(response.content)
-                saved_path = default_storage.save(f'post_images/{filename}', image_content)
+                saved_path = save_deduplicated(f'post_images/{filename}', image_content)
                 
                 # Update post with image
                 post.header_image = saved_path
@@ -857,7 +874,9 @@ def _generate_ai_content(url, rewrite_prompt, tag_prompt, form_data=None):
             # Usar prompt personalizado para contenido si está especificado
             if content_template_id:
                 try:
-                    content_template = PromptManager.get_prompt_by_id(int(content_template_id))
+                    content_template = PromptManager.get_compiled_prompt(int(content_template_id))
+                    if content_template is None:
+                        raise ValueError(f"Template {content_template_id} no encontrado o inactivo")
                     rewrite_prompt = content_template.template
                     print(f"✅ Usando prompt personalizado para contenido: {content_template.name}")
                 except (ValueError, Exception) as e:
@@ -868,7 +887,9 @@ def _generate_ai_content(url, rewrite_prompt, tag_prompt, form_data=None):
             # Usar prompt personalizado para tags si está especificado
             if tag_template_id:
                 try:
-                    tag_template = PromptManager.get_prompt_by_id(int(tag_template_id))
+                    tag_template = PromptManager.get_compiled_prompt(int(tag_template_id))
+                    if tag_template is None:
+                        raise ValueError(f"Template {tag_template_id} no encontrado o inactivo")
                     tag_prompt = tag_template.template
                     print(f"✅ Usando prompt personalizado para tags: {tag_template.name}")
                 except (ValueError, Exception) as e:
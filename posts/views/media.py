@@ -0,0 +1,41 @@
+"""
+Vistas de archivos de media.
+
+Solo autorizan la petición; el envío de los bytes lo hace el servidor web
+según ``MEDIA_SERVE_MODE`` (ver ``posts.media_serving``).
+"""
+
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.shortcuts import redirect
+from django.views.decorators.http import require_safe
+
+from ..media_serving import content_digest, media_response, resolve_media_path
+
+
+@require_safe
+def media_view(request, path):
+    """
+    Sirve un archivo de media por su URL normal (caché corta).
+    """
+    full_path = resolve_media_path(path)
+    if full_path is None:
+        raise Http404("Archivo no encontrado")
+    return media_response(request, path, full_path, digest=content_digest(path))
+
+
+@require_safe
+def hashed_media_view(request, digest, path):
+    """
+    Sirve un archivo de media por su URL con hash (caché inmutable).
+
+    Si el archivo cambió desde que se generó la URL se redirige a la actual.
+    """
+    full_path = resolve_media_path(path)
+    if full_path is None:
+        raise Http404("Archivo no encontrado")
+
+    current = content_digest(path)
+    if current != digest:
+        return redirect(default_storage.url(path))
+    return media_response(request, path, full_path, digest=current, immutable=True)
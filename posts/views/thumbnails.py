@@ -0,0 +1,67 @@
+"""
+Vista de miniaturas bajo demanda.
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from ..media_serving import file_response, resolve_media_path
+from ..thumbnails import (
+    THUMBNAIL_CONTENT_TYPE,
+    ThumbnailBusy,
+    ThumbnailNotFound,
+    allowed_sizes,
+    get_thumbnail,
+)
+
+logger = logging.getLogger(__name__)
+
+# Las miniaturas cambian de clave si cambia el original, pero la URL es la misma
+THUMBNAIL_MAX_AGE = 60 * 60 * 24
+
+
+@require_GET
+def thumbnail_view(request, width, height, path):
+    """
+    Sirve la miniatura ``width`` x ``height`` de una imagen de media.
+
+    Solo se aceptan los tamaños de ``settings.THUMBNAIL_SIZES`` y las
+    imágenes que ``media_view`` serviría (nada de cuarentena ni carpetas
+    privadas). Con
+    ``THUMBNAIL_ACCEL_REDIRECT`` configurado, el archivo lo envía nginx; si
+    no, se aplica ``MEDIA_SERVE_MODE``.
+    """
+    if (width, height) not in allowed_sizes():
+        raise Http404("Tamaño de miniatura no permitido")
+    if resolve_media_path(path) is None:
+        raise Http404("Imagen no encontrada")
+
+    try:
+        thumb_path = get_thumbnail(path, width, height)
+    except ThumbnailNotFound:
+        raise Http404("Imagen no encontrada")
+    except ThumbnailBusy:
+        response = HttpResponse("Miniatura en proceso, reintenta en unos segundos", status=503)
+        response['Retry-After'] = '2'
+        return response
+
+    # Con THUMBNAIL_ACCEL_REDIRECT las miniaturas las envía nginx aunque el
+    # resto de la media use otro modo
+    accel_prefix = getattr(settings, 'THUMBNAIL_ACCEL_REDIRECT', '')
+    accel_path = None
+    if accel_prefix:
+        relative = os.path.relpath(thumb_path, str(settings.THUMBNAIL_CACHE_ROOT)).replace(os.sep, '/')
+        accel_path = f"{accel_prefix.rstrip('/')}/{relative}"
+
+    return file_response(
+        request,
+        thumb_path,
+        accel_path=accel_path,
+        content_type=THUMBNAIL_CONTENT_TYPE,
+        cache_control=f'public, max-age={THUMBNAIL_MAX_AGE}',
+        mode='accel' if accel_prefix else None,
+    )
@@ -454,8 +454,8 @@ class ImageSelectorWidget(forms.ClearableFileInput):
             # Import here to avoid circular imports
             from .media_image_selector import MediaImageSelector
             
-            # Get recent images from all media folders
-            all_images = MediaImageSelector.get_recent_images(50)
+            # Get the 30 most recent images from the media catalog
+            all_images = MediaImageSelector.get_recent_images(30)
             
             # Convert to the format expected by the widget
             images = []
@@ -463,6 +463,7 @@ class ImageSelectorWidget(forms.ClearableFileInput):
                 images.append({
                     'path': img['path'],
                     'url': img['url'],
+                    'thumbnail_url': img['thumbnail_url'],
                     'name': img['filename'],
                     'folder': img['folder'],
                     'modified_time': img['modified_time'],
@@ -470,8 +471,7 @@ class ImageSelectorWidget(forms.ClearableFileInput):
                     'size_mb': img['size_mb']
                 })
             
-            # Limit to 30 most recent images for performance
-            return images[:30]
+            return images
             
         except Exception as e:
             logger.error(f"Error getting images from MediaImageSelector: {e}")
@@ -557,6 +557,7 @@ class ImageSelectorWidget(forms.ClearableFileInput):
                     # Escape HTML attributes to prevent XSS
                     safe_path = image['path'].replace("'", "\\'").replace('"', '\\"')
                     safe_url = image['url'].replace("'", "\\'").replace('"', '\\"')
+                    safe_thumb = image.get('thumbnail_url', image['url']).replace("'", "\\'").replace('"', '\\"')
                     safe_name = image['name'].replace('<', '&lt;').replace('>', '&gt;')
                     
                     # Format date and size info
@@ -603,7 +604,7 @@ class ImageSelectorWidget(forms.ClearableFileInput):
                         <div class="existing-image-item" {recent_attr} onclick="selectExistingImage('{safe_path}', '{safe_url}', '{input_name}')" 
                              title="{tooltip_info}">
                             <div class="image-container">
-                                <img src="{safe_url}" alt="{safe_name}" loading="lazy"
+                                <img src="{safe_thumb}" alt="{safe_name}" loading="lazy"
                                      onerror="this.parentElement.innerHTML='<div class=\\'text-danger\\' style=\\'padding:10px;text-align:center;\\'>Error<br>cargando<br>imagen</div>'">
                                 <div class="image-overlay">
                                     <div class="image-info">
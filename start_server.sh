@@ -17,6 +17,10 @@ python manage.py collectstatic --noinput
 echo "🏷️  Inicializando sistema de tags..."
 python manage.py initialize_tag_system --calculate-cooccurrence --create-history
 
+# Sincronizar el catálogo de imágenes de media
+echo "🖼️  Sincronizando catálogo de media..."
+python manage.py sync_media_catalog
+
 # Monitoreo de memoria (opcional)
 if python -c "import psutil" 2>/dev/null; then
     echo "💾 Iniciando monitoreo de memoria..."